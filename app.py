@@ -1,60 +1,275 @@
-from flask import Flask, jsonify, request
-import json
+import time
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
 from flask_cors import CORS
-from database.db import db
-from models.db_models import RequestLog
+from database.db import init_app as init_database
+from database import migrations, retention
+from database.log_writer import log_writer
+from services import admission, async_pipeline, bulk_scoring, field_plan, json_provider, prediction_cache, process_pool, scheduler
+from services.model_registry import registry
 from routes.crop_routes import crop_bp
 from routes.fertilizer_routes import fertilizer_bp
 from routes.yield_routes import yield_bp
 from routes.dosage_routes import dosage_bp
+from routes.plan_routes import plan_bp
+from routes.metrics_routes import metrics_bp
+from routes.analytics_routes import analytics_bp
+from routes.admin_routes import admin_bp
+from routes.system_routes import system_bp
+
+
+def create_app(config=None):
+    """
+    Build and configure the Flask app
+
+    Settings are applied in order: the defaults below, FLASK_-prefixed
+    environment variables (FLASK_MODEL_WARMUP=eager, FLASK_LOG_BATCH_SIZE=1000,
+    ...; values are parsed as JSON where possible), then `config`. The log
+    writer, caches, batchers and model registry are per-process singletons,
+    so create one app per process.
+    """
+    app = Flask(__name__)
+    CORS(app)
+
+    # SQLite config; set DATABASE_URL in the environment to use another database.
+    # The pragma (WAL by default) and pool settings default in database/db.py
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+
+    # Responses and request bodies use orjson when it is installed (see
+    # services/json_provider.py); keys stay sorted as with Flask's encoder
+    app.config["JSON_FAST_ENCODER"] = True
+    app.config["JSON_SORT_KEYS"] = True
+
+    # Upper bound on records accepted by the /batch endpoints
+    app.config["BATCH_MAX_RECORDS"] = 10000
+
+    # /api/logs returns at most LOGS_MAX_LIMIT rows per page; format=ndjson
+    # streams any number of rows, LOGS_STREAM_PAGE_SIZE at a time
+    app.config["LOGS_MAX_LIMIT"] = 1000
+    app.config["LOGS_STREAM_PAGE_SIZE"] = 1000
+
+    # Logs are added to the LogRollup summaries behind /api/analytics as they are
+    # written; logs older than LOG_RETENTION_DAYS are archived to LOG_ARCHIVE_DIR
+    # and deleted by `flask prune-logs` (run it from cron)
+    app.config["LOG_ROLLUP_ON_WRITE"] = True
+    app.config["LOG_RETENTION_DAYS"] = {"crop": 90, "fertilizer": 90, "yield": 90, "dosage": 90, "field_plan": 90}
+    app.config["LOG_RETENTION_BATCH_SIZE"] = 500
 
-app = Flask(__name__)
-CORS(app)
+    # Request logs are written behind the response by a background worker;
+    # see database/log_writer.py for the LOG_* settings
+    app.config["LOG_WRITE_BEHIND"] = True
+    app.config["LOG_FLUSH_INTERVAL"] = 0.5
+    app.config["LOG_BATCH_SIZE"] = 500
+    app.config["LOG_QUEUE_SIZE"] = 10000
+    app.config["LOG_QUEUE_FULL_POLICY"] = "drop"
 
-# SQLite config
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # Per-module prediction cache (LRU + TTL, cleared when the model file changes)
+    app.config["PREDICTION_CACHE"] = {"crop": True, "fertilizer": True, "yield": True, "dosage": True}
+    app.config["PREDICTION_CACHE_SIZE"] = 1024
+    app.config["PREDICTION_CACHE_TTL"] = 300
 
-db.init_app(app)
+    # Micro-batching of concurrent single requests (off by default: it trades
+    # up to INFERENCE_BATCH_MAX_WAIT_MS of latency for fewer model calls)
+    app.config["INFERENCE_BATCHING"] = {"crop": False, "fertilizer": False, "yield": False, "dosage": False}
+    app.config["INFERENCE_BATCH_MAX_WAIT_MS"] = 2
+    app.config["INFERENCE_BATCH_MAX_SIZE"] = 64
 
-# Register routes
-app.register_blueprint(crop_bp)
-app.register_blueprint(fertilizer_bp)
-app.register_blueprint(yield_bp)
-app.register_blueprint(dosage_bp)
+    # Models load on first use; "background" or "eager" loads them up front.
+    # With MODEL_MMAP, artifacts written by convert_models.py are memory-mapped
+    # read-only so worker processes share their arrays through the page cache
+    app.config["MODEL_WARMUP"] = "lazy"
+    app.config["MODEL_MMAP"] = True
 
-@app.route("/health", methods=["GET"])
-def health():
-    return jsonify({"status": "ok"})
+    # Each process checks the model files every MODEL_WATCH_INTERVAL seconds and
+    # swaps in a changed one once it loads and validates; uploaded versions are
+    # kept in MODEL_VERSIONS_DIR. The /api/admin/models upload,
+    # activate and reload endpoints stay off until MODEL_ADMIN_TOKEN is set
+    app.config["MODEL_WATCH_INTERVAL"] = 5.0
+    app.config["MODEL_VERSIONS_DIR"] = "models/versions"
+    app.config["MODEL_ADMIN_TOKEN"] = None
+
+    # Tree ensembles can be served by the flattened NumPy engine in
+    # services/tree_engine.py (verified against sklearn when it is built);
+    # batches over COMPILED_ENGINE_MAX_ROWS still use the sklearn estimator.
+    # "compressed" serves the smaller, possibly pruned, engine written by
+    # `python convert_models.py crop --compress`, for every batch size
+    app.config["INFERENCE_ENGINE"] = {"crop": "compiled"}
+    app.config["COMPILED_ENGINE_MAX_ROWS"] = 256
+
+    # Modules set to "grid" in INFERENCE_ENGINE answer from a table of their
+    # model's predictions (services/grid_engine.py): a point per category code,
+    # and (low, high, points) from GRID_ENGINE_RANGES per number feature. Rows
+    # outside the grid use the model. `flask build-grid` precomputes the table
+    # and reports its error against the model
+    app.config["GRID_ENGINE_RANGES"] = {
+        "yield": {"area": (0.5, 50.0, 12), "rainfall": (0.0, 3000.0, 16),
+                  "temperature": (-10.0, 50.0, 16), "humidity": (0.0, 100.0, 11)},
+        "dosage": {"soil_n": (0.0, 200.0, 11), "soil_p": (0.0, 150.0, 11), "soil_k": (0.0, 300.0, 11),
+                   "ph": (3.0, 10.0, 15), "area": (0.5, 50.0, 12)}
+    }
+    app.config["GRID_ENGINE_INTERPOLATE"] = True
+
+    # Modules switched on here predict in a pool of INFERENCE_POOL_SIZE worker
+    # processes (default: the cores over WEB_CONCURRENCY server processes, each
+    # of which has its own pool) instead of the server's threads; batches
+    # are split into shards of at most INFERENCE_POOL_CHUNK_SIZE rows
+    app.config["INFERENCE_PROCESSES"] = {"crop": False, "fertilizer": False, "yield": False, "dosage": False}
+    app.config["INFERENCE_POOL_SIZE"] = None
+    app.config["INFERENCE_POOL_CHUNK_SIZE"] = 5000
+
+    # The async API (asgi.py) runs at most ASYNC_INFERENCE_WORKERS predictions
+    # at once per process; up to ASYNC_MAX_QUEUE more wait, then it answers 503
+    app.config["ASYNC_INFERENCE_WORKERS"] = 4
+    app.config["ASYNC_MAX_QUEUE"] = 1000
+    app.config["ASYNC_QUEUE_TIMEOUT"] = 10.0
+
+    # With ADMISSION_CONTROL on, each module's prediction endpoints run at most
+    # ADMISSION_DEFAULT_LIMIT requests at once per process (gunicorn.conf.py sets
+    # it to the worker's thread count); up to ADMISSION_MAX_QUEUE more wait until
+    # ADMISSION_QUEUE_TIMEOUT seconds after they arrived (at the proxy, when it
+    # sets X-Request-Start), then get 429/503 with Retry-After. Once the queued
+    # requests expect to wait ADMISSION_DEGRADE_WAIT of that timeout, request
+    # logs are shed
+    app.config["ADMISSION_CONTROL"] = False
+    app.config["ADMISSION_DEFAULT_LIMIT"] = 4
+    app.config["ADMISSION_MAX_QUEUE"] = 64
+    app.config["ADMISSION_QUEUE_TIMEOUT"] = 1.0
+    app.config["ADMISSION_DEGRADE_WAIT"] = 0.5
+
+    # /api/field-plan runs the crop model in the request thread and the other
+    # three in FIELD_PLAN_WORKERS threads next to it (0 runs them in turn)
+    app.config["FIELD_PLAN_WORKERS"] = 3
+
+    app.config.from_prefixed_env()
+    if config:
+        app.config.update(config)
+
+    json_provider.init_app(app)
+    init_database(app)
+    log_writer.init_app(app)
+    retention.init_app(app)
+    prediction_cache.init_app(app)
+    scheduler.init_app(app)
+    async_pipeline.init_app(app)
+    field_plan.init_app(app)
+    admission.init_app(app)
+    process_pool.init_app(app)
+    registry.init_app(app)
+
+    # Create app.db and any missing tables, columns or indexes before serving
+    with app.app_context():
+        try:
+            migrations.upgrade()
+        except Exception as e:
+            print(f"Warning: Could not upgrade database schema: {e}")
+
+    # Register routes
+    app.register_blueprint(crop_bp)
+    app.register_blueprint(fertilizer_bp)
+    app.register_blueprint(yield_bp)
+    app.register_blueprint(dosage_bp)
+    app.register_blueprint(plan_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(analytics_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(system_bp)
+
+    for command in (init_db, compact_logs, backfill_rollups, prune_logs, score, build_grid):
+        app.cli.add_command(command)
+    return app
+
+
+@click.command("init-db")
+@with_appcontext
+def init_db():
+    """Create missing tables, columns and indexes"""
+    created = migrations.upgrade()
+    print(f"Created: {', '.join(created)}" if created else "Schema is up to date")
+
+
+@click.command("compact-logs")
+@with_appcontext
+@click.option("--batch-size", default=1000, show_default=True, help="Rows rewritten per transaction")
+@click.option("--vacuum", is_flag=True, help="Reclaim the freed space afterwards (SQLite)")
+def compact_logs(batch_size, vacuum):
+    """Rewrite legacy JSON request logs in the compact storage format"""
+    migrations.upgrade()
+    print(f"Compacted {migrations.compact_logs(batch_size)} request logs")
+    if vacuum:
+        migrations.vacuum()
+
+
+@click.command("backfill-rollups")
+@with_appcontext
+@click.option("--batch-size", default=1000, show_default=True, help="Rows added per transaction")
+def backfill_rollups(batch_size):
+    """Add request logs not yet counted in the rollups (e.g. written before LOG_ROLLUP_ON_WRITE)"""
+    migrations.upgrade()
+    print(f"Added {migrations.backfill_rollups(batch_size)} request logs to the rollups")
+
+
+@click.command("prune-logs")
+@with_appcontext
+@click.option("--module", "modules", multiple=True, help="Only prune this module (repeatable)")
+@click.option("--dry-run", is_flag=True, help="Only report how many rows have expired")
+def prune_logs(modules, dry_run):
+    """Roll up, archive and delete request logs past LOG_RETENTION_DAYS"""
+    if dry_run:
+        for module, count in retention.expired_counts().items():
+            print(f"{module}: {count} expired")
+        return
+    for module, stats in retention.prune(modules=modules).items():
+        print(f"{module}: deleted {stats['deleted']} rows older than {stats['cutoff']}, "
+              f"{len(stats['archives'])} archive files")
+
+
+@click.command("score")
+@with_appcontext
+@click.argument("module", type=click.Choice(sorted(bulk_scoring.SCORERS)))
+@click.argument("input_path", type=click.Path(exists=True, dir_okay=False))
+@click.argument("output_path", type=click.Path(dir_okay=False))
+@click.option("--chunk-size", default=10000, show_default=True, help="Rows read, scored and written at a time")
+@click.option("--processes", default=0, show_default=True,
+              help="Shard each chunk's predict over this many processes; 0 predicts here")
+@click.option("--resume", is_flag=True, help="Continue from OUTPUT_PATH.checkpoint instead of starting over")
+def score(module, input_path, output_path, chunk_size, processes, resume):
+    """Score a CSV or Parquet file offline, streaming results to CSV (or .ndjson)"""
+    def progress(state, rate):
+        print(f"{state['rows']} rows, {state['errors']} errors, {rate:.0f} rows/s")
 
-@app.route("/api/logs", methods=["GET"])
-def get_all_logs():
-    """Get all request logs with optional filtering"""
     try:
-        module = request.args.get("module")  # Optional filter by module
-        limit = int(request.args.get("limit", 50))  # Default limit 50
-        
-        query = RequestLog.query
-        if module:
-            query = query.filter_by(module=module)
-        
-        logs = query.order_by(RequestLog.timestamp.desc()).limit(limit).all()
-        
-        result = []
-        for log in logs:
-            result.append({
-                "id": log.id,
-                "module": log.module,
-                "input": json.loads(log.input_data),
-                "result": json.loads(log.result_data),
-                "timestamp": log.timestamp.isoformat()
-            })
-        
-        return jsonify({"logs": result, "count": len(result)})
-    except Exception as e:
-        return jsonify({"error": f"Failed to fetch logs: {str(e)}"}), 500
+        state = bulk_scoring.score_file(module, input_path, output_path, chunk_size, processes, resume, progress)
+    except (ValueError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+    print(f"Scored {state['rows']} rows ({state['errors']} errors) into {output_path}")
+
+
+@click.command("build-grid")
+@with_appcontext
+@click.argument("modules", nargs=-1)
+def build_grid(modules):
+    """Precompute lookup grids into models/<name>.grid.joblib (default: every "grid" module)"""
+    if not modules:
+        modules = [name for name, engine in current_app.config["INFERENCE_ENGINE"].items() if engine == "grid"]
+    for name in modules:
+        try:
+            started = time.perf_counter()
+            grid, target = registry.entry(name).write_grid()
+        except Exception as e:
+            raise click.ClickException(f"{name}: {e}")
+        error = grid.error_report
+        print(f"{name}: {grid.cells} points, {grid.table.nbytes / 1e6:.2f} MB, "
+              f"built in {time.perf_counter() - started:.1f}s -> {target}")
+        if "disagreement" in error:
+            print(f"  disagrees with the model on {error['disagreement']:.2%} of {error['rows']} in-grid rows")
+        else:
+            print(f"  max abs error {error['max_abs_error']:.4g} ({error['max_relative_error']:.2%} of the output range), "
+                  f"mean {error['mean_abs_error']:.4g}, over {error['rows']} in-grid rows; worst at {error['worst_row']}")
+
 
 if __name__ == "__main__":
-    with app.app_context():
-        db.create_all()   # creates app.db automatically
-    app.run(debug=True)
+    # Development server only; see wsgi.py and gunicorn.conf.py for production
+    create_app().run(debug=True)
@@ -0,0 +1,13 @@
+"""
+ASGI entry point: the async variant of the API
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 4
+
+The prediction endpoints run on the event loop with inference in a bounded
+pool (see services/async_pipeline.py); everything else is served by the
+Flask app through a WSGI adapter.
+"""
+from app import create_app
+from routes.async_routes import AsyncApp
+
+app = AsyncApp(create_app())
@@ -0,0 +1,533 @@
+#!/usr/bin/env python3
+"""
+Load-test and latency benchmark for the prediction endpoints
+
+Drives the Flask app in-process, either through its test client or through
+a threaded WSGI server on a local port, or a separately started server
+(e.g. gunicorn) over HTTP, with a configurable number of concurrent clients
+and random payloads for each module. Reports requests/sec,
+p50/p95/p99 latency, and how much time went to model.predict versus database
+logging. Results can be written as JSON and compared against an earlier run.
+
+Usage:
+    python benchmark.py                                  # all modules, test client
+    python benchmark.py --modules crop --requests 2000 --concurrency 16
+    python benchmark.py --server wsgi --output bench.json
+    python benchmark.py --compare bench.json             # print deltas vs a saved run
+    python benchmark.py --batch-size 500                 # hit the /batch endpoints
+    python benchmark.py --processes 4 --inline-logs      # multi-worker write contention
+    python benchmark.py --url http://127.0.0.1:8000      # a running server (gunicorn -c gunicorn.conf.py wsgi:app)
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import numpy as np
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+CROP_TYPES = ["rice", "maize", "wheat", "cotton", "sugarcane", "potato"]
+SEASONS = ["spring", "summer", "autumn", "winter"]
+SOIL_QUALITIES = ["poor", "fair", "good", "excellent"]
+GROWTH_STAGES = ["seedling", "vegetative", "flowering", "fruiting", "mature"]
+
+
+def _soil(rng):
+    return {
+        "soil_n": round(rng.uniform(0, 140), 1),
+        "soil_p": round(rng.uniform(5, 145), 1),
+        "soil_k": round(rng.uniform(5, 205), 1),
+        "ph": round(rng.uniform(3.5, 9.9), 2)
+    }
+
+
+def crop_payload(rng):
+    return dict(_soil(rng),
+                temperature=round(rng.uniform(8, 44), 1),
+                humidity=round(rng.uniform(14, 100), 1),
+                rainfall=round(rng.uniform(20, 300), 1))
+
+
+def fertilizer_payload(rng):
+    return dict(_soil(rng), area=round(rng.uniform(0.5, 50), 2))
+
+
+def yield_payload(rng):
+    return {
+        "area": round(rng.uniform(0.5, 50), 2),
+        "crop_type": rng.choice(CROP_TYPES),
+        "season": rng.choice(SEASONS),
+        "rainfall": round(rng.uniform(20, 300), 1),
+        "temperature": round(rng.uniform(8, 44), 1),
+        "humidity": round(rng.uniform(14, 100), 1),
+        "soil_quality": rng.choice(SOIL_QUALITIES)
+    }
+
+
+def dosage_payload(rng):
+    return dict(_soil(rng),
+                crop_type=rng.choice(CROP_TYPES),
+                growth_stage=rng.choice(GROWTH_STAGES),
+                area=round(rng.uniform(0.5, 50), 2))
+
+
+MODULES = {
+    "crop": ("/api/crop-recommendation", crop_payload),
+    "fertilizer": ("/api/fertilizer-recommendation", fertilizer_payload),
+    "yield": ("/api/yield-prediction", yield_payload),
+    "dosage": ("/api/dosage-recommendation", dosage_payload),
+}
+
+
+class Timer:
+    """Thread-safe accumulator of elapsed seconds"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seconds = 0.0
+        self.calls = 0
+
+    def add(self, seconds):
+        with self.lock:
+            self.seconds += seconds
+            self.calls += 1
+
+    def reset(self):
+        with self.lock:
+            self.seconds = 0.0
+            self.calls = 0
+
+
+MODEL_TIMER = Timer()
+DB_TIMER = Timer()
+
+
+class TimedModel:
+    """Proxy that times predict calls on a loaded model"""
+
+    def __init__(self, model):
+        self._model = model
+
+    def predict(self, X):
+        started = time.perf_counter()
+        try:
+            return self._model.predict(X)
+        finally:
+            MODEL_TIMER.add(time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+def install_timers(registry):
+    """Time every model.predict and every DB commit/execute from here on"""
+    for name in registry.names():
+        entry = registry.entry(name)
+        model = entry.load()
+        if model is not None and not isinstance(model, TimedModel):
+            entry.active.model = TimedModel(model)
+
+    for method in ("commit", "execute"):
+        original = getattr(Session, method)
+
+        def timed(self, *args, _original=original, **kwargs):
+            started = time.perf_counter()
+            try:
+                return _original(self, *args, **kwargs)
+            finally:
+                DB_TIMER.add(time.perf_counter() - started)
+
+        setattr(Session, method, timed)
+
+
+class TestClientTransport:
+    """Sends requests through Flask's test client, one client per thread"""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def post(self, path, payload):
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.post(path, json=payload)
+        return response.status_code, response.get_json(silent=True)
+
+    def close(self):
+        pass
+
+
+class HTTPTransport:
+    """Posts JSON over HTTP to a running server, keeping one connection per thread open"""
+
+    def __init__(self, host, port, keep_alive=True):
+        self.host = host
+        self.port = port
+        self.keep_alive = keep_alive
+        self.local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None) if self.keep_alive else None
+        if connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            if self.keep_alive:
+                self.local.connection = connection
+        return connection
+
+    def _send(self, path, body):
+        connection = self._connection()
+        try:
+            connection.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            return response.status, response.read()
+        except Exception:
+            self.local.connection = None
+            connection.close()
+            raise
+        finally:
+            if not self.keep_alive:
+                connection.close()
+
+    def post(self, path, payload):
+        body = json.dumps(payload)
+        try:
+            status, data = self._send(path, body)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            if not self.keep_alive:
+                raise
+            # The server closed an idle keep-alive connection; retry once on a new one
+            status, data = self._send(path, body)
+        try:
+            return status, json.loads(data)
+        except ValueError:
+            return status, None
+
+    def close(self):
+        pass
+
+
+class WSGIServerTransport(HTTPTransport):
+    """Serves the app on a local port with a threaded WSGI server and posts over HTTP"""
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server, WSGIRequestHandler
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+        super().__init__("127.0.0.1", self.server.server_port, keep_alive=False)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def make_payloads(module, count, batch_size, distinct, rng):
+    """Request bodies for one module; distinct > 0 draws from a fixed pool to exercise the cache"""
+    generate = MODULES[module][1]
+    pool = [generate(rng) for _ in range(distinct)] if distinct else None
+
+    def record():
+        return rng.choice(pool) if pool else generate(rng)
+
+    if batch_size:
+        return [[record() for _ in range(batch_size)] for _ in range(count)]
+    return [record() for _ in range(count)]
+
+
+def drive(transport, path, payloads, concurrency):
+    """Post every payload from `concurrency` threads; returns per-request latency/status and the send window"""
+    latencies = [0.0] * len(payloads)
+    statuses = [0] * len(payloads)
+    error_bodies = [False] * len(payloads)
+
+    def send(i):
+        started = time.perf_counter()
+        status, body = transport.post(path, payloads[i])
+        latencies[i] = time.perf_counter() - started
+        statuses[i] = status
+        error_bodies[i] = isinstance(body, dict) and "error" in body
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, range(len(payloads))))
+    return {"latencies": latencies, "statuses": statuses, "error_bodies": error_bodies,
+            "started": started, "finished": time.perf_counter()}
+
+
+def make_transport(app, server, url=None):
+    if url:
+        parts = urlsplit(url)
+        return HTTPTransport(parts.hostname, parts.port or 80)
+    return WSGIServerTransport(app) if server == "wsgi" else TestClientTransport(app)
+
+
+# State handed to forked worker processes
+_WORKER = {}
+
+
+def _worker_init():
+    # Connections inherited across fork must not be shared with the parent
+    if _WORKER["app"] is None:
+        return
+    from database.db import db
+    with _WORKER["app"].app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def _worker_drive(payloads):
+    app, log_writer, path, args = _WORKER["app"], _WORKER["log_writer"], _WORKER["path"], _WORKER["args"]
+    MODEL_TIMER.reset()
+    DB_TIMER.reset()
+    transport = make_transport(app, args.server, args.url)
+    try:
+        run = drive(transport, path, payloads, args.concurrency)
+    finally:
+        transport.close()
+    run["db_during_run"] = DB_TIMER.seconds
+    # Pool workers exit without running atexit, so write out queued logs here
+    if log_writer is not None:
+        log_writer.flush()
+    run.update(db_total=DB_TIMER.seconds, model_seconds=MODEL_TIMER.seconds, model_calls=MODEL_TIMER.calls)
+    return run
+
+
+def run_module(app, transport, log_writer, module, args, rng):
+    path = MODULES[module][0] + ("/batch" if args.batch_size else "")
+    for payload in make_payloads(module, args.warmup, args.batch_size, args.distinct, rng):
+        transport.post(path, payload)
+    if log_writer is not None:
+        log_writer.flush()
+
+    payloads = make_payloads(module, args.requests, args.batch_size, args.distinct, rng)
+    if args.processes > 1:
+        import multiprocessing
+        _WORKER.update(app=app, log_writer=log_writer, path=path, args=args)
+        chunks = [payloads[i::args.processes] for i in range(args.processes)]
+        with multiprocessing.get_context("fork").Pool(args.processes, initializer=_worker_init) as pool:
+            runs = pool.map(_worker_drive, chunks)
+    else:
+        MODEL_TIMER.reset()
+        DB_TIMER.reset()
+        run = drive(transport, path, payloads, args.concurrency)
+        run["db_during_run"] = DB_TIMER.seconds
+        if log_writer is not None:
+            log_writer.flush()
+        run.update(db_total=DB_TIMER.seconds, model_seconds=MODEL_TIMER.seconds, model_calls=MODEL_TIMER.calls)
+        runs = [run]
+
+    latencies = [x for run in runs for x in run["latencies"]]
+    statuses = [x for run in runs for x in run["statuses"]]
+    error_bodies = [x for run in runs for x in run["error_bodies"]]
+    elapsed = max(run["finished"] for run in runs) - min(run["started"] for run in runs)
+
+    latency_ms = np.array(latencies) * 1000
+    status_counts = {}
+    for status in statuses:
+        status_counts[str(status)] = status_counts.get(str(status), 0) + 1
+    n = len(payloads)
+    rows = n * (args.batch_size or 1)
+    return {
+        "path": path,
+        "requests": n,
+        "rows": rows,
+        "processes": args.processes,
+        "concurrency": args.concurrency,
+        "seconds": round(elapsed, 4),
+        "requests_per_second": round(n / elapsed, 2),
+        "rows_per_second": round(rows / elapsed, 2),
+        "status_counts": status_counts,
+        "error_responses": int(sum(error_bodies)),
+        "latency_ms": {
+            "mean": round(float(latency_ms.mean()), 3),
+            "p50": round(float(np.percentile(latency_ms, 50)), 3),
+            "p95": round(float(np.percentile(latency_ms, 95)), 3),
+            "p99": round(float(np.percentile(latency_ms, 99)), 3),
+            "max": round(float(latency_ms.max()), 3)
+        },
+        "model_ms_per_request": round(sum(run["model_seconds"] for run in runs) * 1000 / n, 3),
+        "model_calls": sum(run["model_calls"] for run in runs),
+        # DB time during the run vs total including the write-behind flush afterwards
+        "db_ms_per_request_during_run": round(sum(run["db_during_run"] for run in runs) * 1000 / n, 3),
+        "db_ms_per_request_total": round(sum(run["db_total"] for run in runs) * 1000 / n, 3)
+    }
+
+
+def print_results(results):
+    print(f"{'module':<12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'model ms':>10}{'db ms':>10}{'errors':>8}")
+    for module, r in results.items():
+        errors = r["error_responses"] + sum(c for s, c in r["status_counts"].items() if not s.startswith("2"))
+        print(f"{module:<12}{r['requests_per_second']:>10}{r['latency_ms']['p50']:>10}"
+              f"{r['latency_ms']['p95']:>10}{r['latency_ms']['p99']:>10}"
+              f"{r['model_ms_per_request']:>10}{r['db_ms_per_request_total']:>10}{errors:>8}")
+
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    print(f"\nCompared with {baseline_path}:")
+    for module, r in results.items():
+        if module not in baseline:
+            continue
+        b = baseline[module]
+
+        def delta(new, old):
+            return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+        print(f"{module:<12} req/s {delta(r['requests_per_second'], b['requests_per_second']):>8}  "
+              f"p50 {delta(r['latency_ms']['p50'], b['latency_ms']['p50']):>8}  "
+              f"p99 {delta(r['latency_ms']['p99'], b['latency_ms']['p99']):>8}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the prediction endpoints")
+    parser.add_argument("--modules", default=",".join(MODULES), help="comma-separated modules to run")
+    parser.add_argument("--requests", type=int, default=500, help="timed requests per module")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per module first")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent client threads (per process)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="forked worker processes sharing the database, like a multi-worker server")
+    parser.add_argument("--server", choices=["test", "wsgi"], default="test",
+                        help="Flask test client or a threaded WSGI server on a local port")
+    parser.add_argument("--batch-size", type=int, default=0, help="records per request on /batch endpoints")
+    parser.add_argument("--distinct", type=int, default=0, help="draw payloads from a pool of N (0 = all unique)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results from an earlier run to compare against")
+    parser.add_argument("--keep-logs", action="store_true", help="keep the RequestLog rows the run created")
+    parser.add_argument("--inline-logs", action="store_true",
+                        help="commit each request log on the request path instead of write-behind")
+    parser.add_argument("--database-url", help="database to log to (sets DATABASE_URL); by default a scratch "
+                                               "SQLite file that is removed after the run")
+    parser.add_argument("--url", help="benchmark a running server at this base URL instead of the app in-process; "
+                                      "model and DB times are not measured and its logs are kept")
+    return parser.parse_args(argv)
+
+
+def run_remote(modules, args):
+    """Benchmark a server that is already running at args.url"""
+    transport = make_transport(None, args.server, args.url)
+    rng = random.Random(args.seed)
+    try:
+        return {module: run_module(None, transport, None, module, args, rng) for module in modules}
+    finally:
+        transport.close()
+
+
+def run_in_process(modules, args):
+    """
+    Benchmark an app created in this process; returns the results and the app
+
+    Logs go to a scratch SQLite file unless --database-url names a database.
+    In a named database the run's rows are left out of the LogRollup
+    summaries, so deleting them afterwards leaves the summaries as they were.
+    """
+    scratch = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        scratch = tempfile.mkdtemp(prefix="benchmark-")
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(scratch, "benchmark.db")
+    from app import create_app
+    from database.db import db
+    from database.log_writer import log_writer
+    from models.db_models import RequestLog
+    from services.model_registry import registry
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        first_id = (db.session.query(db.func.max(RequestLog.id)).scalar() or 0) + 1
+    install_timers(registry)
+    if args.inline_logs:
+        log_writer.enabled = False
+    # Every request's log is part of what is measured, even under load
+    log_writer.pressure = None
+    if not args.keep_logs:
+        log_writer.rollup = False
+
+    transport = make_transport(app, args.server)
+    rng = random.Random(args.seed)
+    results = {}
+    try:
+        for module in modules:
+            results[module] = run_module(app, transport, log_writer, module, args, rng)
+    finally:
+        transport.close()
+        log_writer.flush()
+        if scratch is not None and not args.keep_logs:
+            with app.app_context():
+                for engine in db.engines.values():
+                    engine.dispose()
+            shutil.rmtree(scratch, ignore_errors=True)
+        elif scratch is not None:
+            print(f"Logs kept in {os.environ['DATABASE_URL']}")
+        elif not args.keep_logs:
+            with app.app_context():
+                RequestLog.query.filter(RequestLog.id >= first_id).delete()
+                db.session.commit()
+    return results, app
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    modules = [m.strip() for m in args.modules.split(",") if m.strip()]
+    unknown = [m for m in modules if m not in MODULES]
+    if unknown:
+        print(f"Unknown modules: {', '.join(unknown)}")
+        return 1
+
+    if args.url:
+        results, app = run_remote(modules, args), None
+    else:
+        results, app = run_in_process(modules, args)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+            "url": args.url,
+            "database": make_url(app.config["SQLALCHEMY_DATABASE_URI"]).render_as_string(hide_password=True)
+            if app else None,
+            "config": {} if app is None else {key: app.config.get(key) for key in (
+                "LOG_WRITE_BEHIND", "PREDICTION_CACHE", "INFERENCE_BATCHING",
+                "INFERENCE_ENGINE", "COMPILED_ENGINE_MAX_ROWS", "MODEL_MMAP",
+                "SQLITE_JOURNAL_MODE", "SQLITE_SYNCHRONOUS", "SQLITE_BUSY_TIMEOUT_MS",
+                "DB_POOL_SIZE", "DB_MAX_OVERFLOW"
+            )}
+        },
+        "results": results
+    }
+
+    print_results(results)
+    if args.compare:
+        print_comparison(results, args.compare)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Convert the .pkl model artifacts into memory-mappable joblib files
+
+Each models/<name>.pkl is re-dumped uncompressed as models/<name>.joblib,
+which stores every NumPy array as a raw buffer. With MODEL_MMAP enabled the
+registry loads that file with mmap_mode="r", so the arrays are shared through
+the page cache by every worker process instead of being copied into each one.
+
+With --compile, tree ensembles are also flattened into the NumPy engine
+from services/tree_engine.py, checked against the original predictions and
+written to models/<name>.compiled.joblib for INFERENCE_ENGINE "compiled".
+
+With --compress, tree ensembles are also written as a smaller engine to
+models/<name>.compressed.joblib for INFERENCE_ENGINE "compressed": trees
+pruned, thresholds in float32, each distinct leaf value and subtree stored
+once (see services/tree_engine.compress). Without pruning options it
+predicts exactly like the original. Its size, load time, latency and
+agreement with the original are printed.
+
+Usage:
+    python convert_models.py              # convert every models/*.pkl
+    python convert_models.py crop         # convert selected models
+    python convert_models.py --compile    # also write verified compiled engines
+    python convert_models.py --report     # compare heap vs mmap loading
+    python convert_models.py crop --compress [--trees=N] [--min-agreement=0.995]
+        [--max-depth=D] [--values=float16] [--sample=inputs.csv]
+"""
+import glob
+import os
+import subprocess
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from services.model_registry import mmap_path, compiled_path, compressed_path, _replace_file
+from services.tree_engine import agreement, compile_verified, compress, verification_matrix, CompiledForest
+
+MODELS_DIR = "models"
+
+# Loads one artifact in a fresh interpreter and prints its memory footprint
+_REPORT_SNIPPET = """
+import sys, joblib
+# Import the estimator modules first so the delta below is the model alone
+import sklearn.ensemble, sklearn.tree, sklearn.pipeline, sklearn.compose, sklearn.linear_model
+from services.model_registry import _measure, process_memory
+before = process_memory()
+model = joblib.load(sys.argv[1], mmap_mode=sys.argv[2] or None)
+after = process_memory()
+totals = _measure(model)
+print(totals["private"], totals["mapped"],
+      after.get("private_dirty_bytes", 0) - before.get("private_dirty_bytes", 0))
+"""
+
+# Loads one artifact in a fresh interpreter and prints the seconds it took
+_LOAD_SNIPPET = """
+import sys, time, joblib
+import sklearn.ensemble, sklearn.tree, services.tree_engine
+started = time.perf_counter()
+joblib.load(sys.argv[1], mmap_mode=sys.argv[2] or None)
+print(time.perf_counter() - started)
+"""
+
+
+def convert(name):
+    """Write models/<name>.joblib next to models/<name>.pkl"""
+    source = os.path.join(MODELS_DIR, f"{name}.pkl")
+    target = mmap_path(source)
+    model = joblib.load(source)
+    # compress=0 keeps arrays as raw buffers, which is what mmap_mode needs.
+    # Workers may have the old file mapped, so it is replaced, never rewritten in place
+    _replace_file(target, lambda temporary: joblib.dump(model, temporary, compress=0))
+    print(f"✓ {source} -> {target} ({os.path.getsize(target) / 1e6:.2f} MB)")
+
+
+def compile_model(name):
+    """Write models/<name>.compiled.joblib for tree ensembles"""
+    source = os.path.join(MODELS_DIR, f"{name}.pkl")
+    try:
+        compiled = compile_verified(joblib.load(source))
+    except TypeError as e:
+        print(f"- {source}: not compiled ({e})")
+        return
+    target = compiled_path(source)
+    _replace_file(target, lambda temporary: joblib.dump(compiled, temporary, compress=0))
+    print(f"✓ {source} -> {target} ({compiled.n_trees} trees, {compiled.node_count} nodes, "
+          f"{os.path.getsize(target) / 1e6:.2f} MB, verified)")
+
+
+def option(name, parse, default=None):
+    """Value of a --name=value argument"""
+    for arg in sys.argv[1:]:
+        if arg.startswith(f"--{name}="):
+            return parse(arg.split("=", 1)[1])
+    return default
+
+
+def sample_rows(name, path):
+    """Feature rows of a CSV or Parquet file of the module's request fields, e.g. logged inputs"""
+    # Imports every service, which registers its schema
+    from services import bulk_scoring
+    from services.schema import schemas
+    rows = [schemas[name].matrix(records)[0] for _, _, records in bulk_scoring.read_chunks(path, schemas[name], 10000)]
+    return np.vstack(rows).astype(np.float32)
+
+
+def _load_seconds(path, mmap_mode):
+    output = subprocess.run([sys.executable, "-W", "ignore", "-c", _LOAD_SNIPPET, path, mmap_mode],
+                            capture_output=True, text=True)
+    return float(output.stdout) if output.returncode == 0 else float("nan")
+
+
+def _latency(model, X, repeat):
+    """Median seconds of model.predict(X)"""
+    model.predict(X)
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        model.predict(X)
+        times.append(time.perf_counter() - started)
+    return float(np.median(times))
+
+
+def compress_model(name):
+    """Write models/<name>.compressed.joblib and print how it compares with the original"""
+    source = os.path.join(MODELS_DIR, f"{name}.pkl")
+    estimator = joblib.load(source)
+    try:
+        full = CompiledForest.from_estimator(estimator)
+    except TypeError as e:
+        print(f"- {source}: not compressed ({e})")
+        return
+
+    # Trees are chosen on one half of the rows and the result judged on the other
+    reference = verification_matrix(full, seed=0)
+    held_out = verification_matrix(full, seed=1)
+    sample = option("sample", str)
+    if sample:
+        rows = sample_rows(name, sample)
+        reference = np.vstack([reference, rows[0::2]])
+        held_out = np.vstack([held_out, rows[1::2]])
+
+    compressed = compress(
+        estimator, reference,
+        n_trees=option("trees", int),
+        min_agreement=option("min-agreement", float),
+        max_depth=option("max-depth", int),
+        value_dtype=np.dtype(option("values", str, "float32"))
+    )
+    target = compressed_path(source)
+    # The watcher stamps this file, so it must never be seen half-written
+    _replace_file(target, lambda temporary: joblib.dump(compressed, temporary, compress=0))
+
+    info = compressed.compression
+    print(f"✓ {source} -> {target}: {info['trees']}/{info['original_trees']} trees, "
+          f"{info['nodes']}/{info['original_nodes']} nodes, depth {info['max_depth']}/{info['original_max_depth']}, "
+          f"{info['leaf_values']} distinct leaf values ({info['value_dtype']})")
+    variants = [("original", source, "", estimator), ("compiled", None, "r", full), ("compressed", target, "r", compressed)]
+    if os.path.exists(compiled_path(source)):
+        variants[1] = ("compiled", compiled_path(source), "r", full)
+    row, batch = held_out[:1], held_out[:1000]
+    for label, path, mmap_mode, model in variants:
+        size = f"{os.path.getsize(path) / 1e6:7.3f} MB" if path else "      - MB"
+        load = f"{_load_seconds(path, mmap_mode) * 1000:8.1f} ms" if path else "       - ms"
+        print(f"  {label:<10} file {size}  load {load}  "
+              f"1 row {_latency(model, row, 200) * 1000:7.3f} ms  "
+              f"1000 rows {_latency(model, batch, 20) * 1000:7.2f} ms")
+    for label, X in (("reference", reference), ("held-out", held_out)):
+        result = agreement(estimator, compressed, X)
+        line = f"  agreement with original on {result['rows']} {label} rows: {result['agreement']:.2%}"
+        if "confident_rows" in result:
+            line += f" ({result['confident_agreement']:.2%} of the {result['confident_rows']} with a majority class)"
+        print(line)
+
+
+def report(name):
+    """Load each artifact in a fresh process and print private vs mapped memory"""
+    source = os.path.join(MODELS_DIR, f"{name}.pkl")
+    variants = [(source, "")]
+    if os.path.exists(mmap_path(source)):
+        variants.append((mmap_path(source), "r"))
+    if os.path.exists(compiled_path(source)):
+        variants.append((compiled_path(source), "r"))
+    if os.path.exists(compressed_path(source)):
+        variants.append((compressed_path(source), "r"))
+
+    for path, mmap_mode in variants:
+        output = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", _REPORT_SNIPPET, path, mmap_mode],
+            capture_output=True, text=True
+        )
+        if output.returncode != 0:
+            print(f"✗ {path}: {output.stderr.strip().splitlines()[-1]}")
+            continue
+        private, mapped, dirty = (int(value) for value in output.stdout.split())
+        label = ("heap" if not mmap_mode else "compiled" if path.endswith(".compiled.joblib")
+                 else "compressed" if path.endswith(".compressed.joblib") else "mmap")
+        print(f"{name:<12} {label:<10} estimated private {private / 1e6:7.2f} MB  "
+              f"mapped {mapped / 1e6:7.2f} MB  process private dirty +{dirty / 1e6:.2f} MB")
+
+
+def model_names(args):
+    if args:
+        return args
+    return sorted(os.path.splitext(os.path.basename(p))[0] for p in glob.glob(os.path.join(MODELS_DIR, "*.pkl")))
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    names = model_names(args)
+
+    if "--report" in sys.argv:
+        for name in names:
+            report(name)
+        sys.exit(0)
+
+    failed = False
+    for name in names:
+        try:
+            convert(name)
+            if "--compile" in sys.argv:
+                compile_model(name)
+            if "--compress" in sys.argv:
+                compress_model(name)
+        except Exception as e:
+            print(f"✗ {name}: {e}")
+            failed = True
+    sys.exit(1 if failed else 0)
@@ -1,3 +1,82 @@
+import os
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
 db = SQLAlchemy()
+
+# Settings that can be overridden from the environment, with their defaults
+DEFAULTS = {
+    "SQLITE_JOURNAL_MODE": "WAL",       # WAL lets readers run alongside the single writer
+    "SQLITE_SYNCHRONOUS": "NORMAL",     # NORMAL is durable across app crashes in WAL mode
+    "SQLITE_BUSY_TIMEOUT_MS": 5000,     # wait this long for the write lock before failing
+    "DB_POOL_SIZE": 10,
+    "DB_MAX_OVERFLOW": 20,
+    "DB_POOL_TIMEOUT": 30,
+    "DB_POOL_RECYCLE": 1800,
+    "DB_POOL_PRE_PING": True
+}
+
+
+def _from_env(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, int):
+        return int(value)
+    return value
+
+
+def _sqlite_pragmas(journal_mode, synchronous, busy_timeout_ms):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+        if journal_mode:
+            cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+        if synchronous:
+            cursor.execute(f"PRAGMA synchronous = {synchronous}")
+        cursor.close()
+    return on_connect
+
+
+def init_app(app):
+    """
+    Select and tune the database, then bind `db` to the app
+
+    DATABASE_URL (environment) overrides SQLALCHEMY_DATABASE_URI, so the same
+    code runs on SQLite or a pooled server database. Every key in DEFAULTS can
+    be set in app config or, taking precedence, in the environment:
+        SQLITE_JOURNAL_MODE     - "WAL" (default), "DELETE", ...; None leaves it alone
+        SQLITE_SYNCHRONOUS      - "NORMAL" (default), "FULL", "OFF"
+        SQLITE_BUSY_TIMEOUT_MS  - lock wait before "database is locked" (default 5000)
+        DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT / DB_POOL_RECYCLE /
+        DB_POOL_PRE_PING        - connection pool settings (file and server databases)
+    Explicit SQLALCHEMY_ENGINE_OPTIONS entries win over the pool settings.
+    """
+    if os.environ.get("DATABASE_URL"):
+        app.config["SQLALCHEMY_DATABASE_URI"] = os.environ["DATABASE_URL"]
+    for key, default in DEFAULTS.items():
+        app.config[key] = _from_env(key, app.config.get(key, default))
+
+    url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    is_sqlite = url.get_backend_name() == "sqlite"
+    options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+    # In-memory SQLite uses a single shared connection; there is nothing to pool
+    if not (is_sqlite and url.database in (None, "", ":memory:")):
+        options.setdefault("pool_size", app.config["DB_POOL_SIZE"])
+        options.setdefault("max_overflow", app.config["DB_MAX_OVERFLOW"])
+        options.setdefault("pool_timeout", app.config["DB_POOL_TIMEOUT"])
+        options.setdefault("pool_recycle", app.config["DB_POOL_RECYCLE"])
+        options.setdefault("pool_pre_ping", app.config["DB_POOL_PRE_PING"])
+
+    db.init_app(app)
+
+    if is_sqlite:
+        pragmas = _sqlite_pragmas(app.config["SQLITE_JOURNAL_MODE"], app.config["SQLITE_SYNCHRONOUS"],
+                                  app.config["SQLITE_BUSY_TIMEOUT_MS"])
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, "connect", pragmas)
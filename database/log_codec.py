@@ -0,0 +1,237 @@
+import json
+import struct
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Compact request-log storage
+#
+# Each service registers the input fields it reads and the keys of its result
+# that hold model outputs. A logged input that has exactly those fields is
+# packed into `input_blob` as typed binary values in field order (see
+# pack_values); a result is reduced to its outputs in `result_blob`, and the
+# echoed input sections are rebuilt from the input on read. Anything that does not fit (extra fields,
+# error results, unusual types) is kept as compact JSON in input_data /
+# result_data. `schema_version` records which registered layout a row used;
+# NULL marks rows written before compact storage (verbose JSON text).
+
+SCHEMA_VERSION = 1
+
+schemas = {}
+
+_F32 = struct.Struct("<f")
+_LEN = struct.Struct("<H")
+
+# Placeholder prediction used when rebuilding a result's echoed sections
+_PLACEHOLDER = 0.0
+
+
+class LogSchema:
+    """Storage layout for one module's logged inputs and results"""
+
+    def __init__(self, module, fields, outputs, build_result, version):
+        self.module = module
+        self.fields = list(fields)
+        self.field_set = set(fields)
+        self.outputs = list(outputs)
+        self.build_result = build_result
+        self.version = version
+
+    def restore_result(self, input_data, outputs):
+        result = self.build_result(input_data, _PLACEHOLDER)
+        result.update(zip(self.outputs, outputs))
+        return result
+
+
+def register(module, fields, outputs, build_result, version=SCHEMA_VERSION):
+    """Declare which input fields and result keys a module logs"""
+    schemas[(module, version)] = LogSchema(module, fields, outputs, build_result, version)
+
+
+def _json_default(value):
+    # NumPy scalars from predict (np.int64, np.float32, ...) have .item(); no other type is expected
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def compact_json(value):
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=_json_default,
+                                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(value, separators=(",", ":"), default=_json_default)
+
+
+def loads(text):
+    """Parse stored JSON; rows written before orjson may hold NaN, which only the json module accepts"""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except ValueError:
+            pass
+    return json.loads(text)
+
+
+def pack_values(values):
+    """
+    Pack a flat list of JSON scalars; raises TypeError for anything else
+
+    Layout: one type tag per value, then every number in a single struct
+    block, then each string as a length-prefixed UTF-8 run.
+    """
+    tags = bytearray()
+    numbers = []
+    strings = []
+    for value in values:
+        if value is None:
+            tags += b"N"
+        elif value is True or value is False:
+            tags += b"T" if value else b"F"
+        elif isinstance(value, int):
+            if -2**31 <= value < 2**31:
+                tags += b"i"
+            elif -2**63 <= value < 2**63:
+                tags += b"q"
+            else:
+                raise TypeError("integer out of range")
+            numbers.append(value)
+        elif isinstance(value, float):
+            try:
+                exact = _F32.unpack(_F32.pack(value))[0] == value
+            except OverflowError:
+                exact = False
+            # Four bytes when float32 holds the value exactly (45.0, 6.5, ...)
+            tags += b"f" if exact else b"d"
+            numbers.append(value)
+        elif isinstance(value, str):
+            encoded = value.encode("utf-8")
+            if len(encoded) > 0xFFFF:
+                raise TypeError("string too long")
+            tags += b"s"
+            strings.append(_LEN.pack(len(encoded)) + encoded)
+        else:
+            raise TypeError(f"cannot pack {type(value).__name__}")
+    tags = bytes(tags)
+    return tags + _layout(tags)[0].pack(*numbers) + b"".join(strings)
+
+
+_layouts = {}
+_NUMERIC = frozenset("fdiq")
+_CONSTANTS = {"N": None, "T": True, "F": False}
+
+
+def _layout(tags):
+    """(struct for the number block, per-value tags, all numeric?) for a tag sequence; cached"""
+    layout = _layouts.get(tags)
+    if layout is None:
+        ops = tags.decode("ascii")
+        numeric = "".join(op for op in ops if op in _NUMERIC)
+        layout = _layouts[tags] = (struct.Struct("<" + numeric), ops, len(numeric) == len(ops))
+    return layout
+
+
+def unpack_values(blob, count):
+    """Inverse of pack_values for a blob holding `count` values"""
+    numbers_struct, ops, all_numeric = _layout(bytes(blob[:count]))
+    numbers = numbers_struct.unpack_from(blob, count)
+    if all_numeric:
+        return list(numbers)
+    numbers = iter(numbers)
+    offset = count + numbers_struct.size
+    values = []
+    for op in ops:
+        if op in _NUMERIC:
+            values.append(next(numbers))
+        elif op == "s":
+            size = _LEN.unpack_from(blob, offset)[0]
+            offset += 2
+            values.append(bytes(blob[offset:offset + size]).decode("utf-8"))
+            offset += size
+        elif op in _CONSTANTS:
+            values.append(_CONSTANTS[op])
+        else:
+            raise ValueError(f"Unknown value tag {op!r} in log blob")
+    return values
+
+
+def _pack_input(schema, input_data):
+    if not isinstance(input_data, dict) or input_data.keys() != schema.field_set:
+        return None
+    try:
+        return pack_values([input_data[field] for field in schema.fields])
+    except TypeError:
+        return None
+
+
+def _pack_result(schema, input_data, result_data):
+    if not isinstance(result_data, dict) or not all(key in result_data for key in schema.outputs):
+        return None
+    outputs = [result_data[key] for key in schema.outputs]
+    try:
+        blob = pack_values(outputs)
+        # Only drop the echoed sections if they can be rebuilt exactly
+        if schema.restore_result(input_data, unpack_values(blob, len(outputs))) != result_data:
+            return None
+    except Exception:
+        return None
+    return blob
+
+
+def encode(module, input_data, result_data, compact=True):
+    """Column values for one RequestLog row"""
+    schema = schemas.get((module, SCHEMA_VERSION)) if compact else None
+    if schema is None:
+        return {
+            "schema_version": None,
+            "input_data": json.dumps(input_data, default=_json_default),
+            "result_data": json.dumps(result_data, default=_json_default),
+            "input_blob": None,
+            "result_blob": None
+        }
+    input_blob = _pack_input(schema, input_data)
+    result_blob = _pack_result(schema, input_data, result_data)
+    return {
+        "schema_version": schema.version,
+        "input_data": None if input_blob is not None else compact_json(input_data),
+        "result_data": None if result_blob is not None else compact_json(result_data),
+        "input_blob": input_blob,
+        "result_blob": result_blob
+    }
+
+
+def _decode(module, schema_version, input_text, result_text, input_blob, result_blob):
+    if input_blob is None and result_blob is None:
+        return loads(input_text), loads(result_text)
+    schema = schemas[(module, schema_version)]
+    if input_blob is None:
+        input_data = loads(input_text)
+    else:
+        input_data = dict(zip(schema.fields, unpack_values(input_blob, len(schema.fields))))
+    if result_blob is None:
+        return input_data, loads(result_text)
+    return input_data, schema.restore_result(input_data, unpack_values(result_blob, len(schema.outputs)))
+
+
+def decode(log):
+    """Return (input, result) for a RequestLog row in any storage format"""
+    return _decode(log.module, log.schema_version, log.input_data, log.result_data,
+                   log.input_blob, log.result_blob)
+
+
+def decode_json(log):
+    """
+    Return (input, result) of a RequestLog row as JSON text
+
+    Parts stored as JSON text are returned as they are, without parsing;
+    packed parts are decoded and serialized compactly.
+    """
+    if log.input_blob is None and log.result_blob is None:
+        return log.input_data, log.result_data
+    input_data, result_data = decode(log)
+    return (log.input_data if log.input_blob is None else compact_json(input_data),
+            log.result_data if log.result_blob is None else compact_json(result_data))
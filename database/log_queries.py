@@ -0,0 +1,109 @@
+import base64
+from datetime import datetime, timezone
+
+from database.db import db
+from database import log_codec
+from models.db_models import RequestLog
+
+
+def parse_time(value):
+    """Parse an ISO 8601 timestamp into the naive UTC form RequestLog stores"""
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def encode_cursor(log):
+    """Opaque cursor pointing just past this row in newest-first order"""
+    raw = f"{log.timestamp.isoformat()}|{log.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on anything malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, _, log_id = base64.urlsafe_b64decode(padded.encode()).decode().partition("|")
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def log_page_query(module=None, since=None, until=None, after=None, limit=50):
+    """
+    Select one page of logs, newest first
+
+    Rows are ordered by (timestamp, id) so the (module, timestamp, id) index
+    serves both the filter and the sort. `after` is a decoded cursor; the page
+    starts strictly below it, so paging never rescans earlier rows.
+    """
+    query = db.select(RequestLog)
+    if module:
+        query = query.where(RequestLog.module == module)
+    if since is not None:
+        query = query.where(RequestLog.timestamp >= since)
+    if until is not None:
+        query = query.where(RequestLog.timestamp < until)
+    if after is not None:
+        # A row-value comparison keeps this a single index range scan; the
+        # equivalent OR of two conditions is an order of magnitude slower on SQLite
+        query = query.where(db.tuple_(RequestLog.timestamp, RequestLog.id) < db.tuple_(*after))
+    return query.order_by(RequestLog.timestamp.desc(), RequestLog.id.desc()).limit(limit)
+
+
+def fetch_page(module=None, since=None, until=None, after=None, limit=50):
+    """Return (logs, next_cursor); next_cursor is None on the last page"""
+    # One extra row tells us whether another page exists
+    logs = db.session.execute(log_page_query(module, since, until, after, limit + 1)).scalars().all()
+    if len(logs) > limit:
+        return logs[:limit], encode_cursor(logs[limit - 1])
+    return logs, None
+
+
+def serialize(log):
+    input_data, result_data = log_codec.decode(log)
+    return {
+        "id": log.id,
+        "module": log.module,
+        "input": input_data,
+        "result": result_data,
+        "model_version": log.model_version,
+        "timestamp": log.timestamp.isoformat()
+    }
+
+
+def serialize_json(log):
+    """serialize() as JSON text, with the stored input and result spliced in verbatim"""
+    input_text, result_text = log_codec.decode_json(log)
+    return (f'{{"id":{log.id},"input":{input_text},"model_version":{log_codec.compact_json(log.model_version)},'
+            f'"module":{log_codec.compact_json(log.module)},"result":{result_text},'
+            f'"timestamp":"{log.timestamp.isoformat()}"}}')
+
+
+def page_json(logs, next_cursor):
+    """The /api/logs response body for one page"""
+    items = ",".join(serialize_json(log) for log in logs)
+    return f'{{"count":{len(logs)},"logs":[{items}],"next_cursor":{log_codec.compact_json(next_cursor)}}}\n'
+
+
+def iter_ndjson(module=None, since=None, until=None, after=None, limit=None, page_size=1000):
+    """
+    Yield logs as newline-delimited JSON, one keyset page at a time
+
+    Only one page is held in memory, and each page is a short query, so an
+    export of any size neither grows the process nor holds a long read lock.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        logs = db.session.execute(log_page_query(module, since, until, after, size)).scalars().all()
+        lines = [serialize_json(log) + "\n" for log in logs]
+        if logs:
+            after = (logs[-1].timestamp, logs[-1].id)
+        db.session.close()
+        yield "".join(lines)
+        if len(logs) < size:
+            return
+        if remaining is not None:
+            remaining -= len(logs)
@@ -0,0 +1,249 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from database.db import db
+from database import log_codec, rollups
+from models.db_models import RequestLog
+
+
+class LogWriter:
+    """
+    Write-behind persistence for RequestLog rows
+
+    Routes enqueue rows and return straight away; a background worker drains
+    the bounded queue and bulk-inserts each batch in a single transaction.
+    Config keys (all optional):
+        LOG_WRITE_BEHIND       - False commits inline like before (default True)
+        LOG_QUEUE_SIZE         - max rows waiting to be written (default 10000)
+        LOG_BATCH_SIZE         - max rows per transaction (default 500)
+        LOG_FLUSH_INTERVAL     - seconds to wait for a batch to fill (default 0.5)
+        LOG_QUEUE_FULL_POLICY  - "drop" counts and discards, "block" waits (default "drop")
+        LOG_BLOCK_TIMEOUT      - seconds "block" waits before dropping (default 1.0)
+        LOG_COMPACT_STORAGE    - store packed inputs and outputs only (default True)
+        LOG_ROLLUP_ON_WRITE    - add each batch to the LogRollup summaries in the
+                                 same transaction as its insert (default True)
+
+    While `pressure()` (set by services/admission.py) is true, the server is
+    in degraded mode: rows are shed, counted but never queued or written.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.compact = True
+        self.rollup = True
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.flush_seconds = 0.0
+        self.pressure = None
+        self.shed = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("LOG_WRITE_BEHIND", True)
+        app.config.setdefault("LOG_QUEUE_SIZE", 10000)
+        app.config.setdefault("LOG_BATCH_SIZE", 500)
+        app.config.setdefault("LOG_FLUSH_INTERVAL", 0.5)
+        app.config.setdefault("LOG_QUEUE_FULL_POLICY", "drop")
+        app.config.setdefault("LOG_BLOCK_TIMEOUT", 1.0)
+        app.config.setdefault("LOG_COMPACT_STORAGE", True)
+        app.config.setdefault("LOG_ROLLUP_ON_WRITE", True)
+
+        self.app = app
+        self.enabled = bool(app.config["LOG_WRITE_BEHIND"])
+        self.queue_size = int(app.config["LOG_QUEUE_SIZE"])
+        self.batch_size = int(app.config["LOG_BATCH_SIZE"])
+        self.flush_interval = float(app.config["LOG_FLUSH_INTERVAL"])
+        self.full_policy = app.config["LOG_QUEUE_FULL_POLICY"]
+        self.block_timeout = float(app.config["LOG_BLOCK_TIMEOUT"])
+        self.compact = bool(app.config["LOG_COMPACT_STORAGE"])
+        self.rollup = bool(app.config["LOG_ROLLUP_ON_WRITE"])
+        app.extensions["log_writer"] = self
+        atexit.register(self.stop)
+
+    def _ensure_worker(self):
+        """Start the worker on first use, and again in each forked child process"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="request-log-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, module, input_data, result_data, model_version=None):
+        """Queue one row for writing; returns False if it was dropped"""
+        self._ensure_worker()
+        row = (module, input_data, result_data, model_version, datetime.utcnow())
+        try:
+            if self.full_policy == "block":
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        # Request threads share these counters; += on an attribute is not atomic
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def shedding(self, count):
+        """True, counting the `count` rows as shed, while the server is in degraded mode"""
+        if self.pressure is None or not self.pressure():
+            return False
+        with self._lock:
+            self.shed += count
+        return True
+
+    def _take_batch(self):
+        """Wait for the first row, then keep collecting until the batch is full or the interval ends"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self._stop.is_set():
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        rows = []
+        totals = {} if self.rollup else None
+        for module, input_data, result_data, model_version, timestamp in batch:
+            try:
+                row = log_codec.encode(module, input_data, result_data, self.compact)
+                row["module"] = module
+                row["timestamp"] = timestamp
+                row["model_version"] = model_version
+                rows.append(row)
+            except Exception as e:
+                self.failed += 1
+                print(f"Warning: Could not serialize request log: {e}")
+                continue
+            if totals is not None:
+                rollups.aggregate([(module, timestamp, input_data, result_data)], totals)
+                row["summarized"] = True
+
+        started = time.perf_counter()
+        try:
+            if rows:
+                with self.app.app_context():
+                    try:
+                        insert_logs(rows, totals)
+                    except Exception as e:
+                        if totals is None:
+                            raise
+                        # Never lose logs over the summaries; retention or
+                        # `flask backfill-rollups` counts these rows later
+                        db.session.rollback()
+                        print(f"Warning: Could not update log rollups: {e}")
+                        for row in rows:
+                            row["summarized"] = None
+                        insert_logs(rows)
+                self.written += len(rows)
+                self.flushes += 1
+                self.flush_seconds += time.perf_counter() - started
+        except Exception as e:
+            self.failed += len(rows)
+            print(f"Warning: Could not write {len(rows)} request logs: {e}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued row has been written"""
+        if self._queue is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def stop(self, timeout=10.0):
+        """Write out whatever is still queued and stop the worker"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "shed": self.shed,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "flush_seconds": round(self.flush_seconds, 6)
+        }
+
+
+log_writer = LogWriter()
+
+
+def log_request(module, input_data, result_data, model_version=None):
+    """Persist one request/result pair, write-behind unless LOG_WRITE_BEHIND is off"""
+    log_requests(module, [(input_data, result_data)], model_version)
+
+
+def insert_logs(rows, totals=None):
+    """Bulk-insert encoded rows, plus their rollup totals, in one transaction"""
+    db.session.execute(db.insert(RequestLog), rows)
+    rollups.merge(totals)
+    db.session.commit()
+
+
+def log_requests(module, pairs, model_version=None):
+    """Persist many request/result pairs for the same module, served by the same model version"""
+    writer = current_app.extensions["log_writer"]
+    if writer.shedding(len(pairs)):
+        return
+    if writer.enabled:
+        for input_data, result_data in pairs:
+            writer.submit(module, input_data, result_data, model_version)
+        return
+
+    timestamp = datetime.utcnow()
+    rows = []
+    for input_data, result_data in pairs:
+        row = log_codec.encode(module, input_data, result_data, writer.compact)
+        row["module"] = module
+        row["timestamp"] = timestamp
+        row["model_version"] = model_version
+        row["summarized"] = True if writer.rollup else None
+        rows.append(row)
+    totals = None
+    if writer.rollup:
+        totals = rollups.aggregate((module, timestamp, input_data, result_data) for input_data, result_data in pairs)
+    insert_logs(rows, totals)
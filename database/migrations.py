@@ -0,0 +1,108 @@
+import json
+
+from database.db import db
+from database import log_codec, rollups
+from models.db_models import RequestLog
+
+
+def upgrade():
+    """
+    Bring the schema up to date; safe to run on every start
+
+    create_all() only creates missing tables, so columns and indexes added to
+    an existing table's model are created here separately. New columns must
+    be nullable. Returns the names of what was created.
+    """
+    db.create_all()
+    inspector = db.inspect(db.engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                with db.engine.begin() as connection:
+                    connection.execute(db.text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                created.append(f"{table.name}.{column.name}")
+        for index in table.indexes:
+            if not inspector.has_index(table.name, index.name):
+                index.create(db.engine)
+                created.append(index.name)
+    return created
+
+
+def compact_logs(batch_size=1000):
+    """
+    Rewrite legacy JSON request logs in the compact format, in id order and
+    one transaction per batch so it can run against a live database.
+    Returns the number of rows rewritten.
+    """
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.session.execute(
+            db.select(RequestLog.id, RequestLog.module, RequestLog.input_data, RequestLog.result_data)
+            .where(RequestLog.schema_version.is_(None), RequestLog.id > last_id)
+            .order_by(RequestLog.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return total
+        updates = []
+        for log_id, module, input_data, result_data in rows:
+            values = log_codec.encode(module, json.loads(input_data), json.loads(result_data))
+            if values["schema_version"] is None:
+                # No schema for this module: keep the text, just without the whitespace
+                values["schema_version"] = log_codec.SCHEMA_VERSION
+                values["input_data"] = log_codec.compact_json(json.loads(input_data))
+                values["result_data"] = log_codec.compact_json(json.loads(result_data))
+            values["id"] = log_id
+            updates.append(values)
+        db.session.execute(db.update(RequestLog), updates)
+        db.session.commit()
+        last_id = rows[-1].id
+        total += len(rows)
+
+
+def backfill_rollups(batch_size=1000):
+    """
+    Add request logs the log writer has not counted yet (rows from before
+    LOG_ROLLUP_ON_WRITE, or whose rollup update failed) to LogRollup. Each
+    batch's rollup update commits together with marking its rows summarized,
+    so it can be stopped and re-run. Returns the number of rows added.
+    """
+    last_id = 0
+    total = 0
+    while True:
+        logs = db.session.execute(
+            db.select(RequestLog.id, RequestLog.module, RequestLog.timestamp, RequestLog.schema_version,
+                      RequestLog.input_data, RequestLog.result_data, RequestLog.input_blob,
+                      RequestLog.result_blob)
+            .where(RequestLog.summarized.is_(None), RequestLog.id > last_id)
+            .order_by(RequestLog.id)
+            .limit(batch_size)
+        ).all()
+        if not logs:
+            return total
+        rows = []
+        for log in logs:
+            try:
+                input_data, result_data = log_codec.decode(log)
+            except Exception as e:
+                print(f"Warning: Could not decode request log {log.id}: {e}")
+                input_data, result_data = {}, {"error": f"Undecodable log: {e}"}
+            rows.append((log.module, log.timestamp, input_data, result_data))
+        rollups.merge(rollups.aggregate(rows))
+        db.session.execute(db.update(RequestLog)
+                           .where(RequestLog.id.in_([log.id for log in logs]))
+                           .values(summarized=True))
+        db.session.commit()
+        last_id = logs[-1].id
+        total += len(logs)
+
+
+def vacuum():
+    """Return the space freed by compact_logs to the filesystem (SQLite only)"""
+    if db.engine.dialect.name == "sqlite":
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(db.text("VACUUM"))
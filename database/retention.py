@@ -0,0 +1,156 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app
+
+from database.db import db
+from database import log_codec, rollups
+from models.db_models import RequestLog
+
+
+def init_app(app):
+    """
+    Retention settings (all optional):
+        LOG_RETENTION_DAYS        - {module: days}; rows older than this are rolled up,
+                                    archived and deleted. Modules not listed (or None) keep
+                                    everything (default {})
+        LOG_RETENTION_BATCH_SIZE  - rows per delete transaction (default 500)
+        LOG_ARCHIVE_CHUNK_SIZE    - rows per archive file (default 10000)
+        LOG_RETENTION_PAUSE       - seconds to sleep between batches so live writers
+                                    get the lock (default 0.05)
+        LOG_ARCHIVE_DIR           - where archived rows go; None deletes without archiving
+                                    (default <instance>/log_archive)
+    """
+    app.config.setdefault("LOG_RETENTION_DAYS", {})
+    app.config.setdefault("LOG_RETENTION_BATCH_SIZE", 500)
+    app.config.setdefault("LOG_ARCHIVE_CHUNK_SIZE", 10000)
+    app.config.setdefault("LOG_RETENTION_PAUSE", 0.05)
+    app.config.setdefault("LOG_ARCHIVE_DIR", os.path.join(app.instance_path, "log_archive"))
+
+
+def _column(values):
+    """One archive column: float64 (NaN = missing) if every value is numeric, else strings"""
+    if all(value is None or (isinstance(value, (int, float)) and not isinstance(value, bool)) for value in values):
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    return np.array(["" if value is None else value if isinstance(value, str) else json.dumps(value)
+                     for value in values], dtype=str)
+
+
+def write_archive(directory, module, rows):
+    """
+    Write (id, timestamp, input, result, model_version) rows to a compressed
+    columnar .npz and return its path
+
+    Columns: id, timestamp, model_version, input.<field> for every input field
+    and result.<key> for the model outputs (and error). The echoed input
+    sections of a result are not stored; they can be rebuilt from the input columns.
+    """
+    schema = log_codec.schemas.get((module, log_codec.SCHEMA_VERSION))
+    input_keys = {}
+    result_keys = dict.fromkeys(schema.outputs + ["error"]) if schema else {}
+    for _, _, input_data, result_data, _ in rows:
+        input_keys.update(dict.fromkeys(input_data if isinstance(input_data, dict) else ()))
+        if schema is None and isinstance(result_data, dict):
+            result_keys.update(dict.fromkeys(result_data))
+
+    columns = {
+        "id": np.array([row[0] for row in rows], dtype=np.int64),
+        "timestamp": np.array([row[1] for row in rows], dtype="datetime64[us]"),
+        "model_version": np.array([row[4] or "" for row in rows], dtype=str)
+    }
+    for key in input_keys:
+        columns[f"input.{key}"] = _column([data.get(key) if isinstance(data, dict) else None for _, _, data, _, _ in rows])
+    for key in result_keys:
+        columns[f"result.{key}"] = _column([data.get(key) if isinstance(data, dict) else None for _, _, _, data, _ in rows])
+
+    folder = os.path.join(directory, module)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{module}_{rows[0][1]:%Y%m%dT%H%M%S}_{rows[-1][0]}.npz")
+    # Written under a temporary name so a crash never leaves a truncated archive
+    with open(path + ".tmp", "wb") as f:
+        np.savez_compressed(f, **columns)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def _decode(log):
+    try:
+        return log_codec.decode(log)
+    except Exception as e:
+        print(f"Warning: Could not decode request log {log.id}: {e}")
+        return {}, {"error": f"Undecodable log: {e}"}
+
+
+def expired_counts(now=None):
+    """Rows per module that prune() would remove"""
+    now = now or datetime.utcnow()
+    counts = {}
+    for module, days in current_app.config["LOG_RETENTION_DAYS"].items():
+        if days is None:
+            continue
+        cutoff = now - timedelta(days=days)
+        counts[module] = db.session.execute(
+            db.select(db.func.count()).select_from(RequestLog)
+            .where(RequestLog.module == module, RequestLog.timestamp < cutoff)
+        ).scalar()
+    return counts
+
+
+def prune(now=None, modules=None):
+    """
+    Roll up, archive and delete rows past their module's retention period
+
+    Works oldest-first. Each chunk of LOG_ARCHIVE_CHUNK_SIZE rows is archived
+    to one file, then deleted LOG_RETENTION_BATCH_SIZE rows per transaction;
+    a batch's rollup update commits together with its delete, so every row is
+    summarised exactly once; rows the log writer already counted (summarized)
+    are only deleted. If a run stops part-way, the next run archives the
+    remaining rows of that chunk again (archive ids identify duplicates).
+    Run it from one place (cron, `flask prune-logs`), not in every worker and
+    not alongside `flask backfill-rollups`.
+    """
+    config = current_app.config
+    now = now or datetime.utcnow()
+    batch_size = int(config["LOG_RETENTION_BATCH_SIZE"])
+    chunk_size = int(config["LOG_ARCHIVE_CHUNK_SIZE"])
+    pause = float(config["LOG_RETENTION_PAUSE"])
+    archive_dir = config["LOG_ARCHIVE_DIR"]
+    report = {}
+    for module, days in config["LOG_RETENTION_DAYS"].items():
+        if days is None or (modules and module not in modules):
+            continue
+        cutoff = now - timedelta(days=days)
+        stats = report[module] = {"cutoff": cutoff.isoformat(), "deleted": 0, "archives": []}
+        while True:
+            # Plain rows rather than ORM objects: nothing to track or expire at each commit
+            logs = db.session.execute(
+                db.select(RequestLog.id, RequestLog.module, RequestLog.timestamp, RequestLog.schema_version,
+                          RequestLog.input_data, RequestLog.result_data, RequestLog.input_blob,
+                          RequestLog.result_blob, RequestLog.model_version, RequestLog.summarized)
+                .where(RequestLog.module == module, RequestLog.timestamp < cutoff)
+                .order_by(RequestLog.timestamp, RequestLog.id)
+                .limit(chunk_size)
+            ).all()
+            if not logs:
+                break
+            decoded = [(log.id, log.timestamp) + _decode(log) + (log.model_version, log.summarized) for log in logs]
+            if archive_dir:
+                stats["archives"].append(write_archive(archive_dir, module, [row[:5] for row in decoded]))
+
+            for start in range(0, len(decoded), batch_size):
+                batch = decoded[start:start + batch_size]
+                rollups.merge(rollups.aggregate(
+                    (module, timestamp, input_data, result_data)
+                    for _, timestamp, input_data, result_data, _, summarized in batch if not summarized
+                ))
+                ids = [row[0] for row in batch]
+                db.session.execute(db.delete(RequestLog).where(RequestLog.id.in_(ids)))
+                db.session.commit()
+                stats["deleted"] += len(batch)
+                time.sleep(pause)
+            if len(decoded) < chunk_size:
+                break
+    return report
@@ -0,0 +1,274 @@
+from database.db import db
+from models.db_models import LogRollup
+
+GRANULARITIES = ("hour", "day")
+
+specs = {}
+
+
+class RollupSpec:
+    """
+    What one module's logs are summarised by
+
+    dimensions: tuples of keys, each looked up in the result first and then
+                the input, e.g. ("recommended_crop",) or ("crop_type", "season")
+    value:      result key of a numeric output to keep sum/min/max of, or None
+    """
+
+    def __init__(self, module, dimensions=(), value=None):
+        self.module = module
+        self.dimensions = [tuple(keys) for keys in dimensions]
+        self.value = value
+
+    def observations(self, input_data, result_data):
+        """(dimension, label, value) triples a single log row contributes to"""
+        failed = not isinstance(result_data, dict) or "error" in result_data
+        value = None
+        if not failed and self.value is not None:
+            candidate = result_data.get(self.value)
+            if isinstance(candidate, (int, float)) and not isinstance(candidate, bool):
+                value = float(candidate)
+
+        observations = [("", "", value), ("outcome", "error" if failed else "ok", None)]
+        if failed or not isinstance(input_data, dict):
+            return observations
+        for keys in self.dimensions:
+            labels = []
+            for key in keys:
+                source = result_data if key in result_data else input_data
+                if key not in source:
+                    break
+                labels.append(str(source[key]))
+            else:
+                observations.append((",".join(keys), ",".join(labels)[:200], value))
+        return observations
+
+
+def register(module, dimensions=(), value=None):
+    """Declare the dimensions and numeric output a module's logs are rolled up by"""
+    specs[module] = RollupSpec(module, dimensions, value)
+
+
+def bucket_start(timestamp, granularity):
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def aggregate(rows, totals=None):
+    """
+    Fold (module, timestamp, input, result) rows into
+    {(module, granularity, bucket_start, dimension, label): [count, value_count, sum, min, max]}
+    """
+    if totals is None:
+        totals = {}
+    for module, timestamp, input_data, result_data in rows:
+        spec = specs.get(module) or RollupSpec(module)
+        observations = spec.observations(input_data, result_data)
+        for granularity in GRANULARITIES:
+            start = bucket_start(timestamp, granularity)
+            for dimension, label, value in observations:
+                key = (module, granularity, start, dimension, label)
+                entry = totals.get(key)
+                if entry is None:
+                    entry = totals[key] = [0, 0, 0.0, None, None]
+                entry[0] += 1
+                if value is not None:
+                    entry[1] += 1
+                    entry[2] += value
+                    entry[3] = value if entry[3] is None else min(entry[3], value)
+                    entry[4] = value if entry[4] is None else max(entry[4], value)
+    return totals
+
+
+def _upsert(totals):
+    """
+    Merge with one INSERT ... ON CONFLICT DO UPDATE; the increments happen in
+    the database, so concurrent writers in other processes never lose counts
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    statement = insert(LogRollup)
+    new, old = statement.excluded, LogRollup.__table__.c
+    statement = statement.on_conflict_do_update(
+        index_elements=["module", "granularity", "bucket_start", "dimension", "label"],
+        set_={
+            "count": old.count + new.count,
+            "value_count": old.value_count + new.value_count,
+            "value_sum": old.value_sum + new.value_sum,
+            "value_min": db.case((new.value_min.is_(None), old.value_min),
+                                 ((old.value_min.is_(None)) | (new.value_min < old.value_min), new.value_min),
+                                 else_=old.value_min),
+            "value_max": db.case((new.value_max.is_(None), old.value_max),
+                                 ((old.value_max.is_(None)) | (new.value_max > old.value_max), new.value_max),
+                                 else_=old.value_max)
+        }
+    )
+    db.session.execute(statement, [
+        {"module": module, "granularity": granularity, "bucket_start": start, "dimension": dimension,
+         "label": label, "count": count, "value_count": value_count, "value_sum": value_sum,
+         "value_min": value_min, "value_max": value_max}
+        for (module, granularity, start, dimension, label), (count, value_count, value_sum, value_min, value_max)
+        in totals.items()
+    ])
+
+
+def merge(totals):
+    """
+    Add aggregated totals into LogRollup in the current session; the caller commits
+    SQLite and PostgreSQL upsert atomically; other databases read, then bulk
+    insert new buckets and bulk update existing ones
+    """
+    if not totals:
+        return
+    if db.session.get_bind().dialect.name in ("sqlite", "postgresql"):
+        _upsert(totals)
+        return
+    wanted = {}
+    for module, granularity, start, _, _ in totals:
+        wanted.setdefault((module, granularity), set()).add(start)
+    existing = {}
+    for (module, granularity), starts in wanted.items():
+        for row in db.session.execute(
+            db.select(LogRollup.id, LogRollup.module, LogRollup.granularity, LogRollup.bucket_start,
+                      LogRollup.dimension, LogRollup.label, LogRollup.count, LogRollup.value_count,
+                      LogRollup.value_sum, LogRollup.value_min, LogRollup.value_max).where(
+                LogRollup.module == module,
+                LogRollup.granularity == granularity,
+                LogRollup.bucket_start.in_(starts)
+            )
+        ):
+            existing[(row.module, row.granularity, row.bucket_start, row.dimension, row.label)] = row
+
+    inserts = []
+    updates = []
+    for key, (count, value_count, value_sum, value_min, value_max) in totals.items():
+        row = existing.get(key)
+        if row is None:
+            module, granularity, start, dimension, label = key
+            inserts.append({
+                "module": module, "granularity": granularity, "bucket_start": start,
+                "dimension": dimension, "label": label, "count": count, "value_count": value_count,
+                "value_sum": value_sum, "value_min": value_min, "value_max": value_max
+            })
+            continue
+        if value_min is not None:
+            value_min = value_min if row.value_min is None else min(row.value_min, value_min)
+            value_max = value_max if row.value_max is None else max(row.value_max, value_max)
+        else:
+            value_min, value_max = row.value_min, row.value_max
+        updates.append({
+            "id": row.id, "count": row.count + count, "value_count": row.value_count + value_count,
+            "value_sum": row.value_sum + value_sum, "value_min": value_min, "value_max": value_max
+        })
+    if inserts:
+        db.session.execute(db.insert(LogRollup), inserts)
+    if updates:
+        db.session.execute(db.update(LogRollup), updates)
+
+
+def serialize(rollup):
+    return {
+        "module": rollup.module,
+        "bucket_start": rollup.bucket_start.isoformat(),
+        "dimension": rollup.dimension,
+        "label": rollup.label,
+        "count": rollup.count,
+        "value_count": rollup.value_count,
+        "mean": rollup.value_sum / rollup.value_count if rollup.value_count else None,
+        "min": rollup.value_min,
+        "max": rollup.value_max
+    }
+
+
+def query(module=None, granularity="day", dimension=None, since=None, until=None):
+    """Rollup rows in time order; served by the unique (module, granularity, bucket_start, ...) index"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    statement = db.select(LogRollup).where(LogRollup.granularity == granularity)
+    if module:
+        statement = statement.where(LogRollup.module == module)
+    if dimension is not None:
+        statement = statement.where(LogRollup.dimension == dimension)
+    if since is not None:
+        statement = statement.where(LogRollup.bucket_start >= bucket_start(since, granularity))
+    if until is not None:
+        statement = statement.where(LogRollup.bucket_start < until)
+    statement = statement.order_by(LogRollup.module, LogRollup.bucket_start, LogRollup.dimension, LogRollup.label)
+    return [serialize(rollup) for rollup in db.session.execute(statement).scalars()]
+
+
+PERIODS = ("hour", "day", "month", "year", "all")
+
+
+def _period_key(start, period):
+    if period == "hour":
+        return start.isoformat()
+    if period == "day":
+        return start.date().isoformat()
+    if period == "month":
+        return f"{start:%Y-%m}"
+    if period == "year":
+        return f"{start:%Y}"
+    return "all"
+
+
+def summarize(module, dimension="", period="day", since=None, until=None, top=None):
+    """
+    Counts and value statistics per period and label, read from LogRollup only
+
+    Hourly periods come from the hourly rollups, everything else from the
+    daily ones; month/year/all add the daily buckets up. `top` keeps the N
+    most frequent labels of each period. Returns periods oldest first.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    if top is not None and top < 1:
+        raise ValueError("top must be positive")
+    granularity = "hour" if period == "hour" else "day"
+    statement = db.select(
+        LogRollup.bucket_start, LogRollup.label, LogRollup.count, LogRollup.value_count,
+        LogRollup.value_sum, LogRollup.value_min, LogRollup.value_max
+    ).where(LogRollup.module == module, LogRollup.granularity == granularity, LogRollup.dimension == dimension)
+    if since is not None:
+        statement = statement.where(LogRollup.bucket_start >= bucket_start(since, granularity))
+    if until is not None:
+        statement = statement.where(LogRollup.bucket_start < until)
+
+    periods = {}
+    keys = {}
+    for start, label, count, value_count, value_sum, value_min, value_max in db.session.execute(statement):
+        key = keys.get(start)
+        if key is None:
+            key = keys[start] = _period_key(start, period)
+        labels = periods.setdefault(key, {})
+        entry = labels.get(label)
+        if entry is None:
+            labels[label] = [count, value_count, value_sum, value_min, value_max]
+            continue
+        entry[0] += count
+        entry[1] += value_count
+        entry[2] += value_sum
+        if value_min is not None:
+            entry[3] = value_min if entry[3] is None else min(entry[3], value_min)
+            entry[4] = value_max if entry[4] is None else max(entry[4], value_max)
+
+    result = []
+    for key in sorted(periods):
+        labels = periods[key]
+        total = sum(entry[0] for entry in labels.values())
+        ranked = sorted(labels.items(), key=lambda item: (-item[1][0], item[0]))
+        groups = [{
+            "label": label,
+            "count": count,
+            "share": count / total if total else None,
+            "value_count": value_count,
+            "mean": value_sum / value_count if value_count else None,
+            "min": value_min,
+            "max": value_max
+        } for label, (count, value_count, value_sum, value_min, value_max) in ranked[:top]]
+        result.append({"period": key, "count": total, "groups": groups})
+    return result
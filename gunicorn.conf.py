@@ -0,0 +1,97 @@
+"""
+Gunicorn settings for serving wsgi:app
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden from the environment:
+    BIND / PORT                 - listen address (default 0.0.0.0:8000)
+    WEB_CONCURRENCY             - worker processes (default: one per available CPU core)
+    GUNICORN_THREADS            - threads per worker (default 4)
+    GUNICORN_KEEPALIVE          - seconds an idle keep-alive connection stays open (default 5)
+    GUNICORN_TIMEOUT            - seconds before a silent worker is killed and replaced (default 60)
+    GUNICORN_GRACEFUL_TIMEOUT   - seconds workers get to finish requests on reload/stop (default 30)
+    GUNICORN_MAX_REQUESTS       - recycle a worker after this many requests, 0 = never (default 0)
+    GUNICORN_PRELOAD            - load the app, and the models, once before forking (default true)
+
+`kill -HUP <master>` replaces the workers gracefully. With preload on they are
+forked from the already-loaded master, so deploying new code needs a fresh
+master: `kill -USR2 <master>` starts one alongside the old, then
+`kill -TERM <old master>` once it is serving. Model files replaced on disk are
+swapped in by each worker (MODEL_WATCH_INTERVAL); those copies are private to
+the worker rather than shared with the master until the next fresh master.
+"""
+import os
+
+
+def _env(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return type(default)(value)
+
+
+def _cores():
+    # Cores this process may run on, which a container or taskset can limit
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+
+# Predictions are CPU-bound and hold the GIL, so cores are scaled with
+# processes; the threads overlap request parsing, socket I/O and the
+# NumPy/sklearn calls that release the GIL
+workers = _env("WEB_CONCURRENCY", _cores())
+worker_class = "gthread"
+threads = _env("GUNICORN_THREADS", 4)
+# Each worker's inference pool gets its share of the cores (see services/process_pool.py)
+os.environ.setdefault("WEB_CONCURRENCY", str(workers))
+# A module may use every request thread unless ADMISSION_LIMITS caps it
+os.environ.setdefault("FLASK_ADMISSION_DEFAULT_LIMIT", str(threads))
+
+keepalive = _env("GUNICORN_KEEPALIVE", 5)
+timeout = _env("GUNICORN_TIMEOUT", 60)
+graceful_timeout = _env("GUNICORN_GRACEFUL_TIMEOUT", 30)
+max_requests = _env("GUNICORN_MAX_REQUESTS", 0)
+max_requests_jitter = max_requests // 10
+
+preload_app = _env("GUNICORN_PRELOAD", True)
+if preload_app:
+    # Load every model in the master, before fork, so workers share its pages
+    os.environ.setdefault("FLASK_MODEL_WARMUP", "eager")
+
+# Worker heartbeats on tmpfs; a disk-backed /tmp can stall them in containers
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG")  # "-" for stdout; off by default
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    """Drop database connections inherited from the master; each worker opens its own"""
+    if not server.cfg.preload_app:
+        return
+    from database.db import db
+    app = server.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    """Start this worker's inference pool (INFERENCE_PROCESSES) before it accepts requests"""
+    from services.process_pool import inference_pool
+    inference_pool.warm_up()
+
+
+def worker_exit(server, worker):
+    """Write out request logs still queued in this worker and stop its inference pool"""
+    from database.log_writer import log_writer
+    from services.process_pool import inference_pool
+    log_writer.stop()
+    inference_pool.shutdown()
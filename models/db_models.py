@@ -4,6 +4,38 @@ from datetime import datetime
 class RequestLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     module = db.Column(db.String(50))  # crop / fertilizer / yield / dosage
-    input_data = db.Column(db.Text)    # JSON input
-    result_data = db.Column(db.Text)   # JSON output
+    input_data = db.Column(db.Text)    # JSON input, when it is not packed
+    result_data = db.Column(db.Text)   # JSON output, when it is not packed
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    schema_version = db.Column(db.Integer)    # see database/log_codec.py; NULL = legacy JSON row
+    input_blob = db.Column(db.LargeBinary)    # packed input fields
+    result_blob = db.Column(db.LargeBinary)   # packed model outputs only
+    summarized = db.Column(db.Boolean)        # already counted in LogRollup; NULL = not yet
+    model_version = db.Column(db.String(32))  # digest of the model artifact that served it; NULL = unknown
+
+    # Log reads filter by module and page newest-first on (timestamp, id)
+    __table_args__ = (
+        db.Index("ix_request_log_module_timestamp", "module", "timestamp", "id"),
+        db.Index("ix_request_log_timestamp", "timestamp", "id"),
+    )
+
+class LogRollup(db.Model):
+    """Aggregates of request logs per module, time bucket and dimension value"""
+    id = db.Column(db.Integer, primary_key=True)
+    module = db.Column(db.String(50), nullable=False)
+    granularity = db.Column(db.String(10), nullable=False)    # hour / day
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    dimension = db.Column(db.String(100), nullable=False)     # e.g. "recommended_crop", "crop_type,season"; "" = all rows
+    label = db.Column(db.String(200), nullable=False)         # e.g. "rice", "rice,summer"
+    count = db.Column(db.Integer, nullable=False, default=0)  # rows in the bucket
+    value_count = db.Column(db.Integer, nullable=False, default=0)  # rows that had a numeric output
+    value_sum = db.Column(db.Float, nullable=False, default=0.0)
+    value_min = db.Column(db.Float)
+    value_max = db.Column(db.Float)
+
+    __table_args__ = (
+        db.UniqueConstraint("module", "granularity", "bucket_start", "dimension", "label",
+                            name="uq_log_rollup_bucket"),
+        # /api/analytics reads one dimension of one module over a time range
+        db.Index("ix_log_rollup_dimension", "module", "granularity", "dimension", "bucket_start"),
+    )
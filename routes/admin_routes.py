@@ -0,0 +1,78 @@
+import hmac
+
+from flask import Blueprint, request, jsonify, current_app
+from services.model_registry import registry, process_memory
+
+admin_bp = Blueprint("admin", __name__)
+
+
+def _unauthorized():
+    """The error response unless the request carries MODEL_ADMIN_TOKEN as a bearer token"""
+    token = current_app.config.get("MODEL_ADMIN_TOKEN")
+    if not token:
+        return jsonify({"error": "Model administration is disabled; set MODEL_ADMIN_TOKEN"}), 403
+    scheme, _, given = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(given.encode(), str(token).encode()):
+        return jsonify({"error": "Invalid or missing admin token"}), 401
+    return None
+
+
+def _loading(name, version):
+    return jsonify({"model": name, "version": version, "status": "loading"}), 202
+
+@admin_bp.route("/api/admin/models", methods=["GET"])
+def list_model_versions():
+    """
+    Get each model's active version, the versions this worker loaded (with
+    load time, memory footprint and status) and the archived artifacts
+    """
+    return jsonify({"models": registry.versions(), "process": process_memory()})
+
+@admin_bp.route("/api/admin/models/<name>", methods=["POST"])
+def upload_model(name):
+    """
+    Upload a new artifact (raw body, or multipart field "artifact"); it is
+    archived, then loaded and validated in the background and activated if it passes
+    """
+    error = _unauthorized()
+    if error:
+        return error
+    if name not in registry.names():
+        return jsonify({"error": f"Unknown model: {name}"}), 404
+    try:
+        upload = request.files.get("artifact")
+        data = upload.read() if upload is not None else request.get_data()
+        if not data:
+            return jsonify({"error": "Request body must be the model artifact"}), 400
+        version, path = registry.entry(name).store(data)
+        registry.reload(name, path, background=True)
+        return _loading(name, version)
+    except Exception as e:
+        return jsonify({"error": f"Model upload failed: {str(e)}"}), 500
+
+@admin_bp.route("/api/admin/models/<name>/activate", methods=["POST"])
+def activate_model(name):
+    """Load an archived version again (e.g. to roll back) and activate it if it still validates"""
+    error = _unauthorized()
+    if error:
+        return error
+    if name not in registry.names():
+        return jsonify({"error": f"Unknown model: {name}"}), 404
+    data = request.get_json(silent=True)
+    version = data.get("version") if isinstance(data, dict) else None
+    entry = registry.entry(name)
+    if version not in {item["version"] for item in entry.archived()}:
+        return jsonify({"error": f"Unknown {name} model version: {version}"}), 404
+    registry.reload(name, entry.archive_path(version), background=True)
+    return _loading(name, version)
+
+@admin_bp.route("/api/admin/models/<name>/reload", methods=["POST"])
+def reload_model(name):
+    """Load the artifact file now, without waiting for the watcher"""
+    error = _unauthorized()
+    if error:
+        return error
+    if name not in registry.names():
+        return jsonify({"error": f"Unknown model: {name}"}), 404
+    registry.reload(name, background=True)
+    return _loading(name, None)
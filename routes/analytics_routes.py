@@ -0,0 +1,46 @@
+from flask import Blueprint, request, jsonify
+from database import log_queries, rollups
+
+analytics_bp = Blueprint("analytics", __name__)
+
+@analytics_bp.route("/api/analytics", methods=["GET"])
+def list_analytics():
+    """Get the dimensions and numeric output each module's logs are summarised by"""
+    return jsonify({
+        "modules": {
+            module: {
+                "dimensions": [",".join(keys) for keys in spec.dimensions] + ["outcome"],
+                "value": spec.value
+            } for module, spec in rollups.specs.items()
+        },
+        "periods": list(rollups.PERIODS)
+    })
+
+@analytics_bp.route("/api/analytics/<module>", methods=["GET"])
+def module_analytics(module):
+    """
+    Get request counts, label shares and output mean/min/max per period
+    for one dimension, served from the LogRollup summaries
+    """
+    try:
+        if module not in rollups.specs:
+            return jsonify({"error": f"Unknown module: {module}"}), 404
+        dimension = request.args.get("dimension", "")
+        period = request.args.get("period", "day")
+        try:
+            since = request.args.get("since")
+            until = request.args.get("until")
+            top = request.args.get("top")
+            result = rollups.summarize(
+                module,
+                dimension=dimension,
+                period=period,
+                since=log_queries.parse_time(since) if since else None,
+                until=log_queries.parse_time(until) if until else None,
+                top=int(top) if top is not None else None
+            )
+        except ValueError as e:
+            return jsonify({"error": f"Invalid query parameter: {str(e)}"}), 400
+        return jsonify({"module": module, "dimension": dimension, "period": period, "periods": result})
+    except Exception as e:
+        return jsonify({"error": f"Failed to fetch analytics: {str(e)}"}), 500
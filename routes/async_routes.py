@@ -0,0 +1,160 @@
+import functools
+
+from database.log_writer import log_writer, log_requests
+from services.async_pipeline import pipeline, PipelineFull
+from services.process_pool import inference_pool
+from services.model_registry import track_versions
+from services.metrics import instrumented_async, stage, set_outcome
+from services.crop_service import get_crop_recommendation, get_crop_recommendation_batch
+from services.fertilizer_service import get_fertilizer_recommendation, get_fertilizer_recommendation_batch
+from services.yield_service import get_yield_prediction, get_yield_prediction_batch
+from services.dosage_service import get_dosage_recommendation, get_dosage_recommendation_batch
+
+# module: (path, single, batch, name used in error messages)
+PREDICTION_ROUTES = {
+    "crop": ("/api/crop-recommendation", get_crop_recommendation, get_crop_recommendation_batch,
+             "Crop recommendation"),
+    "fertilizer": ("/api/fertilizer-recommendation", get_fertilizer_recommendation,
+                   get_fertilizer_recommendation_batch, "Fertilizer recommendation"),
+    "yield": ("/api/yield-prediction", get_yield_prediction, get_yield_prediction_batch, "Yield prediction"),
+    "dosage": ("/api/dosage-recommendation", get_dosage_recommendation, get_dosage_recommendation_batch,
+               "Dosage recommendation")
+}
+
+
+class AsyncApp:
+    """
+    ASGI application: the prediction endpoints run on the event loop, with
+    inference in the bounded pipeline pool and logging handed off without
+    waiting for the database; every other request goes to the Flask app.
+
+    Responses match the Flask routes, plus 503 with Retry-After when the
+    pipeline is full.
+    """
+
+    def __init__(self, flask_app):
+        from asgiref.wsgi import WsgiToAsgi
+
+        self.flask_app = flask_app
+        self.fallback = WsgiToAsgi(flask_app)
+        self.routes = {}
+        for module, (path, single, batch, name) in PREDICTION_ROUTES.items():
+            for suffix, endpoint, predict, label in (("", "single", single, name),
+                                                     ("/batch", "batch", batch, f"{name} batch")):
+                handler = functools.partial(self._handle, module, endpoint, predict, label)
+                self.routes[path + suffix] = instrumented_async(module, endpoint)(handler)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        handler = self.routes.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if handler is None:
+            await self.fallback(scope, receive, send)
+            return
+        body = await _read_body(receive)
+        status, body, headers = await handler(body)
+        if any(key == b"origin" for key, _ in scope["headers"]):
+            # Same as flask_cors's default for the Flask routes
+            headers = list(headers) + [(b"access-control-allow-origin", b"*")]
+        await _send_json(send, status, body, headers)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                inference_pool.warm_up()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await pipeline.drain()
+                log_writer.stop()
+                pipeline.shutdown()
+                inference_pool.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _handle(self, module, endpoint, predict, name, body):
+        """Returns (status, JSON body bytes, extra headers)"""
+        status, payload, headers = await self._process(module, endpoint, predict, name, body)
+        with stage("respond"):
+            return status, self.flask_app.json.dumpb(payload), headers
+
+    async def _process(self, module, endpoint, predict, name, body):
+        try:
+            with stage("parse"):
+                try:
+                    data = self.flask_app.json.loads(body)
+                except ValueError:
+                    return 400, {"error": "Request body must be valid JSON"}, ()
+
+            if endpoint != "single":
+                records = data.get("records") if isinstance(data, dict) else data
+                if not isinstance(records, list) or not records:
+                    return 400, {"error": "Request body must be a non-empty list of records"}, ()
+                max_records = self.flask_app.config.get("BATCH_MAX_RECORDS", 10000)
+                if len(records) > max_records:
+                    return 400, {"error": f"Batch too large: {len(records)} records (max {max_records})"}, ()
+                data = records
+
+            # Filled in by the inference thread, which runs in a copy of this context
+            versions = track_versions()
+            try:
+                result = await pipeline.run(predict, data)
+            except PipelineFull as e:
+                set_outcome("overloaded")
+                retry_after = max(1, int(round(pipeline.queue_timeout)))
+                return 503, {"error": f"Server busy: {str(e)}"}, [(b"retry-after", str(retry_after).encode())]
+            if endpoint == "single" and "details" in result:
+                # Failed the module's schema
+                return 400, result, ()
+
+            # Save request + result to DB without waiting for it
+            with stage("log"):
+                if endpoint == "single":
+                    if "error" in result:
+                        set_outcome("model_error")
+                    pairs = [(data, result)]
+                else:
+                    pairs = [(record, item) for record, item in zip(data, result) if "error" not in item]
+                self._log(module, pairs, versions.get(module))
+
+            if endpoint == "single":
+                return 200, result, ()
+            errors = sum(1 for item in result if "error" in item)
+            return 200, {"results": result, "count": len(result), "errors": errors}, ()
+        except Exception as e:
+            return 500, {"error": f"{name} failed: {str(e)}"}, ()
+
+    def _log(self, module, pairs, model_version):
+        if not pairs or log_writer.shedding(len(pairs)):
+            return
+        if log_writer.enabled and log_writer.full_policy != "block":
+            # A non-blocking queue put; the writer thread does the insert
+            for input_data, result_data in pairs:
+                log_writer.submit(module, input_data, result_data, model_version)
+            return
+        # Inline commits (or a queue that may block) run in the I/O pool after the response
+        pipeline.spawn_io(self._log_sync, module, pairs, model_version)
+
+    def _log_sync(self, module, pairs, model_version):
+        with self.flask_app.app_context():
+            log_requests(module, pairs, model_version)
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _send_json(send, status, body, headers=()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                   + list(headers)
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -1,49 +1,86 @@
-from flask import Blueprint, request, jsonify
-from services.crop_service import get_crop_recommendation
-from database.db import db
+from flask import Blueprint, request, jsonify, current_app
+from services.crop_service import get_crop_recommendation, get_crop_recommendation_batch
+from database.log_writer import log_request, log_requests
+from database import log_codec
+from services.metrics import instrumented, stage, set_outcome
+from services.admission import admitted
+from services.model_registry import track_versions
 from models.db_models import RequestLog
-import json
 
 crop_bp = Blueprint("crop", __name__)
 
 @crop_bp.route("/api/crop-recommendation", methods=["POST"])
+@instrumented("crop")
+@admitted("crop")
 def crop_recommendation():
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ["soil_n", "soil_p", "soil_k", "ph", "temperature", "humidity", "rainfall"]
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Missing required field: {field}"}), 400
-        
+        with stage("parse"):
+            data = request.get_json()
+
+        # The service validates the request against the module's schema;
+        # `versions` records the model version that answered it
+        versions = track_versions()
         result = get_crop_recommendation(data)
+        if "details" in result:
+            return jsonify(result), 400
+
+        if "error" in result:
+            set_outcome("model_error")
 
-        # Save request + result to DB
-        log = RequestLog(
-            module="crop",
-            input_data=json.dumps(data),
-            result_data=json.dumps(result)
-        )
-        db.session.add(log)
-        db.session.commit()
+        # Save request + result to DB (write-behind, off the response path)
+        with stage("log"):
+            log_request("crop", data, result, versions.get("crop"))
 
-        return jsonify(result)
+        with stage("respond"):
+            return jsonify(result)
     
     except Exception as e:
         return jsonify({"error": f"Crop recommendation failed: {str(e)}"}), 500
 
+@crop_bp.route("/api/crop-recommendation/batch", methods=["POST"])
+@instrumented("crop", "batch")
+@admitted("crop")
+def crop_recommendation_batch():
+    """Score many records with one vectorized model call"""
+    try:
+        with stage("parse"):
+            data = request.get_json()
+        records = data.get("records") if isinstance(data, dict) else data
+        if not isinstance(records, list) or not records:
+            return jsonify({"error": "Request body must be a non-empty list of records"}), 400
+
+        max_records = current_app.config.get("BATCH_MAX_RECORDS", 10000)
+        if len(records) > max_records:
+            return jsonify({"error": f"Batch too large: {len(records)} records (max {max_records})"}), 400
+
+        versions = track_versions()
+        results = get_crop_recommendation_batch(records)
+
+        # Save every successful row to DB
+        with stage("log"):
+            log_requests("crop", [
+                (record, result) for record, result in zip(records, results) if "error" not in result
+            ], versions.get("crop"))
+
+        errors = sum(1 for result in results if "error" in result)
+        with stage("respond"):
+            return jsonify({"results": results, "count": len(results), "errors": errors})
+
+    except Exception as e:
+        return jsonify({"error": f"Crop recommendation batch failed: {str(e)}"}), 500
+
 @crop_bp.route("/api/crop-recommendation", methods=["GET"])
 def get_crop_logs():
     """Get recent crop recommendation logs"""
     try:
-        logs = RequestLog.query.filter_by(module="crop").order_by(RequestLog.id.desc()).limit(10).all()
+        logs = RequestLog.query.filter_by(module="crop").order_by(RequestLog.timestamp.desc(), RequestLog.id.desc()).limit(10).all()
         result = []
         for log in logs:
+            input_data, result_data = log_codec.decode(log)
             result.append({
                 "id": log.id,
-                "input": json.loads(log.input_data),
-                "result": json.loads(log.result_data),
+                "input": input_data,
+                "result": result_data,
                 "timestamp": log.id  # Using ID as timestamp proxy
             })
         return jsonify({"logs": result})
@@ -1,49 +1,86 @@
-from flask import Blueprint, request, jsonify
-from services.dosage_service import get_dosage_recommendation
-from database.db import db
+from flask import Blueprint, request, jsonify, current_app
+from services.dosage_service import get_dosage_recommendation, get_dosage_recommendation_batch
+from database.log_writer import log_request, log_requests
+from database import log_codec
+from services.metrics import instrumented, stage, set_outcome
+from services.admission import admitted
+from services.model_registry import track_versions
 from models.db_models import RequestLog
-import json
 
 dosage_bp = Blueprint("dosage", __name__)
 
 @dosage_bp.route("/api/dosage-recommendation", methods=["POST"])
+@instrumented("dosage")
+@admitted("dosage")
 def dosage_recommendation():
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ["soil_n", "soil_p", "soil_k", "ph", "crop_type", "growth_stage", "area"]
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Missing required field: {field}"}), 400
-        
+        with stage("parse"):
+            data = request.get_json()
+
+        # The service validates the request against the module's schema;
+        # `versions` records the model version that answered it
+        versions = track_versions()
         result = get_dosage_recommendation(data)
+        if "details" in result:
+            return jsonify(result), 400
+
+        if "error" in result:
+            set_outcome("model_error")
 
-        # Save request + result to DB
-        log = RequestLog(
-            module="dosage",
-            input_data=json.dumps(data),
-            result_data=json.dumps(result)
-        )
-        db.session.add(log)
-        db.session.commit()
+        # Save request + result to DB (write-behind, off the response path)
+        with stage("log"):
+            log_request("dosage", data, result, versions.get("dosage"))
 
-        return jsonify(result)
+        with stage("respond"):
+            return jsonify(result)
     
     except Exception as e:
         return jsonify({"error": f"Dosage recommendation failed: {str(e)}"}), 500
 
+@dosage_bp.route("/api/dosage-recommendation/batch", methods=["POST"])
+@instrumented("dosage", "batch")
+@admitted("dosage")
+def dosage_recommendation_batch():
+    """Score many records with one vectorized model call"""
+    try:
+        with stage("parse"):
+            data = request.get_json()
+        records = data.get("records") if isinstance(data, dict) else data
+        if not isinstance(records, list) or not records:
+            return jsonify({"error": "Request body must be a non-empty list of records"}), 400
+
+        max_records = current_app.config.get("BATCH_MAX_RECORDS", 10000)
+        if len(records) > max_records:
+            return jsonify({"error": f"Batch too large: {len(records)} records (max {max_records})"}), 400
+
+        versions = track_versions()
+        results = get_dosage_recommendation_batch(records)
+
+        # Save every successful row to DB
+        with stage("log"):
+            log_requests("dosage", [
+                (record, result) for record, result in zip(records, results) if "error" not in result
+            ], versions.get("dosage"))
+
+        errors = sum(1 for result in results if "error" in result)
+        with stage("respond"):
+            return jsonify({"results": results, "count": len(results), "errors": errors})
+
+    except Exception as e:
+        return jsonify({"error": f"Dosage recommendation batch failed: {str(e)}"}), 500
+
 @dosage_bp.route("/api/dosage-recommendation", methods=["GET"])
 def get_dosage_logs():
     """Get recent dosage recommendation logs"""
     try:
-        logs = RequestLog.query.filter_by(module="dosage").order_by(RequestLog.id.desc()).limit(10).all()
+        logs = RequestLog.query.filter_by(module="dosage").order_by(RequestLog.timestamp.desc(), RequestLog.id.desc()).limit(10).all()
         result = []
         for log in logs:
+            input_data, result_data = log_codec.decode(log)
             result.append({
                 "id": log.id,
-                "input": json.loads(log.input_data),
-                "result": json.loads(log.result_data),
+                "input": input_data,
+                "result": result_data,
                 "timestamp": log.id  # Using ID as timestamp proxy
             })
         return jsonify({"logs": result})
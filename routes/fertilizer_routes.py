@@ -1,49 +1,86 @@
-from flask import Blueprint, request, jsonify
-from services.fertilizer_service import get_fertilizer_recommendation
-from database.db import db
+from flask import Blueprint, request, jsonify, current_app
+from services.fertilizer_service import get_fertilizer_recommendation, get_fertilizer_recommendation_batch
+from database.log_writer import log_request, log_requests
+from database import log_codec
+from services.metrics import instrumented, stage, set_outcome
+from services.admission import admitted
+from services.model_registry import track_versions
 from models.db_models import RequestLog
-import json
 
 fertilizer_bp = Blueprint("fertilizer", __name__)
 
 @fertilizer_bp.route("/api/fertilizer-recommendation", methods=["POST"])
+@instrumented("fertilizer")
+@admitted("fertilizer")
 def fertilizer_recommendation():
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ["soil_n", "soil_p", "soil_k", "ph", "area"]
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Missing required field: {field}"}), 400
-        
+        with stage("parse"):
+            data = request.get_json()
+
+        # The service validates the request against the module's schema;
+        # `versions` records the model version that answered it
+        versions = track_versions()
         result = get_fertilizer_recommendation(data)
+        if "details" in result:
+            return jsonify(result), 400
+
+        if "error" in result:
+            set_outcome("model_error")
 
-        # Save request + result to DB
-        log = RequestLog(
-            module="fertilizer",
-            input_data=json.dumps(data),
-            result_data=json.dumps(result)
-        )
-        db.session.add(log)
-        db.session.commit()
+        # Save request + result to DB (write-behind, off the response path)
+        with stage("log"):
+            log_request("fertilizer", data, result, versions.get("fertilizer"))
 
-        return jsonify(result)
+        with stage("respond"):
+            return jsonify(result)
     
     except Exception as e:
         return jsonify({"error": f"Fertilizer recommendation failed: {str(e)}"}), 500
 
+@fertilizer_bp.route("/api/fertilizer-recommendation/batch", methods=["POST"])
+@instrumented("fertilizer", "batch")
+@admitted("fertilizer")
+def fertilizer_recommendation_batch():
+    """Score many records with one vectorized model call"""
+    try:
+        with stage("parse"):
+            data = request.get_json()
+        records = data.get("records") if isinstance(data, dict) else data
+        if not isinstance(records, list) or not records:
+            return jsonify({"error": "Request body must be a non-empty list of records"}), 400
+
+        max_records = current_app.config.get("BATCH_MAX_RECORDS", 10000)
+        if len(records) > max_records:
+            return jsonify({"error": f"Batch too large: {len(records)} records (max {max_records})"}), 400
+
+        versions = track_versions()
+        results = get_fertilizer_recommendation_batch(records)
+
+        # Save every successful row to DB
+        with stage("log"):
+            log_requests("fertilizer", [
+                (record, result) for record, result in zip(records, results) if "error" not in result
+            ], versions.get("fertilizer"))
+
+        errors = sum(1 for result in results if "error" in result)
+        with stage("respond"):
+            return jsonify({"results": results, "count": len(results), "errors": errors})
+
+    except Exception as e:
+        return jsonify({"error": f"Fertilizer recommendation batch failed: {str(e)}"}), 500
+
 @fertilizer_bp.route("/api/fertilizer-recommendation", methods=["GET"])
 def get_fertilizer_logs():
     """Get recent fertilizer recommendation logs"""
     try:
-        logs = RequestLog.query.filter_by(module="fertilizer").order_by(RequestLog.id.desc()).limit(10).all()
+        logs = RequestLog.query.filter_by(module="fertilizer").order_by(RequestLog.timestamp.desc(), RequestLog.id.desc()).limit(10).all()
         result = []
         for log in logs:
+            input_data, result_data = log_codec.decode(log)
             result.append({
                 "id": log.id,
-                "input": json.loads(log.input_data),
-                "result": json.loads(log.result_data),
+                "input": input_data,
+                "result": result_data,
                 "timestamp": log.id  # Using ID as timestamp proxy
             })
         return jsonify({"logs": result})
@@ -0,0 +1,86 @@
+from flask import Blueprint, Response
+from database.log_writer import log_writer
+from services import metrics
+from services.prediction_cache import caches
+from services.scheduler import batchers
+from services.model_registry import registry
+from services.async_pipeline import pipeline
+from services.process_pool import inference_pool
+from services.admission import admission
+
+metrics_bp = Blueprint("metrics", __name__)
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Expose request/stage histograms and subsystem counters in Prometheus text format"""
+    lines = metrics.render_histograms()
+
+    writer = log_writer.stats()
+    lines += metrics.format_metric("log_queue_depth", "gauge", "Request log rows waiting to be written",
+                                   [({}, writer["queued"])])
+    for key in ("enqueued", "written", "dropped", "shed", "failed"):
+        lines += metrics.format_metric(f"log_rows_{key}_total", "counter", f"Request log rows {key}",
+                                       [({}, writer[key])])
+    lines += metrics.format_metric("log_flushes_total", "counter", "Bulk inserts made by the request log writer",
+                                   [({}, writer["flushes"])])
+    lines += metrics.format_metric("log_flush_seconds_total", "counter", "Time spent in request log bulk inserts",
+                                   [({}, writer["flush_seconds"])])
+
+    cache_stats = {name: cache.stats() for name, cache in caches.items()}
+    for key in ("hits", "misses", "evictions", "expirations", "invalidations"):
+        lines += metrics.format_metric(f"prediction_cache_{key}_total", "counter", f"Prediction cache {key}",
+                                       [({"module": name}, stats[key]) for name, stats in cache_stats.items()])
+    lines += metrics.format_metric("prediction_cache_entries", "gauge", "Entries held by each prediction cache",
+                                   [({"module": name}, stats["size"]) for name, stats in cache_stats.items()])
+
+    batcher_stats = {name: batcher.stats() for name, batcher in batchers.items()}
+    lines += metrics.format_metric("microbatch_batches_total", "counter", "Stacked predict calls made by the micro-batcher",
+                                   [({"module": name}, stats["batches"]) for name, stats in batcher_stats.items()])
+    lines += metrics.format_metric("microbatch_rows_total", "counter", "Rows predicted through the micro-batcher",
+                                   [({"module": name}, stats["rows"]) for name, stats in batcher_stats.items()])
+
+    model_stats = registry.stats()
+    lines += metrics.format_metric("model_loaded", "gauge", "1 if the model is loaded and usable",
+                                   [({"module": name}, int(stats["status"] == "loaded")) for name, stats in model_stats.items()])
+    lines += metrics.format_metric("model_load_seconds", "gauge", "Time taken to load each model",
+                                   [({"module": name}, stats["load_seconds"]) for name, stats in model_stats.items()])
+    lines += metrics.format_metric("model_memory_bytes", "gauge", "Estimated private memory held by each model",
+                                   [({"module": name}, stats["memory_bytes"]) for name, stats in model_stats.items()])
+    lines += metrics.format_metric("model_version_info", "gauge", "Active version of each model (artifact digest)",
+                                   [({"module": name, "version": stats["version"]}, 1)
+                                    for name, stats in model_stats.items() if stats["status"] == "loaded"])
+    lines += metrics.format_metric("model_reloads_total", "counter", "New model versions swapped in",
+                                   [({"module": name}, stats["reloads"]) for name, stats in model_stats.items()])
+    lines += metrics.format_metric("model_rejections_total", "counter", "New model versions that failed to load or validate",
+                                   [({"module": name}, stats["rejections"]) for name, stats in model_stats.items()])
+
+    admission_stats = admission.stats()
+    gate_stats = admission_stats["modules"]
+    lines += metrics.format_metric("admission_in_flight", "gauge", "Prediction requests running per module",
+                                   [({"module": name}, stats["in_flight"]) for name, stats in gate_stats.items()])
+    lines += metrics.format_metric("admission_queue_depth", "gauge", "Prediction requests waiting for a slot per module",
+                                   [({"module": name}, stats["queued"]) for name, stats in gate_stats.items()])
+    lines += metrics.format_metric("admission_admitted_total", "counter", "Prediction requests admitted per module",
+                                   [({"module": name}, stats["admitted"]) for name, stats in gate_stats.items()])
+    lines += metrics.format_metric("admission_rejections_total", "counter",
+                                   "Prediction requests turned away (queue_full: 429, deadline and timeout: 503)",
+                                   [({"module": name, "reason": reason}, count)
+                                    for name, stats in gate_stats.items() for reason, count in stats["rejected"].items()])
+    lines += metrics.format_metric("admission_degraded", "gauge", "1 while request logs are being shed",
+                                   [({}, int(admission_stats["degraded"]))])
+
+    async_stats = pipeline.stats()
+    lines += metrics.format_metric("async_in_flight", "gauge", "Predictions running in the async API's inference pool",
+                                   [({}, async_stats["in_flight"])])
+    lines += metrics.format_metric("async_queue_depth", "gauge", "Async API requests waiting for an inference slot",
+                                   [({}, async_stats["queued"])])
+    for key in ("completed", "failed", "rejected", "timed_out"):
+        lines += metrics.format_metric(f"async_requests_{key}_total", "counter", f"Async API predictions {key}",
+                                       [({}, async_stats[key])])
+
+    pool_stats = inference_pool.stats()
+    for key in ("calls", "shards", "rows", "failures", "restarts"):
+        lines += metrics.format_metric(f"inference_pool_{key}_total", "counter", f"Inference process pool {key}",
+                                       [({}, pool_stats[key])])
+
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
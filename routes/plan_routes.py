@@ -0,0 +1,57 @@
+from flask import Blueprint, request, jsonify
+from services.field_plan import planner, log_result
+from database.log_writer import log_request
+from database import log_codec
+from services.metrics import instrumented, stage, set_outcome
+from services.admission import admitted
+from services.model_registry import track_versions
+from models.db_models import RequestLog
+
+plan_bp = Blueprint("field_plan", __name__)
+
+@plan_bp.route("/api/field-plan", methods=["POST"])
+@instrumented("field_plan")
+@admitted("field_plan")
+def field_plan():
+    """Run the crop, fertilizer, yield and dosage models for one plot"""
+    try:
+        with stage("parse"):
+            data = request.get_json()
+
+        # Validated once against the union of the module schemas;
+        # `versions` records the version of each model that answered
+        versions = track_versions()
+        plan = planner.plan(data)
+        if "details" in plan:
+            return jsonify(plan), 400
+
+        if plan["errors"]:
+            set_outcome("model_error")
+
+        # One log row for the whole plan, holding each model's outputs and version
+        with stage("log"):
+            log_request("field_plan", data, log_result(plan, versions))
+
+        with stage("respond"):
+            return jsonify(plan)
+
+    except Exception as e:
+        return jsonify({"error": f"Field plan failed: {str(e)}"}), 500
+
+@plan_bp.route("/api/field-plan", methods=["GET"])
+def get_field_plan_logs():
+    """Get recent field plan logs"""
+    try:
+        logs = RequestLog.query.filter_by(module="field_plan").order_by(RequestLog.timestamp.desc(), RequestLog.id.desc()).limit(10).all()
+        result = []
+        for log in logs:
+            input_data, result_data = log_codec.decode(log)
+            result.append({
+                "id": log.id,
+                "input": input_data,
+                "result": result_data,
+                "timestamp": log.id  # Using ID as timestamp proxy
+            })
+        return jsonify({"logs": result})
+    except Exception as e:
+        return jsonify({"error": f"Failed to fetch logs: {str(e)}"}), 500
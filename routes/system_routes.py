@@ -0,0 +1,105 @@
+from flask import Blueprint, Response, jsonify, request, stream_with_context, current_app
+from database import log_queries, rollups
+from services import prediction_cache, scheduler
+from services.schema import schemas
+from services.async_pipeline import pipeline
+from services.process_pool import inference_pool
+from services.admission import admission
+from services.model_registry import registry, process_memory
+
+system_bp = Blueprint("system", __name__)
+
+@system_bp.route("/health", methods=["GET"])
+def health():
+    return jsonify({"status": "ok"})
+
+@system_bp.route("/api/models", methods=["GET"])
+def list_models():
+    """Get load status, load time and memory footprint for each model, plus this worker's memory"""
+    return jsonify({"models": registry.stats(), "process": process_memory()})
+
+@system_bp.route("/api/schemas", methods=["GET"])
+def list_schemas():
+    """Get the request fields each prediction endpoint accepts, with their types, bounds and choices"""
+    return jsonify({module: schema.describe() for module, schema in schemas.items()})
+
+@system_bp.route("/api/cache/stats", methods=["GET"])
+def cache_stats():
+    """Get hit/miss/eviction counters for each prediction cache"""
+    return jsonify({name: cache.stats() for name, cache in prediction_cache.caches.items()})
+
+@system_bp.route("/api/scheduler/stats", methods=["GET"])
+def scheduler_stats():
+    """Get batch counts and sizes for each micro-batcher"""
+    return jsonify({name: batcher.stats() for name, batcher in scheduler.batchers.items()})
+
+@system_bp.route("/api/async/stats", methods=["GET"])
+def async_stats():
+    """Get in-flight, queued and rejected counts for the async API's inference pool"""
+    return jsonify(pipeline.stats())
+
+@system_bp.route("/api/admission/stats", methods=["GET"])
+def admission_stats():
+    """Get each module's concurrency limit, in-flight and queued requests and rejections"""
+    return jsonify(admission.stats())
+
+@system_bp.route("/api/pool/stats", methods=["GET"])
+def pool_stats():
+    """Get call, shard and row counts for the inference process pool"""
+    return jsonify(inference_pool.stats())
+
+@system_bp.route("/api/logs", methods=["GET"])
+def get_all_logs():
+    """
+    Get request logs newest first, with optional module and time-range filters
+
+    Pages with an opaque cursor (pass back `next_cursor`); format=ndjson
+    streams every matching row instead, one JSON object per line.
+    """
+    try:
+        module = request.args.get("module")  # Optional filter by module
+        since = request.args.get("since")
+        until = request.args.get("until")
+        cursor = request.args.get("cursor")
+        limit = request.args.get("limit")
+        try:
+            since = log_queries.parse_time(since) if since else None
+            until = log_queries.parse_time(until) if until else None
+            after = log_queries.decode_cursor(cursor) if cursor else None
+            limit = int(limit) if limit is not None else None
+        except ValueError as e:
+            return jsonify({"error": f"Invalid query parameter: {str(e)}"}), 400
+        if limit is not None and limit < 1:
+            return jsonify({"error": "Invalid query parameter: limit must be positive"}), 400
+
+        if request.args.get("format") == "ndjson":
+            lines = log_queries.iter_ndjson(module, since, until, after, limit,
+                                            page_size=current_app.config["LOGS_STREAM_PAGE_SIZE"])
+            return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+        limit = min(limit or 50, current_app.config["LOGS_MAX_LIMIT"])  # Default limit 50
+        logs, next_cursor = log_queries.fetch_page(module, since, until, after, limit)
+        # Stored JSON goes into the body as it is, without a decode/encode round trip
+        return Response(log_queries.page_json(logs, next_cursor), mimetype="application/json")
+    except Exception as e:
+        return jsonify({"error": f"Failed to fetch logs: {str(e)}"}), 500
+
+@system_bp.route("/api/logs/rollups", methods=["GET"])
+def get_log_rollups():
+    """Get hourly or daily aggregates of request logs per module and dimension"""
+    try:
+        try:
+            since = request.args.get("since")
+            until = request.args.get("until")
+            result = rollups.query(
+                module=request.args.get("module"),
+                granularity=request.args.get("granularity", "day"),
+                dimension=request.args.get("dimension"),
+                since=log_queries.parse_time(since) if since else None,
+                until=log_queries.parse_time(until) if until else None
+            )
+        except ValueError as e:
+            return jsonify({"error": f"Invalid query parameter: {str(e)}"}), 400
+        return jsonify({"rollups": result, "count": len(result)})
+    except Exception as e:
+        return jsonify({"error": f"Failed to fetch rollups: {str(e)}"}), 500
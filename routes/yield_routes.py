@@ -1,49 +1,86 @@
-from flask import Blueprint, request, jsonify
-from services.yield_service import get_yield_prediction
-from database.db import db
+from flask import Blueprint, request, jsonify, current_app
+from services.yield_service import get_yield_prediction, get_yield_prediction_batch
+from database.log_writer import log_request, log_requests
+from database import log_codec
+from services.metrics import instrumented, stage, set_outcome
+from services.admission import admitted
+from services.model_registry import track_versions
 from models.db_models import RequestLog
-import json
 
 yield_bp = Blueprint("yield", __name__)
 
 @yield_bp.route("/api/yield-prediction", methods=["POST"])
+@instrumented("yield")
+@admitted("yield")
 def yield_prediction():
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ["area", "crop_type", "season", "rainfall", "temperature", "humidity", "soil_quality"]
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Missing required field: {field}"}), 400
-        
+        with stage("parse"):
+            data = request.get_json()
+
+        # The service validates the request against the module's schema;
+        # `versions` records the model version that answered it
+        versions = track_versions()
         result = get_yield_prediction(data)
+        if "details" in result:
+            return jsonify(result), 400
+
+        if "error" in result:
+            set_outcome("model_error")
 
-        # Save request + result to DB
-        log = RequestLog(
-            module="yield",
-            input_data=json.dumps(data),
-            result_data=json.dumps(result)
-        )
-        db.session.add(log)
-        db.session.commit()
+        # Save request + result to DB (write-behind, off the response path)
+        with stage("log"):
+            log_request("yield", data, result, versions.get("yield"))
 
-        return jsonify(result)
+        with stage("respond"):
+            return jsonify(result)
     
     except Exception as e:
         return jsonify({"error": f"Yield prediction failed: {str(e)}"}), 500
 
+@yield_bp.route("/api/yield-prediction/batch", methods=["POST"])
+@instrumented("yield", "batch")
+@admitted("yield")
+def yield_prediction_batch():
+    """Score many records with one vectorized model call"""
+    try:
+        with stage("parse"):
+            data = request.get_json()
+        records = data.get("records") if isinstance(data, dict) else data
+        if not isinstance(records, list) or not records:
+            return jsonify({"error": "Request body must be a non-empty list of records"}), 400
+
+        max_records = current_app.config.get("BATCH_MAX_RECORDS", 10000)
+        if len(records) > max_records:
+            return jsonify({"error": f"Batch too large: {len(records)} records (max {max_records})"}), 400
+
+        versions = track_versions()
+        results = get_yield_prediction_batch(records)
+
+        # Save every successful row to DB
+        with stage("log"):
+            log_requests("yield", [
+                (record, result) for record, result in zip(records, results) if "error" not in result
+            ], versions.get("yield"))
+
+        errors = sum(1 for result in results if "error" in result)
+        with stage("respond"):
+            return jsonify({"results": results, "count": len(results), "errors": errors})
+
+    except Exception as e:
+        return jsonify({"error": f"Yield prediction batch failed: {str(e)}"}), 500
+
 @yield_bp.route("/api/yield-prediction", methods=["GET"])
 def get_yield_logs():
     """Get recent yield prediction logs"""
     try:
-        logs = RequestLog.query.filter_by(module="yield").order_by(RequestLog.id.desc()).limit(10).all()
+        logs = RequestLog.query.filter_by(module="yield").order_by(RequestLog.timestamp.desc(), RequestLog.id.desc()).limit(10).all()
         result = []
         for log in logs:
+            input_data, result_data = log_codec.decode(log)
             result.append({
                 "id": log.id,
-                "input": json.loads(log.input_data),
-                "result": json.loads(log.result_data),
+                "input": input_data,
+                "result": result_data,
                 "timestamp": log.id  # Using ID as timestamp proxy
             })
         return jsonify({"logs": result})
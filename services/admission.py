@@ -0,0 +1,271 @@
+import functools
+import math
+import threading
+import time
+
+from flask import jsonify, request
+from database.log_writer import log_writer
+from services.metrics import stage, set_outcome
+from services.model_registry import registry
+
+
+class Overloaded(Exception):
+    """A request was not admitted; the route answers `status` with Retry-After"""
+
+    def __init__(self, status, reason, message, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Gate:
+    """
+    Concurrency limit for one module's prediction requests
+
+    At most `limit` requests run at once and up to `max_queue` more wait,
+    each until `timeout` seconds after it arrived. A request that finds the
+    queue full is turned away at once (429). One whose expected wait (the
+    requests ahead of it times the recent service time, over `limit`) would
+    take it past its deadline is too, as is one still waiting when the
+    deadline passes (503). While the module's model is still being loaded
+    (`cold`), requests wait for it without a deadline.
+    """
+
+    def __init__(self, module, limit, max_queue, timeout):
+        self.module = module
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "deadline": 0, "timeout": 0}
+        # Moving averages of the time an admitted request holds its slot, and
+        # of the time requests spent before reaching the app (proxy, backlog)
+        self.service_seconds = 0.0
+        self.lag_seconds = 0.0
+
+    def _expected_wait(self, position):
+        return position * self.service_seconds / self.limit
+
+    def expected_wait(self):
+        """Seconds a request arriving now can expect to wait before it starts: the recent lag plus the queue"""
+        return self.lag_seconds + self._expected_wait(self.waiting)
+
+    def _retry_after(self):
+        return max(1, math.ceil(self._expected_wait(self.waiting + 1)))
+
+    def _reject(self, status, reason, message):
+        self.rejected[reason] += 1
+        return Overloaded(status, reason, message, self._retry_after())
+
+    def acquire(self, queued=0.0, cold=False):
+        """
+        Take a slot, waiting for one if allowed; raises Overloaded otherwise
+        `queued` is how long the request already waited before reaching the app;
+        `cold` waits out a first model load instead of holding to the deadline
+        """
+        budget = math.inf if cold else self.timeout - queued
+        with self._cond:
+            if not cold:
+                self.lag_seconds += 0.2 * (queued - self.lag_seconds)
+            if budget <= 0:
+                raise self._reject(503, "deadline", f"Request waited {queued:.2f}s before reaching the server")
+            if self.active < self.limit:
+                self.active += 1
+                self.admitted += 1
+                return
+            if self.waiting >= self.max_queue:
+                raise self._reject(429, "queue_full", f"{self.module} queue is full ({self.waiting} waiting)")
+            if self._expected_wait(self.waiting + 1) > budget:
+                raise self._reject(503, "deadline", f"{self.module} cannot start within {self.timeout}s")
+
+            deadline = time.monotonic() + budget if not cold else None
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            try:
+                while self.active >= self.limit:
+                    if deadline is None:
+                        self._cond.wait()
+                        continue
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._reject(503, "timeout", f"No {self.module} slot within {self.timeout}s")
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+
+    def release(self, seconds, sample=True):
+        """Free the slot; `sample` False leaves a cold request out of the service time"""
+        with self._cond:
+            self.active -= 1
+            if sample:
+                self.service_seconds += 0.2 * (seconds - self.service_seconds)
+            self._cond.notify()
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.timeout,
+            "in_flight": self.active,
+            "queued": self.waiting,
+            "max_queued": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "mean_service_ms": round(self.service_seconds * 1000, 3),
+            "mean_lag_ms": round(self.lag_seconds * 1000, 3)
+        }
+
+
+class AdmissionController:
+    """
+    One gate per module, plus the pressure signal that puts request logging
+    into degraded mode: while requests at any gate can expect to wait at
+    least `degrade_wait` of the queue timeout before they start, in the
+    proxy and accept backlog or in the gate's queue, so that they are close
+    to being turned away, RequestLog rows are shed. The async API's
+    prediction handlers are bounded by their own pipeline and neither gated
+    nor counted here.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.limits = {}
+        self.default_limit = 4
+        self.max_queue = 64
+        self.timeout = 1.0
+        self.degrade_wait = None
+        self.start_header = None
+        self.gates = {}
+        # Wall time each module was first seen with its models loaded
+        self.warm_at = {}
+        self._lock = threading.Lock()
+
+    def gate(self, module):
+        gate = self.gates.get(module)
+        if gate is None:
+            with self._lock:
+                gate = self.gates.get(module)
+                if gate is None:
+                    limit = self.limits.get(module) or self.default_limit
+                    gate = self.gates[module] = Gate(module, limit, self.max_queue, self.timeout)
+        return gate
+
+    def queue_time(self, headers):
+        """
+        Seconds since a front proxy received the request, from its start header
+        ("t=<unix time>" in seconds, milliseconds or microseconds); 0 without one
+        """
+        value = headers.get(self.start_header) if self.start_header else None
+        if not value:
+            return 0.0
+        try:
+            started = float(value.strip().removeprefix("t="))
+        except ValueError:
+            return 0.0
+        if started > 1e14:
+            started /= 1e6
+        elif started > 1e11:
+            started /= 1e3
+        return max(0.0, time.time() - started)
+
+    def cold(self, module, queued=0.0):
+        """
+        True for a request that arrived (`queued` seconds ago) before the models
+        behind its module (every model, for field_plan) were first loaded
+        """
+        names = [module] if module in registry.names() else registry.names()
+        if any(not registry.entry(name).loaded for name in names):
+            return True
+        now = time.time()
+        return now - queued < self.warm_at.setdefault(module, now)
+
+    def under_pressure(self):
+        if self.degrade_wait is None:
+            return False
+        return any(gate.expected_wait() >= self.degrade_wait * gate.timeout for gate in list(self.gates.values()))
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "degraded": self.under_pressure(),
+            "modules": {module: gate.stats() for module, gate in list(self.gates.items())}
+        }
+
+
+admission = AdmissionController()
+
+
+def admitted(module):
+    """
+    Run a prediction view only once its module's gate admits it; otherwise
+    answer 429 or 503 with Retry-After straight away
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not admission.enabled:
+                return view(*args, **kwargs)
+            gate = admission.gate(module)
+            queued = admission.queue_time(request.headers)
+            cold = admission.cold(module, queued)
+            try:
+                with stage("queue"):
+                    gate.acquire(queued, cold)
+            except Overloaded as e:
+                set_outcome("overloaded")
+                return jsonify({"error": f"Server busy: {str(e)}"}), e.status, {"Retry-After": str(e.retry_after)}
+            started = time.perf_counter()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                gate.release(time.perf_counter() - started, not cold)
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    """
+    Configure admission control from app config
+        ADMISSION_CONTROL        - gate the prediction endpoints (default False)
+        ADMISSION_LIMITS         - {module: requests running at once}; unlisted
+                                   modules use ADMISSION_DEFAULT_LIMIT
+        ADMISSION_DEFAULT_LIMIT  - requests running at once per module (default 4;
+                                   gunicorn.conf.py sets the worker's thread count)
+        ADMISSION_MAX_QUEUE      - requests waiting per module before 429 (default 64)
+        ADMISSION_QUEUE_TIMEOUT  - seconds a request may wait before 503, counted from
+                                   ADMISSION_START_HEADER when a proxy sets it (default 1.0)
+        ADMISSION_START_HEADER   - header holding the time a front proxy received the
+                                   request, e.g. nginx's "t=${msec}"; None ignores it
+                                   (default "X-Request-Start")
+        ADMISSION_DEGRADE_WAIT   - share of ADMISSION_QUEUE_TIMEOUT that a module's
+                                   requests must expect to wait before they start
+                                   for request logs to be shed; None never sheds
+                                   (default 0.5)
+    """
+    app.config.setdefault("ADMISSION_CONTROL", False)
+    app.config.setdefault("ADMISSION_LIMITS", {})
+    app.config.setdefault("ADMISSION_DEFAULT_LIMIT", 4)
+    app.config.setdefault("ADMISSION_MAX_QUEUE", 64)
+    app.config.setdefault("ADMISSION_QUEUE_TIMEOUT", 1.0)
+    app.config.setdefault("ADMISSION_START_HEADER", "X-Request-Start")
+    app.config.setdefault("ADMISSION_DEGRADE_WAIT", 0.5)
+
+    admission.enabled = bool(app.config["ADMISSION_CONTROL"])
+    admission.limits = dict(app.config["ADMISSION_LIMITS"])
+    admission.default_limit = int(app.config["ADMISSION_DEFAULT_LIMIT"])
+    admission.max_queue = int(app.config["ADMISSION_MAX_QUEUE"])
+    admission.timeout = float(app.config["ADMISSION_QUEUE_TIMEOUT"])
+    admission.start_header = app.config["ADMISSION_START_HEADER"]
+    degrade = app.config["ADMISSION_DEGRADE_WAIT"]
+    admission.degrade_wait = float(degrade) if degrade is not None else None
+    # Gates are rebuilt with the new settings on next use
+    admission.gates = {}
+    admission.warm_at = {}
+    log_writer.pressure = admission.under_pressure
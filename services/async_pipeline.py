@@ -0,0 +1,160 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PipelineFull(Exception):
+    """Raised when a request cannot get an inference slot; the caller answers 503"""
+
+
+class AsyncPipeline:
+    """
+    Runs blocking work for the async API without blocking its event loop
+
+    Inference goes to a bounded thread pool: at most `workers` calls run at
+    once and up to `max_queue` more wait for a slot, each for at most
+    `queue_timeout` seconds; beyond that run() raises PipelineFull. Inline
+    log commits and other blocking I/O go to a separate small pool so they
+    never take an inference slot. The pools are created on first use and
+    again in each forked child process.
+    """
+
+    def __init__(self, workers=4, max_queue=1000, queue_timeout=10.0, io_workers=2):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.io_workers = io_workers
+        self._executor = None
+        self._io_executor = None
+        self._slots = None
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._background = set()
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    def _ensure(self):
+        loop = asyncio.get_running_loop()
+        if self._executor is not None and self._pid == os.getpid() and self._loop is loop:
+            return
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="async-inference")
+                self._io_executor = ThreadPoolExecutor(self.io_workers, thread_name_prefix="async-io")
+                self._pid = os.getpid()
+            # The semaphore belongs to the loop it is first awaited on
+            self._slots = asyncio.Semaphore(self.workers)
+            self._loop = loop
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in the inference pool once a slot is free; returns its result"""
+        self._ensure()
+        if self._slots.locked() and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise PipelineFull(f"Inference queue is full ({self.queued} waiting)")
+
+        waited = time.perf_counter()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise PipelineFull(f"No inference slot within {self.queue_timeout}s")
+        finally:
+            self.queued -= 1
+
+        started = time.perf_counter()
+        self.wait_seconds += started - waited
+        self.in_flight += 1
+        try:
+            # Copy the context so stage timings recorded in the pool reach this request
+            context = contextvars.copy_context()
+            result = await self._loop.run_in_executor(self._executor, context.run, fn, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.run_seconds += time.perf_counter() - started
+            self._slots.release()
+        self.completed += 1
+        return result
+
+    async def run_io(self, fn, *args):
+        """Run blocking I/O in the I/O pool, outside the inference slots"""
+        self._ensure()
+        return await self._loop.run_in_executor(self._io_executor, fn, *args)
+
+    def spawn_io(self, fn, *args):
+        """Start run_io without waiting for it; errors are printed, not raised"""
+        task = asyncio.ensure_future(self.run_io(fn, *args))
+        self._background.add(task)
+        task.add_done_callback(self._io_done)
+        return task
+
+    def _io_done(self, task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Warning: Background I/O failed: {task.exception()}")
+
+    async def drain(self):
+        """Wait for every background I/O task started by spawn_io"""
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    def shutdown(self):
+        for executor in (self._executor, self._io_executor):
+            if executor is not None and self._pid == os.getpid():
+                executor.shutdown(wait=True)
+        self._executor = self._io_executor = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "background_io": len(self._background),
+            "mean_wait_ms": round(self.wait_seconds * 1000 / self.completed, 3) if self.completed else 0.0,
+            "mean_run_ms": round(self.run_seconds * 1000 / self.completed, 3) if self.completed else 0.0
+        }
+
+
+pipeline = AsyncPipeline()
+
+
+def init_app(app):
+    """
+    Configure the async API's pipeline from app config
+        ASYNC_INFERENCE_WORKERS  - predictions running at once per process (default 4)
+        ASYNC_MAX_QUEUE          - requests allowed to wait for a slot before 503 (default 1000)
+        ASYNC_QUEUE_TIMEOUT      - seconds a request may wait for a slot before 503 (default 10)
+        ASYNC_IO_WORKERS         - threads for inline log commits (default 2)
+    """
+    app.config.setdefault("ASYNC_INFERENCE_WORKERS", 4)
+    app.config.setdefault("ASYNC_MAX_QUEUE", 1000)
+    app.config.setdefault("ASYNC_QUEUE_TIMEOUT", 10.0)
+    app.config.setdefault("ASYNC_IO_WORKERS", 2)
+
+    pipeline.workers = int(app.config["ASYNC_INFERENCE_WORKERS"])
+    pipeline.max_queue = int(app.config["ASYNC_MAX_QUEUE"])
+    pipeline.queue_timeout = float(app.config["ASYNC_QUEUE_TIMEOUT"])
+    pipeline.io_workers = int(app.config["ASYNC_IO_WORKERS"])
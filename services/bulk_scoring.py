@@ -0,0 +1,272 @@
+import csv
+import io
+import itertools
+import json
+import operator
+import os
+import time
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+from database import log_codec
+from services.model_registry import registry
+from services.prediction_cache import caches
+from services.process_pool import inference_pool
+from services.schema import schemas
+from services.crop_service import get_crop_recommendation_batch
+from services.fertilizer_service import get_fertilizer_recommendation_batch
+from services.yield_service import get_yield_prediction_batch
+from services.dosage_service import get_dosage_recommendation_batch
+
+# module: the service's batch function (validation, features, vectorized predict, result)
+SCORERS = {
+    "crop": get_crop_recommendation_batch,
+    "fertilizer": get_fertilizer_recommendation_batch,
+    "yield": get_yield_prediction_batch,
+    "dosage": get_dosage_recommendation_batch
+}
+
+
+def checkpoint_path(output_path):
+    return output_path + ".checkpoint"
+
+
+def _number(text):
+    """CSV text as a number; anything else is passed on for the schema to reject"""
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def _getter(indexes):
+    """itemgetter that always returns a tuple"""
+    if len(indexes) == 1:
+        index = indexes[0]
+        return lambda row: (row[index],)
+    return operator.itemgetter(*indexes)
+
+
+def csv_records(columns, schema):
+    """
+    Build the function that turns a chunk of CSV rows into the records the
+    service scores: the schema's number fields parsed, text fields as they
+    are, and empty cells left out (so they are reported missing)
+    """
+    index = {column: i for i, column in enumerate(columns)}
+    fields = [(field.name, index[field.name], field.kind == "number") for field in schema.fields if field.name in index]
+    number_names = [name for name, _, numeric in fields if numeric]
+    text_names = [name for name, _, numeric in fields if not numeric]
+    numbers = _getter([i for _, i, numeric in fields if numeric]) if number_names else lambda row: ()
+    texts = _getter([i for _, i, numeric in fields if not numeric]) if text_names else lambda row: ()
+
+    def slow(row):
+        record = {}
+        for name, i, numeric in fields:
+            text = row[i] if i < len(row) else ""
+            if text:
+                record[name] = _number(text) if numeric else text
+        return record
+
+    def records(rows):
+        result = []
+        for row in rows:
+            try:
+                # Rows with an empty, non-numeric or absent cell take the slow path
+                record = dict(zip(number_names, map(float, numbers(row))))
+                values = texts(row)
+                if not all(values):
+                    raise ValueError
+                record.update(zip(text_names, values))
+            except (ValueError, IndexError):
+                record = slow(row)
+            result.append(record)
+        return result
+
+    return records
+
+
+def read_csv(path, schema, chunk_size, skip=0):
+    """Yield (columns, rows, records) chunks of a CSV file, rows as lists of cells"""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        columns = next(reader, [])
+        to_records = csv_records(columns, schema)
+        rows = itertools.islice(reader, skip, None)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield columns, chunk, to_records(chunk)
+
+
+def read_parquet(path, schema, chunk_size, skip=0):
+    """Yield (columns, rows, records) chunks of a Parquet file, one record batch at a time"""
+    if pq is None:
+        raise RuntimeError("Reading Parquet needs pyarrow (pip install pyarrow)")
+    parquet = pq.ParquetFile(path)
+    columns = parquet.schema_arrow.names
+    # Whole row groups before the resume point are never read
+    groups = []
+    for i in range(parquet.num_row_groups):
+        size = parquet.metadata.row_group(i).num_rows
+        if not groups and skip >= size:
+            skip -= size
+            continue
+        groups.append(i)
+    if not groups:
+        return
+    for batch in parquet.iter_batches(batch_size=chunk_size, row_groups=groups, columns=columns):
+        if skip:
+            dropped = min(skip, batch.num_rows)
+            batch = batch.slice(dropped)
+            skip -= dropped
+        if batch.num_rows == 0:
+            continue
+        chunk = list(zip(*(batch.column(i).to_pylist() for i in range(batch.num_columns))))
+        records = [{key: value for key, value in zip(columns, row) if value is not None} for row in chunk]
+        yield columns, chunk, records
+
+
+def read_chunks(path, schema, chunk_size, skip=0):
+    """Chunks of any supported input, chosen by file extension"""
+    if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+        return read_parquet(path, schema, chunk_size, skip)
+    return read_csv(path, schema, chunk_size, skip)
+
+
+def score_chunks(module, chunks):
+    """Yield (columns, rows, records, results) with each chunk scored by one vectorized call"""
+    scorer = SCORERS[module]
+    for columns, rows, records in chunks:
+        yield columns, rows, records, scorer(records)
+
+
+class CsvOutput:
+    """Input columns, then the module's model outputs and `error`"""
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+
+    def header(self, columns):
+        return self.encode([list(columns) + self.outputs + ["error"]])
+
+    def chunk(self, start, columns, rows, records, results):
+        outputs = self.outputs
+        return self.encode([
+            list(row) + [result.get(key, "") for key in outputs] + [result.get("error", "")]
+            for row, result in zip(rows, results)
+        ])
+
+    @staticmethod
+    def encode(lines):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(lines)
+        return buffer.getvalue().encode("utf-8")
+
+
+class NdjsonOutput:
+    """One {"row", "input", "result"} object per line, as the API would answer"""
+
+    def header(self, columns):
+        return b""
+
+    def chunk(self, start, columns, rows, records, results):
+        return "".join(
+            log_codec.compact_json({"row": start + i, "input": record, "result": result}) + "\n"
+            for i, (record, result) in enumerate(zip(records, results))
+        ).encode("utf-8")
+
+
+def _output_for(module, path):
+    if os.path.splitext(path)[1].lower() in (".ndjson", ".jsonl"):
+        return NdjsonOutput()
+    return CsvOutput(log_codec.schemas[(module, log_codec.SCHEMA_VERSION)].outputs)
+
+
+def read_checkpoint(output_path):
+    try:
+        with open(checkpoint_path(output_path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_checkpoint(output_path, state):
+    # Renamed into place, so a crash leaves the previous checkpoint intact
+    path = checkpoint_path(output_path)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def score_file(module, input_path, output_path, chunk_size=10000, processes=0, resume=False, progress=None):
+    """
+    Score every record of a CSV or Parquet file and stream the results to a
+    CSV or NDJSON file, holding one chunk of rows in memory at a time
+
+    After each chunk is written and synced, `<output>.checkpoint` records the
+    rows done and the output size; with `resume`, a run continues from there
+    (output truncated to the checkpoint, input rows before it skipped).
+    `processes` > 0 shards every chunk's predict over the inference pool.
+    Returns the final checkpoint state.
+    """
+    if module not in SCORERS:
+        raise ValueError(f"Unknown module: {module}")
+    schema = schemas[module]
+    output = _output_for(module, output_path)
+    source = os.path.abspath(input_path)
+
+    state = read_checkpoint(output_path) if resume else None
+    if state is not None:
+        if state["module"] != module or state["input"] != source:
+            raise ValueError(f"{checkpoint_path(output_path)} belongs to a {state['module']} run over {state['input']}")
+        if state["complete"]:
+            return state
+    else:
+        state = {"module": module, "input": source, "rows": 0, "errors": 0, "bytes": 0, "complete": False}
+
+    cache = caches.get(module)
+    cache_enabled = cache is not None and cache.enabled
+    if cache is not None:
+        # Survey rows rarely repeat; skip the per-row cache keys
+        cache.enabled = False
+    if processes:
+        inference_pool.modules = {module}
+        inference_pool.processes = processes
+        registry.pool = inference_pool
+
+    started = time.perf_counter()
+    scored = 0
+    try:
+        with open(output_path, "r+b" if state["bytes"] else "wb") as out:
+            out.truncate(state["bytes"])
+            out.seek(state["bytes"])
+            chunks = read_chunks(input_path, schema, chunk_size, skip=state["rows"])
+            for columns, rows, records, results in score_chunks(module, chunks):
+                if state["bytes"] == 0:
+                    out.write(output.header(columns))
+                out.write(output.chunk(state["rows"], columns, rows, records, results))
+                out.flush()
+                os.fsync(out.fileno())
+
+                state["rows"] += len(rows)
+                state["errors"] += sum(1 for result in results if "error" in result)
+                state["bytes"] = out.tell()
+                _write_checkpoint(output_path, state)
+                scored += len(rows)
+                if progress is not None:
+                    progress(state, scored / (time.perf_counter() - started))
+        state["complete"] = True
+        _write_checkpoint(output_path, state)
+    finally:
+        if cache is not None:
+            cache.enabled = cache_enabled
+        if processes:
+            inference_pool.shutdown()
+    return state
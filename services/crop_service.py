@@ -1,14 +1,57 @@
-import joblib
 import os
 import json
+from services.inference import active_model, run_batch, predict_one
+from services.prediction_cache import PredictionCache
+from services.scheduler import MicroBatcher
+from services.model_registry import registry
+from services.metrics import stage
+from services import schema
+from database import log_codec, rollups
 
-# Load model once with error handling
+# Model is loaded by the registry on first use
 model_path = os.path.join("models", "crop.pkl")
-try:
-    crop_model = joblib.load(model_path)
-except Exception as e:
-    print(f"Warning: Could not load crop model: {e}")
-    crop_model = None
+registry.register("crop", model_path)
+
+# Repeated feature rows skip the model; enabled per module via PREDICTION_CACHE
+crop_cache = PredictionCache("crop")
+
+# Concurrent single requests share one predict; enabled per module via INFERENCE_BATCHING
+crop_batcher = MicroBatcher("crop")
+
+# Request fields, in model feature order; compiled once into a validator and feature encoder
+crop_schema = schema.compile("crop", [
+    schema.number("soil_n", minimum=0),
+    schema.number("soil_p", minimum=0),
+    schema.number("soil_k", minimum=0),
+    schema.number("ph", minimum=0, maximum=14),
+    schema.number("temperature", minimum=-50, maximum=60),
+    schema.number("humidity", minimum=0, maximum=100),
+    schema.number("rainfall", minimum=0)
+])
+
+def _build_result(data, prediction):
+    """Build the response payload for one prediction"""
+    return {
+        "recommended_crop": prediction,
+        "soil_analysis": {
+            "nitrogen": data["soil_n"],
+            "phosphorus": data["soil_p"],
+            "potassium": data["soil_k"],
+            "ph_level": data["ph"]
+        },
+        "weather_conditions": {
+            "temperature": data["temperature"],
+            "humidity": data["humidity"],
+            "rainfall": data["rainfall"]
+        }
+    }
+
+# Logs store these fields packed and only the model outputs of the result
+log_codec.register("crop", fields=["soil_n", "soil_p", "soil_k", "ph", "temperature", "humidity", "rainfall"],
+                   outputs=["recommended_crop"], build_result=_build_result)
+
+# Rollups of old logs are kept per time bucket for these dimensions
+rollups.register("crop", dimensions=[("recommended_crop",)])
 
 def get_crop_recommendation(data):
     """
@@ -24,34 +67,28 @@ def get_crop_recommendation(data):
     }
     """
     try:
+        # Validate the request and encode its features
+        with stage("extract"):
+            features, errors = crop_schema.row(data)
+        if errors:
+            return schema.invalid(errors)
+
+        crop_model, generation = active_model("crop", crop_cache)
         if crop_model is None:
             return {"error": "Crop model not available. Please check model file."}
-            
-        # Extract features from request
-        features = [
-            data["soil_n"],
-            data["soil_p"],
-            data["soil_k"],
-            data["ph"],
-            data["temperature"],
-            data["humidity"],
-            data["rainfall"]
-        ]
-
-        prediction = crop_model.predict([features])[0]
-        return {
-            "recommended_crop": prediction,
-            "soil_analysis": {
-                "nitrogen": data["soil_n"],
-                "phosphorus": data["soil_p"],
-                "potassium": data["soil_k"],
-                "ph_level": data["ph"]
-            },
-            "weather_conditions": {
-                "temperature": data["temperature"],
-                "humidity": data["humidity"],
-                "rainfall": data["rainfall"]
-            }
-        }
+
+        with stage("predict"):
+            prediction = predict_one(crop_model, features, crop_cache, crop_batcher, generation)
+        return _build_result(data, prediction)
     except Exception as e:
         return {"error": f"Crop recommendation failed: {str(e)}"}
+
+def get_crop_recommendation_batch(records):
+    """
+    Get crop recommendations for a list of records with a single predict call
+    Returns one result per record, in order; invalid records get an "error" entry
+    """
+    crop_model, generation = active_model("crop", crop_cache)
+    if crop_model is None:
+        return [{"error": "Crop model not available. Please check model file."} for _ in records]
+    return run_batch(crop_model, records, crop_schema, _build_result, "Crop recommendation", crop_cache, generation)
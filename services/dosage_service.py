@@ -1,14 +1,62 @@
-import joblib
 import os
 import json
+from services.inference import active_model, run_batch, predict_one
+from services.prediction_cache import PredictionCache
+from services.scheduler import MicroBatcher
+from services.model_registry import registry
+from services.metrics import stage
+from services import schema
+from database import log_codec, rollups
 
-# Load model once with error handling
+# Model is loaded by the registry on first use
 model_path = os.path.join("models", "dosage.pkl")
-try:
-    dosage_model = joblib.load(model_path)
-except Exception as e:
-    print(f"Warning: Could not load dosage model: {e}")
-    dosage_model = None
+registry.register("dosage", model_path)
+
+# Repeated feature rows skip the model; enabled per module via PREDICTION_CACHE
+dosage_cache = PredictionCache("dosage")
+
+# Concurrent single requests share one predict; enabled per module via INFERENCE_BATCHING
+dosage_batcher = MicroBatcher("dosage")
+
+# Request fields, in model feature order (crop_type is echoed, not a feature);
+# compiled once into a validator and feature encoder
+dosage_schema = schema.compile("dosage", [
+    schema.number("soil_n", minimum=0),
+    schema.number("soil_p", minimum=0),
+    schema.number("soil_k", minimum=0),
+    schema.number("ph", minimum=0, maximum=14),
+    schema.text("crop_type"),
+    schema.category("growth_stage", {"seedling": 1, "vegetative": 2, "flowering": 3, "fruiting": 4, "mature": 5}),
+    schema.number("area", greater_than=0)
+])
+
+def _build_result(data, prediction):
+    """Build the response payload for one prediction"""
+    return {
+        "recommended_dosage": round(prediction, 2),
+        "dosage_per_hectare": round(prediction / data["area"], 2),
+        "application_guidelines": {
+            "soil_conditions": {
+                "nitrogen": data["soil_n"],
+                "phosphorus": data["soil_p"],
+                "potassium": data["soil_k"],
+                "ph_level": data["ph"]
+            },
+            "crop_info": {
+                "type": data["crop_type"],
+                "growth_stage": data["growth_stage"]
+            },
+            "area_hectares": data["area"]
+        }
+    }
+
+# Logs store these fields packed and only the model outputs of the result
+log_codec.register("dosage", fields=["soil_n", "soil_p", "soil_k", "ph", "crop_type", "growth_stage", "area"],
+                   outputs=["recommended_dosage", "dosage_per_hectare"], build_result=_build_result)
+
+# Rollups of old logs are kept per time bucket for these dimensions
+rollups.register("dosage", dimensions=[("crop_type",), ("growth_stage",), ("crop_type", "growth_stage")],
+                 value="recommended_dosage")
 
 def get_dosage_recommendation(data):
     """
@@ -24,41 +72,30 @@ def get_dosage_recommendation(data):
     }
     """
     try:
+        # Validate the request and encode its features
+        with stage("extract"):
+            features, errors = dosage_schema.row(data)
+        if errors:
+            return schema.invalid(errors)
+
+        dosage_model, generation = active_model("dosage", dosage_cache)
         if dosage_model is None:
             return {"error": "Dosage model not available. Please check model file."}
-            
-        # Convert categorical variables to numerical
-        growth_stage_map = {"seedling": 1, "vegetative": 2, "flowering": 3, "fruiting": 4, "mature": 5}
-        
-        # Extract features from request
-        features = [
-            data["soil_n"],
-            data["soil_p"],
-            data["soil_k"],
-            data["ph"],
-            growth_stage_map.get(data["growth_stage"], 2),
-            data["area"]
-        ]
-        
+
         # Get prediction
-        prediction = dosage_model.predict([features])[0]
+        with stage("predict"):
+            prediction = predict_one(dosage_model, features, dosage_cache, dosage_batcher, generation)
         
-        return {
-            "recommended_dosage": round(prediction, 2),
-            "dosage_per_hectare": round(prediction / data["area"], 2),
-            "application_guidelines": {
-                "soil_conditions": {
-                    "nitrogen": data["soil_n"],
-                    "phosphorus": data["soil_p"],
-                    "potassium": data["soil_k"],
-                    "ph_level": data["ph"]
-                },
-                "crop_info": {
-                    "type": data["crop_type"],
-                    "growth_stage": data["growth_stage"]
-                },
-                "area_hectares": data["area"]
-            }
-        }
+        return _build_result(data, prediction)
     except Exception as e:
         return {"error": f"Dosage recommendation failed: {str(e)}"}
+
+def get_dosage_recommendation_batch(records):
+    """
+    Get dosage recommendations for a list of records with a single predict call
+    Returns one result per record, in order; invalid records get an "error" entry
+    """
+    dosage_model, generation = active_model("dosage", dosage_cache)
+    if dosage_model is None:
+        return [{"error": "Dosage model not available. Please check model file."} for _ in records]
+    return run_batch(dosage_model, records, dosage_schema, _build_result, "Dosage recommendation", dosage_cache, generation)
@@ -1,14 +1,51 @@
-import joblib
 import os
 import json
+from services.inference import active_model, run_batch, predict_one
+from services.prediction_cache import PredictionCache
+from services.scheduler import MicroBatcher
+from services.model_registry import registry
+from services.metrics import stage
+from services import schema
+from database import log_codec, rollups
 
-# Load model once with error handling
+# Model is loaded by the registry on first use
 model_path = os.path.join("models", "fertilizer.pkl")
-try:
-    fertilizer_model = joblib.load(model_path)
-except Exception as e:
-    print(f"Warning: Could not load fertilizer model: {e}")
-    fertilizer_model = None
+registry.register("fertilizer", model_path)
+
+# Repeated feature rows skip the model; enabled per module via PREDICTION_CACHE
+fertilizer_cache = PredictionCache("fertilizer")
+
+# Concurrent single requests share one predict; enabled per module via INFERENCE_BATCHING
+fertilizer_batcher = MicroBatcher("fertilizer")
+
+# Request fields, in model feature order; compiled once into a validator and feature encoder
+fertilizer_schema = schema.compile("fertilizer", [
+    schema.number("soil_n", minimum=0),
+    schema.number("soil_p", minimum=0),
+    schema.number("soil_k", minimum=0),
+    schema.number("ph", minimum=0, maximum=14),
+    schema.number("area", greater_than=0)
+])
+
+def _build_result(data, prediction):
+    """Build the response payload for one prediction"""
+    return {
+        "recommended_fertilizer": prediction,
+        "soil_analysis": {
+            "nitrogen": data["soil_n"],
+            "phosphorus": data["soil_p"],
+            "potassium": data["soil_k"],
+            "ph_level": data["ph"]
+        },
+        "area_hectares": data["area"]
+    }
+
+# Logs store these fields packed and only the model outputs of the result
+log_codec.register("fertilizer", fields=["soil_n", "soil_p", "soil_k", "ph", "area"],
+                   outputs=["recommended_fertilizer"], build_result=_build_result)
+
+# Rollups of old logs are kept per time bucket for these dimensions
+rollups.register("fertilizer", dimensions=[("recommended_fertilizer",)])
 
 def get_fertilizer_recommendation(data):
     """
@@ -23,30 +60,30 @@ def get_fertilizer_recommendation(data):
     }
     """
     try:
+        # Validate the request and encode its features
+        with stage("extract"):
+            features, errors = fertilizer_schema.row(data)
+        if errors:
+            return schema.invalid(errors)
+
+        fertilizer_model, generation = active_model("fertilizer", fertilizer_cache)
         if fertilizer_model is None:
             return {"error": "Fertilizer model not available. Please check model file."}
-            
-        # Extract features from request
-        features = [
-            data["soil_n"],
-            data["soil_p"],
-            data["soil_k"],
-            data["ph"],
-            data["area"]
-        ]
-        
+
         # Get prediction
-        prediction = fertilizer_model.predict([features])[0]
+        with stage("predict"):
+            prediction = predict_one(fertilizer_model, features, fertilizer_cache, fertilizer_batcher, generation)
         
-        return {
-            "recommended_fertilizer": prediction,
-            "soil_analysis": {
-                "nitrogen": data["soil_n"],
-                "phosphorus": data["soil_p"],
-                "potassium": data["soil_k"],
-                "ph_level": data["ph"]
-            },
-            "area_hectares": data["area"]
-        }
+        return _build_result(data, prediction)
     except Exception as e:
         return {"error": f"Fertilizer recommendation failed: {str(e)}"}
+
+def get_fertilizer_recommendation_batch(records):
+    """
+    Get fertilizer recommendations for a list of records with a single predict call
+    Returns one result per record, in order; invalid records get an "error" entry
+    """
+    fertilizer_model, generation = active_model("fertilizer", fertilizer_cache)
+    if fertilizer_model is None:
+        return [{"error": "Fertilizer model not available. Please check model file."} for _ in records]
+    return run_batch(fertilizer_model, records, fertilizer_schema, _build_result, "Fertilizer recommendation", fertilizer_cache, generation)
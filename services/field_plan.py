@@ -0,0 +1,210 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from services.inference import active_model, predict_one
+from services.prediction_cache import caches
+from services.scheduler import batchers
+from services.metrics import stage
+from services import schema
+from database import log_codec, rollups
+from services.crop_service import crop_schema
+from services.fertilizer_service import fertilizer_schema
+from services.yield_service import yield_schema
+from services.dosage_service import dosage_schema
+
+# module: (model name in messages, name used in error messages), in the order results are listed
+MODULES = {
+    "crop": ("Crop", "Crop recommendation"),
+    "fertilizer": ("Fertilizer", "Fertilizer recommendation"),
+    "yield": ("Yield", "Yield prediction"),
+    "dosage": ("Dosage", "Dosage recommendation")
+}
+
+# Modules that echo a crop_type; it is not one of their features, so their
+# predictions never wait for the crop model, only their results do
+CHAINED = ("yield", "dosage")
+
+_module_schemas = {"crop": crop_schema, "fertilizer": fertilizer_schema, "yield": yield_schema, "dosage": dosage_schema}
+
+# The union of every module's fields (shared soil and weather fields once),
+# compiled into one validator and feature encoder; crop_type is optional and
+# checked separately
+plan_schema = schema.compile("field_plan", list({
+    field.name: field
+    for module_schema in _module_schemas.values() for field in module_schema.fields
+    if field.name != "crop_type"
+}.values()))
+
+_crop_type = schema.text("crop_type")
+
+# Positions of each module's features in the plan's feature tuple
+_picks = {
+    module: [plan_schema.features.index(name) for name in module_schema.features]
+    for module, module_schema in _module_schemas.items()
+}
+
+# Plan logs (see log_result) are rolled up by these dimensions
+rollups.register("field_plan", dimensions=[("crop_type",), ("recommended_crop",), ("recommended_fertilizer",)],
+                 value="predicted_yield")
+
+
+def _errors(data):
+    """Every problem with a plan request, as the module schemas report them"""
+    errors = plan_schema.errors(data)
+    if isinstance(data, dict) and "crop_type" in data:
+        try:
+            _crop_type.encode(data["crop_type"])
+        except schema.Invalid as e:
+            errors.append({"field": "crop_type", "code": e.code, "message": f"Invalid field crop_type: {e}"})
+    return errors
+
+
+def _predict(module, features):
+    """(prediction, None), or (None, error message) when the model is missing or fails"""
+    model_name, name = MODULES[module]
+    try:
+        cache = caches.get(module)
+        model, generation = active_model(module, cache)
+        if model is None:
+            return None, f"{model_name} model not available. Please check model file."
+        with stage("predict"):
+            return predict_one(model, features, cache, batchers.get(module), generation), None
+    except Exception as e:
+        return None, f"{name} failed: {str(e)}"
+
+
+def _build(module, data, crop_type, prediction):
+    """The module's own response for the plan's inputs"""
+    module_schema = _module_schemas[module]
+    inputs = {name: data[name] for name in module_schema.required if name != "crop_type"}
+    if "crop_type" in module_schema.required:
+        inputs["crop_type"] = crop_type
+    try:
+        return log_codec.schemas[(module, log_codec.SCHEMA_VERSION)].build_result(inputs, prediction)
+    except Exception as e:
+        return {"error": f"{MODULES[module][1]} failed: {str(e)}"}
+
+
+def _no_echo(input_data, prediction):
+    # A stored plan holds model outputs only; there are no input sections to rebuild
+    return {}
+
+
+def log_result(plan, versions):
+    """
+    The stored form of a plan: crop_type, each module's model outputs and its
+    error, if any, and the full version of each model that answered
+    ({module: version}); the row's model_version column stays NULL, since it
+    holds the one version that answered a single-model request
+    """
+    stored = {"crop_type": plan["crop_type"]}
+    errors = {}
+    for module in MODULES:
+        result = plan[module]
+        if "error" in result:
+            errors[module] = result["error"]
+            continue
+        for key in log_codec.schemas[(module, log_codec.SCHEMA_VERSION)].outputs:
+            stored[key] = result[key]
+    if errors:
+        stored["errors"] = errors
+    stored["model_versions"] = {module: versions[module] for module in MODULES if versions.get(module)}
+    return stored
+
+
+# Plan logs pack the plan's fields (without the optional crop_type); the
+# stored result is kept as compact JSON, since its model_versions map cannot
+# be packed. The outputs listed here are also the archive's result columns
+log_codec.register("field_plan", fields=[field.name for field in plan_schema.fields],
+                   outputs=["crop_type"] + [key for module in MODULES
+                                            for key in log_codec.schemas[(module, log_codec.SCHEMA_VERSION)].outputs]
+                   + ["model_versions"],
+                   build_result=_no_echo)
+
+
+class FieldPlanner:
+    """
+    Runs every model for one plot in a single request
+
+    The request is validated and its features encoded once, against the
+    union of the module schemas. The crop model runs in the request thread
+    while the other three run in a small thread pool, so a plan takes about
+    as long as its slowest model. The crop recommendation becomes the
+    crop_type of the yield and dosage results unless the request gives one.
+    The pool is created on first use and again in each forked child process.
+    """
+
+    def __init__(self, workers=3):
+        self.workers = workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _submit(self, fn, *args):
+        """Start fn(*args) in the pool (or run it now without one), in a copy of this context"""
+        context = contextvars.copy_context()
+        if self.workers <= 0:
+            future = Future()
+            future.set_result(context.run(fn, *args))
+            return future
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="field-plan")
+                    self._pid = os.getpid()
+        return self._executor.submit(context.run, fn, *args)
+
+    def plan(self, data):
+        """
+        Get every model's result for one plot
+        Expected input: the fields of all four modules (soil_n, soil_p, soil_k,
+        ph, temperature, humidity, rainfall, area, season, soil_quality,
+        growth_stage), plus an optional crop_type
+        """
+        with stage("extract"):
+            row = plan_schema.encode(data)
+            if row is None or "crop_type" in data:
+                errors = _errors(data)
+                if errors:
+                    return schema.invalid(errors)
+
+        features = {module: [row[i] for i in pick] for module, pick in _picks.items()}
+        pending = {module: self._submit(_predict, module, features[module]) for module in MODULES if module != "crop"}
+        crop_prediction, crop_error = _predict("crop", features["crop"])
+
+        plan = {"crop": {"error": crop_error} if crop_error else _build("crop", data, None, crop_prediction)}
+        if "crop_type" in data:
+            plan["crop_type"], plan["crop_type_source"] = data["crop_type"], "request"
+        elif crop_error is None:
+            plan["crop_type"], plan["crop_type_source"] = str(crop_prediction), "crop"
+        else:
+            plan["crop_type"], plan["crop_type_source"] = None, None
+
+        for module, future in pending.items():
+            prediction, error = future.result()
+            if error is None and module in CHAINED and plan["crop_type"] is None:
+                error = "No crop_type given and no crop recommendation to use"
+            plan[module] = {"error": error} if error else _build(module, data, plan["crop_type"], prediction)
+        plan["errors"] = sum(1 for module in MODULES if "error" in plan[module])
+        return plan
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+        self._executor = None
+
+
+planner = FieldPlanner()
+
+
+def init_app(app):
+    """
+    Configure the field plan endpoint from app config
+        FIELD_PLAN_WORKERS  - threads running the fertilizer, yield and dosage models
+                              next to the crop model; 0 runs all four one after
+                              another in the request thread (default 3)
+    """
+    app.config.setdefault("FIELD_PLAN_WORKERS", 3)
+    planner.workers = int(app.config["FIELD_PLAN_WORKERS"])
@@ -0,0 +1,245 @@
+import itertools
+
+import numpy as np
+
+# Grid points evaluated per predict call while a grid is built
+BUILD_CHUNK_ROWS = 65536
+
+# Largest table built (float32 cells); 2**26 is 256 MB
+MAX_CELLS = 1 << 26
+
+# Rows interpolated per pass; bounds the (rows x cell corners) temporaries
+CHUNK_ROWS = 4096
+
+# Coordinates this close to a grid point or edge count as on it
+_EPSILON = 1e-9
+
+
+def grid_axes(schema, ranges):
+    """
+    One (feature, low, high, points, exact) axis per model feature of a schema
+
+    Category fields get a point at every code and are matched exactly; number
+    fields get `points` evenly spaced values from `low` to `high`, taken from
+    `ranges` ({feature: (low, high, points)}).
+    """
+    fields = {field.name: field for field in schema.fields}
+    axes = []
+    for name in schema.features:
+        field = fields[name]
+        if field.kind == "category":
+            codes = sorted(field.table.values())
+            if len(codes) > 1 and len(set(np.diff(codes))) != 1:
+                raise ValueError(f"{schema.module} feature {name} has unevenly spaced codes")
+            axes.append((name, float(codes[0]), float(codes[-1]), len(codes), True))
+            continue
+        if name not in ranges:
+            raise ValueError(f"No grid range for {schema.module} feature {name}")
+        low, high, points = ranges[name]
+        if not (high > low and int(points) >= 2):
+            raise ValueError(f"Grid range for {schema.module} feature {name} needs low < high and 2+ points")
+        axes.append((name, float(low), float(high), int(points), False))
+    return axes
+
+
+class GridModel:
+    """
+    Lookup-table approximation of a model over a quantized input grid
+
+    Every feature has an axis of evenly spaced points (see grid_axes). The
+    model's prediction at every grid point is stored in one float32 array,
+    or as class indices for classifiers. predict() turns each row into grid
+    coordinates with arithmetic. It then either rounds to the nearest point
+    or interpolates linearly between the surrounding points on every number
+    axis. Rows outside the grid, or with a category code that is not a grid
+    point, go to the original model when one is attached as fallback.
+    """
+
+    def __init__(self, axes, table, classes=None, interpolate=True):
+        self.axes = [tuple(axis) for axis in axes]
+        self.table = table
+        self.classes_ = classes
+        self.interpolate = interpolate and classes is None
+        self.n_features_in_ = len(self.axes)
+        self.low = np.array([axis[1] for axis in self.axes])
+        high = np.array([axis[2] for axis in self.axes])
+        self.points = np.array([axis[3] for axis in self.axes])
+        self.step = np.where(self.points > 1, (high - self.low) / np.maximum(self.points - 1, 1), 1.0)
+        self.last = (self.points - 1).astype(np.float64)
+        self.exact = np.array([axis[4] for axis in self.axes])
+        # Flat index of grid point (i0, i1, ...) is sum(i * stride)
+        self.strides = np.array([int(np.prod(self.points[i + 1:])) for i in range(len(self.axes))], dtype=np.intp)
+        # The 2**k corners of a cell over the k number axes: which axes step
+        # up at each corner, and the flat offset that step adds
+        self.numeric = ~self.exact & (self.points > 1)
+        k = int(self.numeric.sum())
+        self.corners = np.array(list(itertools.product((False, True), repeat=k)), dtype=bool).reshape(2 ** k, k)
+        self.corner_offsets = self.corners @ self.strides[self.numeric]
+        self.error_report = None
+        self.fallback = None
+        self.fallback_rows = 0
+
+    @classmethod
+    def build(cls, estimator, axes, interpolate=True):
+        """Evaluate the estimator at every grid point"""
+        points = [axis[3] for axis in axes]
+        cells = int(np.prod(points))
+        if cells > MAX_CELLS:
+            raise ValueError(f"grid has {cells} points, more than {MAX_CELLS}")
+        low = np.array([axis[1] for axis in axes])
+        step = np.array([(axis[2] - axis[1]) / max(axis[3] - 1, 1) for axis in axes])
+
+        classes = None
+        table = None
+        for start in range(0, cells, BUILD_CHUNK_ROWS):
+            index = np.stack(np.unravel_index(np.arange(start, min(start + BUILD_CHUNK_ROWS, cells)), points), axis=1)
+            predictions = np.asarray(estimator.predict(low + index * step))
+            if table is None:
+                if predictions.dtype.kind in "biuf":
+                    table = np.empty(cells, dtype=np.float32)
+                else:
+                    classes = getattr(estimator, "classes_", None)
+                    if classes is None:
+                        raise TypeError("label predictions need an estimator with classes_")
+                    table = np.empty(cells, dtype=np.uint8 if len(classes) <= 256 else np.uint16)
+            if classes is not None:
+                predictions = np.searchsorted(classes, predictions)
+            table[start:start + len(predictions)] = predictions
+        return cls(axes, table.reshape(points), classes, interpolate)
+
+    def __getstate__(self):
+        # The fallback estimator is attached at load time, never stored with the table
+        state = dict(self.__dict__)
+        state["fallback"] = None
+        state["fallback_rows"] = 0
+        return state
+
+    def __setstate__(self, state):
+        # Only the table stays memory-mapped; NumPy ops on the small memmap'd
+        # axis arrays would cost more than the lookup itself
+        for key, value in state.items():
+            if isinstance(value, np.ndarray) and key != "table":
+                state[key] = np.array(value)
+        self.__dict__.update(state)
+
+    @property
+    def cells(self):
+        return self.table.size
+
+    def _validate(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2:
+            raise ValueError(f"Expected 2D array, got {X.ndim}D array instead")
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but model is expecting {self.n_features_in_} features as input.")
+        return X
+
+    def _locate(self, X):
+        """(grid coordinates of every row, mask of rows inside the grid)"""
+        position = (X - self.low) / self.step
+        inside = ((position >= -_EPSILON) & (position <= self.last + _EPSILON)).all(axis=1)
+        if self.exact.any():
+            exact = position[:, self.exact]
+            inside &= (np.abs(exact - np.rint(exact)) <= _EPSILON).all(axis=1)
+        return np.minimum(np.maximum(position, 0.0), self.last), inside
+
+    def _lookup(self, position):
+        """Table values at in-grid coordinates"""
+        flat = np.asarray(self.table).reshape(-1)
+        if not self.interpolate:
+            return flat[np.rint(position).astype(np.intp) @ self.strides]
+
+        numeric = self.numeric
+        result = np.empty(len(position))
+        for start in range(0, len(position), CHUNK_ROWS):
+            chunk = position[start:start + CHUNK_ROWS]
+            index = np.rint(chunk).astype(np.intp)
+            # Lower corner of the cell; the last point on an axis uses the cell below it
+            cell = np.minimum(np.floor(chunk[:, numeric]), self.last[numeric] - 1)
+            fraction = (chunk[:, numeric] - cell)[:, None, :]
+            index[:, numeric] = cell
+            # (rows, corners): each corner's value, weighted by its nearness on every axis
+            values = flat[(index @ self.strides)[:, None] + self.corner_offsets]
+            weights = np.where(self.corners, fraction, 1.0 - fraction).prod(axis=2)
+            result[start:start + CHUNK_ROWS] = (weights * values).sum(axis=1)
+        return result
+
+    def predict(self, X):
+        X = self._validate(X)
+        position, inside = self._locate(X)
+        if inside.all():
+            values = self._lookup(position)
+            return self.classes_.take(values) if self.classes_ is not None else values
+
+        if self.fallback is None:
+            raise ValueError(f"{int((~inside).sum())} rows are outside the lookup grid and no fallback model is attached")
+        outside = self.fallback.predict(X[~inside])
+        self.fallback_rows += len(outside)
+        result = np.empty(len(X), dtype=np.asarray(outside).dtype if self.classes_ is not None else np.float64)
+        result[~inside] = outside
+        if inside.any():
+            values = self._lookup(position[inside])
+            result[inside] = self.classes_.take(values) if self.classes_ is not None else values
+        return result
+
+    def stats(self):
+        return {
+            "cells": self.cells,
+            "table_bytes": self.table.nbytes,
+            "interpolate": self.interpolate,
+            "axes": [
+                {"feature": name, "low": low, "high": high, "points": points, "exact": exact}
+                for name, low, high, points, exact in self.axes
+            ],
+            "error": self.error_report,
+            "fallback_rows": self.fallback_rows
+        }
+
+
+def error_matrix(grid, n_random=5000, seed=0):
+    """
+    Rows spread over the whole grid: number features uniform between their
+    grid bounds (so mostly between grid points, where the error is largest),
+    category features at random codes
+    """
+    rng = np.random.default_rng(seed)
+    high = grid.low + grid.step * (grid.points - 1)
+    X = rng.uniform(grid.low, high, size=(n_random, grid.n_features_in_))
+    codes = rng.integers(0, grid.points, size=X.shape)
+    return np.where(grid.exact, grid.low + codes * grid.step, X)
+
+
+def measure_error(grid, estimator, X=None):
+    """
+    Compare the grid with the model it approximates on in-grid rows; for
+    regressors the largest and mean absolute error (and the largest relative
+    to the model's output range), for classifiers the share of rows that disagree
+    """
+    if X is None:
+        X = error_matrix(grid)
+    expected = np.asarray(estimator.predict(X))
+    fallback, grid.fallback = grid.fallback, None
+    try:
+        actual = grid.predict(X)
+    finally:
+        grid.fallback = fallback
+
+    if grid.classes_ is not None:
+        return {"rows": len(X), "disagreement": float(np.mean(expected != actual))}
+    error = np.abs(actual - expected.astype(np.float64))
+    worst = int(np.argmax(error))
+    spread = float(np.ptp(expected)) or 1.0
+    return {
+        "rows": len(X),
+        "max_abs_error": float(error[worst]),
+        "mean_abs_error": float(error.mean()),
+        "max_relative_error": float(error[worst] / spread),
+        "worst_row": [float(value) for value in X[worst]]
+    }
+
+
+def build_grid(estimator, axes, interpolate=True):
+    """Build a grid over `axes` (see grid_axes) and measure its error against the estimator"""
+    grid = GridModel.build(estimator, axes, interpolate)
+    grid.error_report = measure_error(grid, estimator)
+    return grid
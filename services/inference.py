@@ -0,0 +1,98 @@
+import numpy as np
+from services.prediction_cache import MISSING
+from services.metrics import stage
+from services.schema import invalid
+from services.model_registry import registry
+
+
+def active_model(name, cache=None):
+    """
+    (active model, cache generation), the generation read before the model is
+    fetched: after a swap in between, predictions by the old model carry a
+    stale generation and are never cached under the new one
+    """
+    generation = cache.generation if cache is not None else None
+    return registry.get(name), generation
+
+
+def predict_rows(model, rows, cache=None, generation=None):
+    """
+    Predict a matrix (or list) of feature rows with one model call
+    When a cache is given and enabled, only the rows it misses reach the model;
+    `generation` is the cache generation from active_model()
+    """
+    matrix = np.asarray(rows, dtype=float)
+    if cache is None or not cache.enabled:
+        return list(model.predict(matrix))
+
+    if generation is None:
+        generation = cache.generation
+    keys = [cache.key(row) for row in matrix.tolist()]
+    predictions = [cache.get(key) for key in keys]
+    missing = [i for i, prediction in enumerate(predictions) if prediction is MISSING]
+    if missing:
+        fresh = model.predict(matrix[missing])
+        for i, prediction in zip(missing, fresh):
+            cache.put(keys[i], prediction, generation)
+            predictions[i] = prediction
+    return predictions
+
+
+def predict_one(model, features, cache=None, batcher=None, generation=None):
+    """
+    Predict a single feature row
+    Checks the cache first; on a miss the row goes through the micro-batcher
+    when one is enabled so it shares a model call with concurrent requests.
+    `generation` is the cache generation from active_model()
+    """
+    row = np.asarray(features, dtype=float)
+    use_cache = cache is not None and cache.enabled
+    if use_cache:
+        if generation is None:
+            generation = cache.generation
+        key = cache.key(row.tolist())
+        prediction = cache.get(key)
+        if prediction is not MISSING:
+            return prediction
+
+    if batcher is not None and batcher.enabled:
+        prediction = batcher.predict(model, row)
+    else:
+        prediction = model.predict(row.reshape(1, -1))[0]
+
+    if use_cache:
+        cache.put(key, prediction, generation)
+    return prediction
+
+
+def run_batch(model, records, schema, build_result, prefix, cache=None, generation=None):
+    """
+    Run one vectorized predict over many records
+    Records that fail the schema get its error entry instead of failing the
+    whole batch; results are returned in the same order as records
+    """
+    results = [None] * len(records)
+
+    with stage("extract"):
+        matrix, positions, errors = schema.matrix(records)
+    for i, problems in errors.items():
+        results[i] = invalid(problems)
+
+    if not positions:
+        return results
+
+    try:
+        with stage("predict"):
+            predictions = predict_rows(model, matrix, cache, generation)
+    except Exception as e:
+        for i in positions:
+            results[i] = {"error": f"{prefix} failed: {str(e)}"}
+        return results
+
+    for i, prediction in zip(positions, predictions):
+        try:
+            results[i] = build_result(records[i], prediction)
+        except Exception as e:
+            results[i] = {"error": f"{prefix} failed: {str(e)}"}
+
+    return results
@@ -0,0 +1,86 @@
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    """NumPy scalars and arrays (model outputs) as plain JSON values, then Flask's own types"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return DefaultJSONProvider.default(value)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that uses orjson when it is installed and `fast` is on
+
+    NumPy values are serialized natively (orjson) or through .item() (standard
+    library), and dates, UUIDs, decimals and dataclasses as Flask does. orjson
+    output differs only in whitespace, non-ASCII text written as UTF-8 instead
+    of \\u escapes, and NaN/Infinity written as null. Anything orjson cannot
+    encode (integers beyond 64 bits, unusual dump arguments) falls back to the
+    standard library.
+    """
+
+    default = staticmethod(_default)
+    fast = orjson is not None
+
+    def _option(self, kwargs):
+        """orjson flags for json.dumps-style arguments, or None when orjson cannot honour them"""
+        if not self.fast or not kwargs.keys() <= {"indent", "separators", "sort_keys"}:
+            return None
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumpb(self, obj, **kwargs):
+        """Serialize to UTF-8 bytes, ready for a response body"""
+        option = self._option(kwargs)
+        if option is not None:
+            try:
+                return orjson.dumps(obj, default=self.default, option=option)
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs).encode("utf-8")
+
+    def dumps(self, obj, **kwargs):
+        if self._option(kwargs) is None:
+            return super().dumps(obj, **kwargs)
+        return self.dumpb(obj, **kwargs).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if self.fast and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            body = self.dumpb(obj, indent=2)
+        else:
+            body = self.dumpb(obj, separators=(",", ":"))
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+def init_app(app):
+    """
+    Install the JSON provider from app config
+        JSON_FAST_ENCODER  - encode and parse with orjson when it is installed (default True)
+        JSON_SORT_KEYS     - sort object keys in responses, as Flask does by default (default True)
+    """
+    app.config.setdefault("JSON_FAST_ENCODER", True)
+    app.config.setdefault("JSON_SORT_KEYS", True)
+
+    provider = FastJSONProvider(app)
+    provider.fast = orjson is not None and bool(app.config["JSON_FAST_ENCODER"])
+    provider.sort_keys = bool(app.config["JSON_SORT_KEYS"])
+    app.json = provider
@@ -0,0 +1,187 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+
+# Upper bounds in seconds; wide enough for a cached hit and a cold batch
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PREFIX = "smart_farming"
+
+
+class Histogram:
+    """Prometheus-style histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self.snapshot().items()):
+            base = _labels(zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+
+stage_seconds = Histogram(
+    f"{PREFIX}_stage_duration_seconds",
+    "Time spent in each stage of a prediction request",
+    ("module", "endpoint", "stage")
+)
+request_seconds = Histogram(
+    f"{PREFIX}_request_duration_seconds",
+    "End-to-end handler time of prediction requests by outcome",
+    ("module", "endpoint", "outcome")
+)
+
+_current = contextvars.ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    """Stage timings for one request; stages are recorded as they finish"""
+
+    __slots__ = ("module", "endpoint", "started", "outcome")
+
+    def __init__(self, module, endpoint):
+        self.module = module
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.outcome = None
+
+    def finish(self, outcome):
+        request_seconds.observe((self.module, self.endpoint, outcome), time.perf_counter() - self.started)
+
+
+class _Stage:
+    __slots__ = ("name", "timer", "started")
+
+    def __init__(self, name):
+        self.name = name
+        self.timer = _current.get()
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.timer is not None:
+            timer = self.timer
+            stage_seconds.observe((timer.module, timer.endpoint, self.name), time.perf_counter() - self.started)
+        return False
+
+
+def stage(name):
+    """Time a block as one stage of the current request; a no-op outside instrumented views"""
+    return _Stage(name)
+
+
+def set_outcome(outcome):
+    """Override the outcome label of the current request (e.g. "model_error")"""
+    timer = _current.get()
+    if timer is not None:
+        timer.outcome = outcome
+
+
+def _outcome_for(status):
+    if status < 400:
+        return "ok"
+    if status < 500:
+        return "invalid"
+    return "error"
+
+
+def instrumented(module, endpoint="single"):
+    """Record per-stage and end-to-end timings for a view function"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            timer = RequestTimer(module, endpoint)
+            token = _current.set(timer)
+            try:
+                response = view(*args, **kwargs)
+            except Exception:
+                timer.finish("exception")
+                raise
+            finally:
+                _current.reset(token)
+            status = response[1] if isinstance(response, tuple) else getattr(response, "status_code", 200)
+            timer.finish(timer.outcome or _outcome_for(status))
+            return response
+        return wrapper
+    return decorator
+
+
+def instrumented_async(module, endpoint="single"):
+    """instrumented() for coroutine handlers that return a (status, ...) tuple"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            timer = RequestTimer(module, endpoint)
+            token = _current.set(timer)
+            try:
+                response = await handler(*args, **kwargs)
+            except Exception:
+                timer.finish("exception")
+                raise
+            finally:
+                _current.reset(token)
+            timer.finish(timer.outcome or _outcome_for(response[0]))
+            return response
+        return wrapper
+    return decorator
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in pairs)
+
+
+def format_metric(name, metric_type, help_text, samples):
+    """
+    Render one counter or gauge family
+    samples: list of ({label: value}, number)
+    """
+    name = f"{PREFIX}_{name}"
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        if value is None:
+            continue
+        if labels:
+            lines.append(f"{name}{{{_labels(labels.items())}}} {value}")
+        else:
+            lines.append(f"{name} {value}")
+    return lines
+
+
+def render_histograms():
+    return stage_seconds.render() + request_seconds.render()
@@ -0,0 +1,722 @@
+import contextvars
+import hashlib
+import os
+import shutil
+import sys
+import threading
+import time
+
+import joblib
+import numpy as np
+
+from services.schema import schemas
+from services.tree_engine import CompiledForest, compile_verified
+from services.grid_engine import GridModel, build_grid, grid_axes
+
+# Model versions used by the current request, {name: version}; see track_versions()
+_served = contextvars.ContextVar("served_model_versions", default=None)
+
+
+def _is_mapped(array):
+    """True if the array's memory comes from a memory-mapped file"""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base if isinstance(array, np.ndarray) else None
+    return False
+
+
+def _measure(obj, totals=None, seen=None):
+    """
+    Rough in-memory size of an estimator, split into private bytes (Python
+    objects and heap arrays) and mapped bytes (arrays backed by an mmap'd file)
+    """
+    if totals is None:
+        totals = {"private": 0, "mapped": 0}
+    if seen is None:
+        seen = {}
+    if id(obj) in seen:
+        return totals
+    # Keep a reference so temporaries from __getstate__ can't recycle an id
+    seen[id(obj)] = obj
+
+    if isinstance(obj, np.ndarray):
+        totals["mapped" if _is_mapped(obj) else "private"] += obj.nbytes
+        return totals
+    totals["private"] += sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            _measure(k, totals, seen)
+            _measure(v, totals, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            _measure(item, totals, seen)
+    elif hasattr(obj, "__dict__"):
+        _measure(vars(obj), totals, seen)
+    elif hasattr(obj, "__getstate__") and type(obj).__module__.startswith("sklearn"):
+        # Cython objects such as sklearn's Tree expose their arrays through __getstate__
+        state = obj.__getstate__()
+        if isinstance(state, dict):
+            _measure(state, totals, seen)
+    return totals
+
+
+def mmap_path(path):
+    """Location of the memory-mappable copy of a model artifact"""
+    return os.path.splitext(path)[0] + ".joblib"
+
+
+def compiled_path(path):
+    """Location of the precompiled (flattened) copy of a tree ensemble artifact"""
+    return os.path.splitext(path)[0] + ".compiled.joblib"
+
+
+def compressed_path(path):
+    """Location of the compressed (pruned, deduplicated) copy of a tree ensemble artifact"""
+    return os.path.splitext(path)[0] + ".compressed.joblib"
+
+
+def grid_path(path):
+    """Location of the precomputed lookup-grid copy of a model artifact"""
+    return os.path.splitext(path)[0] + ".grid.joblib"
+
+
+def engine_name(model):
+    if isinstance(model, CompiledForest):
+        return "compressed" if model.compression is not None else "compiled"
+    if isinstance(model, GridModel):
+        return "grid"
+    return "sklearn"
+
+
+def process_memory():
+    """Memory of this worker process from /proc (Linux only), in bytes"""
+    report = {"pid": os.getpid()}
+    wanted = {"Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in wanted:
+                    report[key.lower() + "_bytes"] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return report
+
+
+def file_stamp(path):
+    """(mtime, size) of an artifact file, or None if it is missing; a new stamp means a new file"""
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+def artifact_version(path):
+    """Short content digest of an artifact, so the same file is the same version in every process"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def _replace_file(target, write):
+    """Write a file under a temporary name and rename it, so readers never see it half-written"""
+    temporary = f"{target}.{os.getpid()}.tmp"
+    try:
+        write(temporary)
+        os.replace(temporary, target)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def track_versions():
+    """
+    Start recording the model versions the current request uses and return
+    the {name: version} dict that registry.get() fills in. Contexts copied
+    afterwards (the async API's inference threads) share the same dict.
+    """
+    served = {}
+    _served.set(served)
+    return served
+
+
+class ModelVersion:
+    """One load of a model artifact: the model, its digest, and what loading it cost"""
+
+    def __init__(self, path, stamp):
+        self.path = path
+        self.stamp = stamp
+        self.version = None
+        self.model = None
+        self.source = None
+        self.engine = None
+        self.error = None
+        self.status = "loading"
+        self.load_seconds = None
+        self.memory_bytes = None
+        self.mapped_bytes = None
+        self.loaded_at = None
+        self.activated_at = None
+        self.retired_at = None
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "status": self.status,
+            "source": self.source,
+            "engine": self.engine,
+            "error": self.error,
+            "load_seconds": round(self.load_seconds, 4) if self.load_seconds is not None else None,
+            "memory_bytes": self.memory_bytes,
+            "mapped_bytes": self.mapped_bytes,
+            "loaded_at": self.loaded_at,
+            "activated_at": self.activated_at,
+            "retired_at": self.retired_at
+        }
+
+
+class ModelEntry:
+    """
+    One model artifact: the active version, loaded on first use, and the
+    versions it replaced or rejected
+
+    reload() loads and validates a new artifact while the active version keeps
+    serving, then swaps it in with a single assignment; requests that already
+    hold the old model finish with it.
+    """
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.active = None
+        self.failure = None
+        self.history = []
+        self.keep_history = 10
+        self.loaded = False
+        self.seen_stamp = None
+        self.reloads = 0
+        self.rejections = 0
+        self.versions_dir = None
+        self.on_swap = None
+        self.mmap = False
+        self.engine = "sklearn"
+        self.max_rows = None
+        self.grid_ranges = {}
+        self.grid_interpolate = True
+        self.grid_axes = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        active = self.active
+        return active.model if active is not None else None
+
+    @property
+    def version(self):
+        active = self.active
+        return active.version if active is not None else None
+
+    @property
+    def error(self):
+        """Why the model is not available (the first load failed), or None"""
+        if self.active is None and self.failure is not None:
+            return self.failure.error
+        return None
+
+    def _is_fresh(self, path, candidate):
+        """True if a derived artifact exists and is at least as new as the .pkl"""
+        if not os.path.exists(candidate):
+            return False
+        if not os.path.exists(path) or os.path.getmtime(candidate) >= os.path.getmtime(path):
+            return True
+        print(f"Warning: {candidate} is older than {path}; re-run convert_models.py")
+        return False
+
+    def _load_estimator(self, path):
+        """(estimator, file read), from the mmap-able copy when enabled and fresh"""
+        candidate = mmap_path(path)
+        if self.mmap and self._is_fresh(path, candidate):
+            return joblib.load(candidate, mmap_mode="r"), candidate
+        return joblib.load(path), path
+
+    def _load_compiled(self, path):
+        """
+        (flattened engine, file read), from the precompiled artifact when fresh
+        (verified by convert_models.py), otherwise by compiling and verifying here
+        """
+        candidate = compiled_path(path)
+        estimator = None
+        if self._is_fresh(path, candidate):
+            compiled = joblib.load(candidate, mmap_mode="r" if self.mmap else None)
+        else:
+            estimator, candidate = self._load_estimator(path)
+            compiled = compile_verified(estimator)
+
+        if self.max_rows is not None:
+            # Large batches run faster through sklearn's C traversal
+            compiled.fallback = estimator if estimator is not None else self._load_estimator(path)[0]
+            compiled.max_rows = self.max_rows
+        return compiled, candidate
+
+    def _load_compressed(self, path):
+        """
+        (compressed engine, file read) from the artifact convert_models.py --compress
+        wrote; it is lossy, so it is never built here and has no sklearn fallback
+        """
+        candidate = compressed_path(path)
+        if not self._is_fresh(path, candidate):
+            raise FileNotFoundError(f"no up-to-date {candidate}; run convert_models.py --compress")
+        return joblib.load(candidate, mmap_mode="r" if self.mmap else None), candidate
+
+    def resolved_grid_axes(self):
+        """
+        The lookup grid's axes, from the module's schema and GRID_ENGINE_RANGES;
+        None where no schema is registered (processes that never import the services)
+        """
+        if self.grid_axes is None and self.name in schemas:
+            self.grid_axes = grid_axes(schemas[self.name], self.grid_ranges)
+        return self.grid_axes
+
+    def _load_grid(self, path):
+        """
+        (lookup grid, file read), from the precomputed grid when it is fresh and
+        built over the configured axes, otherwise by evaluating the model here;
+        the estimator is always loaded too, to answer rows outside the grid
+        """
+        axes = self.resolved_grid_axes()
+        if axes is None:
+            raise ValueError(f"no input schema registered for {self.name}")
+        estimator, source = self._load_estimator(path)
+        candidate = grid_path(path)
+        grid = None
+        if self._is_fresh(path, candidate):
+            grid = joblib.load(candidate, mmap_mode="r" if self.mmap else None)
+            if grid.axes != axes:
+                print(f"Warning: {candidate} was built over other axes than GRID_ENGINE_RANGES; re-run flask build-grid")
+                grid = None
+        if grid is None:
+            grid = build_grid(estimator, axes, self.grid_interpolate)
+            candidate = source
+        grid.interpolate = self.grid_interpolate and grid.classes_ is None
+        grid.fallback = estimator
+        return grid, candidate
+
+    def write_grid(self):
+        """Build the lookup grid over the configured axes and write it next to the artifact; returns (grid, file)"""
+        axes = self.resolved_grid_axes()
+        if axes is None:
+            raise ValueError(f"no input schema registered for {self.name}")
+        estimator, _ = self._load_estimator(self.path)
+        grid = build_grid(estimator, axes, self.grid_interpolate)
+        target = grid_path(self.path)
+        # compress=0 keeps the table a raw buffer, so it can be memory-mapped
+        _replace_file(target, lambda temporary: joblib.dump(grid, temporary, compress=0))
+        return grid, target
+
+    def _load_model(self, path, strict=False):
+        """
+        (model, file read) for the configured engine. When the engine cannot be
+        used the first load serves the plain estimator instead; `strict` (a new
+        version replacing an active one) raises, so the version is rejected
+        rather than activated on another engine
+        """
+        loaders = {"compiled": (self._load_compiled, "Could not compile {} model"),
+                   "compressed": (self._load_compressed, "Could not load the compressed {} model"),
+                   "grid": (self._load_grid, "Could not build the {} lookup grid")}
+        if self.engine in loaders:
+            load, failure = loaders[self.engine]
+            try:
+                return load(path)
+            except Exception as e:
+                if strict:
+                    raise RuntimeError(f"{self.engine} engine unavailable: {e}") from e
+                print(f"Warning: {failure.format(self.name)}, serving it with sklearn: {e}")
+        return self._load_estimator(path)
+
+    def derived_path(self, path):
+        """The prebuilt artifact the configured engine reads next to `path`, or None"""
+        derived = {"compiled": compiled_path, "compressed": compressed_path, "grid": grid_path}.get(self.engine)
+        return derived(path) if derived is not None else None
+
+    def stamp(self, path):
+        """
+        file_stamp of the artifact and of its engine's prebuilt copy, so writing
+        that copy after a version was rejected for lacking it loads the version again
+        """
+        derived = self.derived_path(path)
+        return file_stamp(path) if derived is None else (file_stamp(path), file_stamp(derived))
+
+    def _validate(self, model):
+        """
+        Raise unless the model predicts one value per row for a probe batch
+        as wide as the module's encoded requests, of the same kind (labels or
+        numbers) as the active version
+        """
+        if not callable(getattr(model, "predict", None)):
+            raise TypeError("artifact has no predict()")
+        schema = schemas.get(self.name)
+        if schema is None:
+            return
+        probe = np.zeros((2, schema.width))
+        predictions = np.asarray(model.predict(probe))
+        if len(predictions) != len(probe):
+            raise ValueError(f"predict() returned {len(predictions)} values for {len(probe)} rows")
+        active = self.model
+        if active is None:
+            return
+        try:
+            expected = np.asarray(active.predict(probe)).dtype.kind in "biuf"
+        except Exception:
+            # The active version cannot be compared; the probe alone decides
+            return
+        if (predictions.dtype.kind in "biuf") != expected:
+            raise TypeError("predicts labels where the active version predicts numbers" if expected
+                            else "predicts numbers where the active version predicts labels")
+
+    def _read(self, path, validate, version=None):
+        """Load the artifact at `path` as a ModelVersion; a failure is recorded on it, not raised"""
+        started = time.perf_counter()
+        candidate = ModelVersion(path, file_stamp(path))
+        try:
+            candidate.version = version or artifact_version(path)
+            candidate.model, candidate.source = self._load_model(path, strict=validate and self.active is not None)
+            if file_stamp(path) != candidate.stamp:
+                raise RuntimeError(f"{path} changed while it was being loaded")
+            if validate:
+                self._validate(candidate.model)
+            totals = _measure(candidate.model)
+            candidate.memory_bytes = totals["private"]
+            candidate.mapped_bytes = totals["mapped"]
+            candidate.engine = engine_name(candidate.model)
+        except Exception as e:
+            candidate.model = None
+            candidate.error = str(e)
+            candidate.status = "failed"
+        candidate.load_seconds = time.perf_counter() - started
+        candidate.loaded_at = time.time()
+        return candidate
+
+    def load(self):
+        """Return the active model, reading the artifact on first use; concurrent callers wait for the first load"""
+        if self.loaded:
+            return self.model
+        with self._lock:
+            if self.loaded:
+                return self.model
+            stamp = self.stamp(self.path)
+            candidate = self._read(self.path, validate=False)
+            self.seen_stamp = stamp
+            if candidate.error is None:
+                self._activate(candidate)
+            else:
+                print(f"Warning: Could not load {self.name} model: {candidate.error}")
+                self.failure = candidate
+            self.loaded = True
+        return self.model
+
+    def reload(self, source=None):
+        """
+        Load a new version and make it active if it validates; the active
+        version serves requests until then, and stays active if it does not.
+        `source` is an archived artifact to load and, once it validates,
+        publish to `path`; by default the file at `path` is read.
+
+        Returns the new ModelVersion ("active" or "rejected"), or None when
+        the file holds the active version already
+        """
+        with self._lock:
+            path = source or self.path
+            stamp = self.stamp(path)
+            if source is None and self.loaded and stamp == self.seen_stamp:
+                return None
+            try:
+                version = artifact_version(path)
+            except OSError as e:
+                version = None
+                print(f"Warning: Could not read {self.name} model artifact {path}: {e}")
+            if version is not None and version == self.version:
+                # Touched or republished without changes
+                if source is not None:
+                    _replace_file(self.path, lambda target: shutil.copyfile(source, target))
+                self.seen_stamp = self.stamp(self.path)
+                return None
+
+            candidate = self._read(path, validate=True, version=version)
+            if candidate.error is not None:
+                candidate.status = "rejected"
+                self.rejections += 1
+                self._remember(candidate)
+                if source is None:
+                    # Not retried until the file changes again
+                    self.seen_stamp = stamp
+                print(f"Warning: Rejected {self.name} model version {candidate.version}, "
+                      f"keeping {self.version}: {candidate.error}")
+                return candidate
+
+            if source is not None:
+                # Other processes (and the next start) pick the new version up from `path`
+                _replace_file(self.path, lambda target: shutil.copyfile(source, target))
+                self.seen_stamp = self.stamp(self.path)
+            else:
+                self.seen_stamp = stamp
+            self._activate(candidate)
+            self.loaded = True
+            self.reloads += 1
+            return candidate
+
+    def _activate(self, candidate):
+        previous = self.active
+        candidate.status = "active"
+        candidate.activated_at = time.time()
+        # The swap: requests read `active` once and keep the model they got
+        self.active = candidate
+        self.failure = None
+        if previous is None:
+            return
+        previous.status = "retired"
+        previous.retired_at = candidate.activated_at
+        self._remember(previous)
+        if self.on_swap is not None:
+            self.on_swap(self.name, candidate.version)
+
+    def _remember(self, version):
+        """Keep the stats of a replaced or rejected version; its model is released"""
+        self.history.insert(0, version.stats())
+        del self.history[self.keep_history:]
+
+    def archive_path(self, version):
+        return os.path.join(self.versions_dir, self.name, version + os.path.splitext(self.path)[1])
+
+    def store(self, data):
+        """
+        Save uploaded artifact bytes under versions_dir; returns (version, path)
+        Only uploads are archived here: activating a version records its hash
+        but copies nothing, so the lazy first load in each process stays cheap
+        """
+        if self.versions_dir is None:
+            raise RuntimeError("MODEL_VERSIONS_DIR is not set")
+        version = hashlib.sha256(data).hexdigest()[:12]
+        path = self.archive_path(version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        def write(temporary):
+            with open(temporary, "wb") as f:
+                f.write(data)
+
+        _replace_file(path, write)
+        return version, path
+
+    def archived(self):
+        """Artifacts kept under versions_dir, newest first"""
+        folder = os.path.join(self.versions_dir, self.name) if self.versions_dir else None
+        if folder is None or not os.path.isdir(folder):
+            return []
+        extension = os.path.splitext(self.path)[1]
+        found = []
+        for filename in os.listdir(folder):
+            version, ext = os.path.splitext(filename)
+            if ext != extension:
+                continue
+            stat = os.stat(os.path.join(folder, filename))
+            found.append({"version": version, "bytes": stat.st_size, "archived_at": stat.st_mtime})
+        return sorted(found, key=lambda item: item["archived_at"], reverse=True)
+
+    def versions(self):
+        """The active version first, then replaced and rejected ones, newest first"""
+        active = self.active
+        return ([active.stats()] if active is not None else []) + list(self.history)
+
+    def stats(self):
+        current = self.active or self.failure
+        if not self.loaded:
+            status = "not_loaded"
+        elif self.active is None:
+            status = "error"
+        else:
+            status = "loaded"
+        return {
+            "path": self.path,
+            "version": current.version if current else None,
+            "source": current.source if current else None,
+            "status": status,
+            "engine": engine_name(self.model),
+            "grid": self.model.stats() if isinstance(self.model, GridModel) else None,
+            "compression": self.model.compression if isinstance(self.model, CompiledForest) else None,
+            "error": self.error,
+            "load_seconds": round(current.load_seconds, 4) if current else None,
+            "memory_bytes": current.memory_bytes if current else None,
+            "mapped_bytes": current.mapped_bytes if current else None,
+            "loaded_at": current.loaded_at if current else None,
+            "reloads": self.reloads,
+            "rejections": self.rejections
+        }
+
+
+class ModelRegistry:
+    """
+    Central registry of the service models
+
+    Services register their artifact path at import time; nothing is read
+    from disk until a model is first requested (or warmed up). With a watch
+    interval set, a daemon thread in each process reloads any loaded model
+    whose artifact file changes.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        # Set by services.process_pool.init_app; offloaded models are returned wrapped
+        self.pool = None
+        # Called with (name, version) when a new version replaces an active one
+        self.listeners = []
+        self.watch_interval = 0
+        self._watcher_pid = None
+        self._lock = threading.Lock()
+
+    def register(self, name, path):
+        if name not in self._entries:
+            entry = self._entries[name] = ModelEntry(name, path)
+            entry.on_swap = self._swapped
+        return self._entries[name]
+
+    def entry(self, name):
+        return self._entries[name]
+
+    def names(self):
+        return list(self._entries)
+
+    def get(self, name):
+        """
+        Return the active model, or None if its artifact could not be loaded
+        The version returned is recorded for requests that track_versions()
+        """
+        entry = self._entries[name]
+        entry.load()
+        if self.watch_interval > 0 and self._watcher_pid != os.getpid():
+            self._start_watcher()
+        active = entry.active
+        if active is None:
+            return None
+        served = _served.get()
+        if served is not None:
+            served[name] = active.version
+        if self.pool is not None and self.pool.handles(name):
+            return self.pool.wrap(name, active.model, active.version)
+        return active.model
+
+    def _swapped(self, name, version):
+        for listener in self.listeners:
+            try:
+                listener(name, version)
+            except Exception as e:
+                print(f"Warning: Model swap listener failed for {name}: {e}")
+
+    def _start_watcher(self):
+        """Start the artifact watcher on first use, and again in each forked child process"""
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+            threading.Thread(target=self._watch, name="model-watcher", daemon=True).start()
+
+    def _watch(self):
+        while self.watch_interval > 0:
+            time.sleep(self.watch_interval)
+            for entry in list(self._entries.values()):
+                # A model not loaded yet reads the new file on first use anyway
+                if entry.loaded and entry.stamp(entry.path) != entry.seen_stamp:
+                    try:
+                        entry.reload()
+                    except Exception as e:
+                        print(f"Warning: Could not reload {entry.name} model: {e}")
+        self._watcher_pid = None
+
+    def reload(self, name, source=None, background=False):
+        """Load a new version of a model (see ModelEntry.reload), optionally in a daemon thread"""
+        entry = self._entries[name]
+        if not background:
+            return entry.reload(source)
+        thread = threading.Thread(target=entry.reload, args=(source,), name=f"model-reload-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def warm_up(self, names=None, background=False):
+        """Load models ahead of the first request, optionally in a daemon thread"""
+        names = list(self._entries) if names is None else names
+
+        def load_all():
+            for name in names:
+                self._entries[name].load()
+
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, name="model-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        return {name: entry.stats() for name, entry in self._entries.items()}
+
+    def versions(self):
+        """Per model: the active version, the versions loaded in this process and the archived artifacts"""
+        return {name: {"active": entry.version, "versions": entry.versions(), "archived": entry.archived()}
+                for name, entry in self._entries.items()}
+
+    def init_app(self, app):
+        """
+        Apply model settings from app config
+            MODEL_MMAP    - load models/<name>.joblib read-only memory-mapped
+                            when it exists (default True)
+            MODEL_WARMUP  - "lazy" loads each model on its first request (default),
+                            "background" loads all in a daemon thread,
+                            "eager" loads all before serving
+            INFERENCE_ENGINE          - {module: "sklearn" | "compiled" | "compressed" | "grid"}
+                                        (default sklearn)
+            COMPILED_ENGINE_MAX_ROWS  - batches larger than this go to the sklearn
+                                        estimator; None serves everything compiled
+            GRID_ENGINE_RANGES        - {module: {feature: (low, high, points)}} for the
+                                        number features of "grid" modules; category
+                                        features always get a point per code
+            GRID_ENGINE_INTERPOLATE   - interpolate between grid points instead of
+                                        taking the nearest one (default True)
+            MODEL_WATCH_INTERVAL      - seconds between checks of the artifact files;
+                                        a changed file is loaded, validated and swapped
+                                        in (default 0, off)
+            MODEL_VERSIONS_DIR        - where uploaded artifacts are kept for activating
+                                        again (default models/versions)
+            MODEL_VERSION_HISTORY     - replaced and rejected versions listed per model (default 10)
+            MODEL_ADMIN_TOKEN         - bearer token for the /api/admin/models upload,
+                                        activate and reload endpoints; unset disables them
+        """
+        app.config.setdefault("MODEL_MMAP", True)
+        app.config.setdefault("MODEL_WARMUP", "lazy")
+        app.config.setdefault("INFERENCE_ENGINE", {})
+        app.config.setdefault("COMPILED_ENGINE_MAX_ROWS", 256)
+        app.config.setdefault("GRID_ENGINE_RANGES", {})
+        app.config.setdefault("GRID_ENGINE_INTERPOLATE", True)
+        app.config.setdefault("MODEL_WATCH_INTERVAL", 0)
+        app.config.setdefault("MODEL_VERSIONS_DIR", os.path.join("models", "versions"))
+        app.config.setdefault("MODEL_VERSION_HISTORY", 10)
+        app.config.setdefault("MODEL_ADMIN_TOKEN", None)
+        self.watch_interval = float(app.config["MODEL_WATCH_INTERVAL"] or 0)
+        for name, entry in self._entries.items():
+            entry.mmap = bool(app.config["MODEL_MMAP"])
+            entry.engine = app.config["INFERENCE_ENGINE"].get(name, "sklearn")
+            entry.max_rows = app.config["COMPILED_ENGINE_MAX_ROWS"]
+            entry.grid_ranges = app.config["GRID_ENGINE_RANGES"].get(name, {})
+            entry.grid_interpolate = bool(app.config["GRID_ENGINE_INTERPOLATE"])
+            entry.grid_axes = None
+            entry.versions_dir = app.config["MODEL_VERSIONS_DIR"]
+            entry.keep_history = int(app.config["MODEL_VERSION_HISTORY"])
+        mode = app.config["MODEL_WARMUP"]
+        if mode == "eager":
+            self.warm_up()
+        elif mode == "background":
+            self.warm_up(background=True)
+
+
+registry = ModelRegistry()
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+
+from services.model_registry import registry
+
+# Every cache created by a service module, keyed by module name
+caches = {}
+
+MISSING = object()
+
+
+class PredictionCache:
+    """
+    Bounded LRU + TTL cache of model predictions keyed on the feature row
+
+    Keys are tuples of the feature row the module's compiled schema encodes
+    (numbers as floats, category fields as their codes), so any two requests
+    that encode to the same features, such as 45 and 45.0, share an entry.
+    The cache empties itself when the registry activates a new version of
+    the model. Disabled until configured by init_app.
+    """
+
+    def __init__(self, name, max_size=1024, ttl=300.0):
+        self.name = name
+        self.enabled = False
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every model swap; puts made for an older generation are dropped
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        caches[name] = self
+
+    @staticmethod
+    def key(features):
+        return tuple(float(value) for value in features)
+
+    def get(self, key):
+        """Return the cached prediction, or MISSING"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            expires_at, value = entry
+            if expires_at < now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        """Store a prediction; `generation` is the one read before predicting, if any"""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                # Predicted by a model that has been replaced since
+                return
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def model_swapped(self):
+        """Drop every entry; they were predicted by the version just replaced"""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+        self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+
+
+def init_app(app):
+    """
+    Configure every service cache from app config
+        PREDICTION_CACHE       - {module: bool} switch per module (default all off)
+        PREDICTION_CACHE_SIZE  - max entries per module (default 1024)
+        PREDICTION_CACHE_TTL   - seconds an entry stays valid (default 300)
+    """
+    app.config.setdefault("PREDICTION_CACHE", {})
+    app.config.setdefault("PREDICTION_CACHE_SIZE", 1024)
+    app.config.setdefault("PREDICTION_CACHE_TTL", 300.0)
+
+    for name, cache in caches.items():
+        cache.enabled = bool(app.config["PREDICTION_CACHE"].get(name, False))
+        cache.max_size = int(app.config["PREDICTION_CACHE_SIZE"])
+        cache.ttl = float(app.config["PREDICTION_CACHE_TTL"])
+        cache.clear()
+
+
+def _model_swapped(name, version):
+    cache = caches.get(name)
+    if cache is not None:
+        cache.model_swapped()
+
+
+registry.listeners.append(_model_swapped)
@@ -0,0 +1,242 @@
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from services.model_registry import registry
+
+
+def _cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _default_size():
+    """
+    The cores shared out over the server processes: every gunicorn or uvicorn
+    worker (WEB_CONCURRENCY, set by gunicorn.conf.py) runs a pool of its own
+    """
+    try:
+        servers = max(1, int(os.environ.get("WEB_CONCURRENCY", 1)))
+    except ValueError:
+        servers = 1
+    return max(1, _cores() // servers)
+
+
+# Run inside the pool's worker processes
+
+def _init_worker(settings):
+    """Register the offloaded models with the parent's settings and load them once"""
+    for name, (path, mmap, engine, max_rows, grid_axes, grid_interpolate) in settings.items():
+        entry = registry.register(name, path)
+        entry.mmap = mmap
+        entry.engine = engine
+        entry.max_rows = max_rows
+        entry.grid_axes = grid_axes
+        entry.grid_interpolate = grid_interpolate
+        entry.load()
+
+
+def _predict(name, version, rows):
+    entry = registry.entry(name)
+    if entry.version != version:
+        # The server swapped in a new version; read it from the artifact file
+        entry.reload()
+    model = registry.get(name)
+    if model is None:
+        raise RuntimeError(f"{name} model could not be loaded in the inference pool: {registry.entry(name).error}")
+    return model.predict(rows)
+
+
+def _ping():
+    return os.getpid()
+
+
+class PooledModel:
+    """Stands in for a loaded model in the services; predict() runs in the pool"""
+
+    def __init__(self, pool, name, model, version):
+        self.pool = pool
+        self.name = name
+        self.model = model
+        self.version = version
+
+    def predict(self, rows):
+        return self.pool.predict(self.name, self.model, rows, self.version)
+
+    def __getattr__(self, attr):
+        return getattr(self.model, attr)
+
+
+class InferencePool:
+    """
+    Persistent process pool for CPU-bound model calls
+
+    Tree ensembles hold the GIL while they predict, so threads in one server
+    process take turns on a single core. Models listed in `modules` are
+    loaded once in each of `processes` worker processes and registry.get()
+    hands the services a PooledModel whose predict() runs there: calls of
+    `min_rows` rows or more go to the pool, split into contiguous shards of
+    at most `chunk_size` rows (and at least one shard per process), and the
+    results are concatenated back in order. Smaller calls run in this process.
+    A worker that gets a call for another version than the one it holds
+    reloads the artifact file first.
+
+    Workers are started with "spawn" (forking a threaded server is unsafe) on
+    first use, again in each forked server process, and after a worker dies.
+    """
+
+    def __init__(self, processes=None, chunk_size=5000, min_rows=1):
+        self.modules = set()
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.min_rows = min_rows
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._proxies = {}
+        self.calls = 0
+        self.local_calls = 0
+        self.shards = 0
+        self.rows = 0
+        self.failures = 0
+        self.restarts = 0
+        self.seconds = 0.0
+
+    @property
+    def size(self):
+        return self.processes or _default_size()
+
+    def handles(self, name):
+        return name in self.modules
+
+    def wrap(self, name, model, version=None):
+        """The PooledModel for a loaded model, reused while the model stays the same"""
+        proxy = self._proxies.get(name)
+        if proxy is None or proxy.model is not model:
+            proxy = self._proxies[name] = PooledModel(self, name, model, version)
+        return proxy
+
+    def _ensure(self):
+        if self._executor is not None and self._pid == os.getpid():
+            return self._executor
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                settings = {}
+                for name in self.modules:
+                    entry = registry.entry(name)
+                    grid_axes = None
+                    if entry.engine == "grid":
+                        try:
+                            # Resolved here: pool processes have no schemas
+                            grid_axes = entry.resolved_grid_axes()
+                        except ValueError:
+                            # The pool process reports it when it falls back to sklearn
+                            pass
+                    settings[name] = (entry.path, entry.mmap, entry.engine, entry.max_rows,
+                                      grid_axes, entry.grid_interpolate)
+                self._executor = ProcessPoolExecutor(self.size, mp_context=multiprocessing.get_context("spawn"),
+                                                     initializer=_init_worker, initargs=(settings,))
+                self._pid = os.getpid()
+            return self._executor
+
+    def warm_up(self):
+        """Start every worker process (each loads its models) before the first request"""
+        if not self.modules:
+            return
+        executor = self._ensure()
+        # Each submit made while no worker is idle starts another process
+        for future in [executor.submit(_ping) for _ in range(self.size)]:
+            future.result()
+
+    def split(self, count):
+        """Contiguous (start, stop) shards for `count` rows"""
+        per_shard = max(1, min(self.chunk_size, math.ceil(count / self.size)))
+        return [(start, min(start + per_shard, count)) for start in range(0, count, per_shard)]
+
+    def predict(self, name, model, rows, version=None):
+        if len(rows) < self.min_rows:
+            self.local_calls += 1
+            return model.predict(rows)
+
+        executor = self._ensure()
+        started = time.perf_counter()
+        bounds = self.split(len(rows))
+        try:
+            futures = [executor.submit(_predict, name, version, rows[start:stop]) for start, stop in bounds]
+            results = [future.result() for future in futures]
+        except BrokenProcessPool:
+            self.failures += 1
+            self._restart(executor)
+            raise RuntimeError("Inference pool worker died; the pool has been restarted")
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.seconds += time.perf_counter() - started
+        self.calls += 1
+        self.shards += len(bounds)
+        self.rows += len(rows)
+        return results[0] if len(results) == 1 else np.concatenate(results)
+
+    def _restart(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                print("Warning: An inference pool worker died; starting a new pool")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self.restarts += 1
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self):
+        return {
+            "modules": sorted(self.modules),
+            "processes": self.size,
+            "chunk_size": self.chunk_size,
+            "min_rows": self.min_rows,
+            "running": self._executor is not None and self._pid == os.getpid(),
+            "calls": self.calls,
+            "local_calls": self.local_calls,
+            "shards": self.shards,
+            "rows": self.rows,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "mean_call_ms": round(self.seconds * 1000 / self.calls, 3) if self.calls else 0.0
+        }
+
+
+inference_pool = InferencePool()
+
+
+def init_app(app):
+    """
+    Configure the inference process pool from app config
+        INFERENCE_PROCESSES         - {module: bool} predict in the pool (default all off)
+        INFERENCE_POOL_SIZE         - worker processes per server process (default: CPU
+                                      cores over WEB_CONCURRENCY server processes)
+        INFERENCE_POOL_CHUNK_SIZE   - most rows sent to one worker per task (default 5000)
+        INFERENCE_POOL_MIN_ROWS     - smaller calls predict in the server process (default 1)
+    """
+    app.config.setdefault("INFERENCE_PROCESSES", {})
+    app.config.setdefault("INFERENCE_POOL_SIZE", None)
+    app.config.setdefault("INFERENCE_POOL_CHUNK_SIZE", 5000)
+    app.config.setdefault("INFERENCE_POOL_MIN_ROWS", 1)
+
+    size = app.config["INFERENCE_POOL_SIZE"]
+    inference_pool.modules = {name for name, enabled in app.config["INFERENCE_PROCESSES"].items() if enabled}
+    inference_pool.processes = int(size) if size else None
+    inference_pool.chunk_size = int(app.config["INFERENCE_POOL_CHUNK_SIZE"])
+    inference_pool.min_rows = int(app.config["INFERENCE_POOL_MIN_ROWS"])
+    registry.pool = inference_pool
@@ -0,0 +1,121 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# Every batcher created by a service module, keyed by module name
+batchers = {}
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row predictions for one model
+
+    Callers block on predict() while a worker thread collects rows that
+    arrive within max_wait seconds (or until max_batch rows are waiting),
+    runs one vectorized predict over the stacked matrix and hands each
+    caller its own row of the output. Disabled until configured by init_app.
+    """
+
+    def __init__(self, name, max_wait=0.002, max_batch=64):
+        self.name = name
+        self.enabled = False
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        batchers[name] = self
+
+    def _ensure_worker(self):
+        """Start the worker on first use, and again in each forked child process"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+            self._thread.start()
+
+    def predict(self, model, row):
+        """Predict one feature row, sharing the model call with concurrent callers"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((model, row, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        # A model swap can leave rows for two estimators in the same window
+        groups = {}
+        for model, row, future in batch:
+            groups.setdefault(id(model), (model, []))[1].append((row, future))
+
+        for model, items in groups.values():
+            try:
+                predictions = model.predict(np.array([row for row, _ in items], dtype=float))
+            except Exception:
+                # Isolate the failing row instead of failing every caller
+                for row, future in items:
+                    try:
+                        future.set_result(model.predict(np.array([row], dtype=float))[0])
+                    except Exception as e:
+                        future.set_exception(e)
+                continue
+            for (_, future), prediction in zip(items, predictions):
+                future.set_result(prediction)
+
+        self.batches += 1
+        self.rows += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch
+        }
+
+
+def init_app(app):
+    """
+    Configure every service batcher from app config
+        INFERENCE_BATCHING           - {module: bool} switch per module (default all off)
+        INFERENCE_BATCH_MAX_WAIT_MS  - how long the first row waits for company (default 2)
+        INFERENCE_BATCH_MAX_SIZE     - rows that trigger an immediate predict (default 64)
+    """
+    app.config.setdefault("INFERENCE_BATCHING", {})
+    app.config.setdefault("INFERENCE_BATCH_MAX_WAIT_MS", 2)
+    app.config.setdefault("INFERENCE_BATCH_MAX_SIZE", 64)
+
+    for name, batcher in batchers.items():
+        batcher.enabled = bool(app.config["INFERENCE_BATCHING"].get(name, False))
+        batcher.max_wait = float(app.config["INFERENCE_BATCH_MAX_WAIT_MS"]) / 1000.0
+        batcher.max_batch = int(app.config["INFERENCE_BATCH_MAX_SIZE"])
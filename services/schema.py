@@ -0,0 +1,215 @@
+import itertools
+import math
+
+import numpy as np
+
+# Compiled schemas by module, for GET /api/schemas
+schemas = {}
+
+
+class Invalid(Exception):
+    """A field value failed its check; `code` is "type", "range" or "choice" """
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class Field:
+    """
+    One request field
+
+    `encode` turns a valid value into the model's number (raising Invalid
+    otherwise); fields with `feature` False are checked but not sent to the model.
+    """
+
+    def __init__(self, name, kind, encode, feature=True, **spec):
+        self.name = name
+        self.kind = kind
+        self.encode = encode
+        self.feature = feature
+        self.spec = spec
+
+    def source(self, var, table):
+        """(condition, feature expression) for the generated fast path; `table` names its code table"""
+        if self.kind == "number":
+            low = self.spec.get("minimum")
+            above = self.spec.get("greater_than")
+            high = self.spec.get("maximum")
+            # Chained comparisons are False for NaN, and the open ends exclude infinities
+            lower = f"{above!r} <" if above is not None else (f"{low!r} <=" if low is not None else "-_inf <")
+            upper = f"<= {high!r}" if high is not None else "< _inf"
+            return f"(type({var}) is float or type({var}) is int) and {lower} {var} {upper}", var
+        if self.kind == "category":
+            return f"type({var}) is str and {var} in {table}", f"{table}[{var}]"
+        return f"type({var}) is str and {var} != ''", None
+
+    def describe(self):
+        return dict({"name": self.name, "type": self.kind, "feature": self.feature}, **self.spec)
+
+
+def number(name, minimum=None, maximum=None, greater_than=None):
+    """A finite JSON number (not a boolean) within the given bounds"""
+    low = -math.inf if minimum is None else minimum
+    high = math.inf if maximum is None else maximum
+    above = -math.inf if greater_than is None else greater_than
+    if greater_than is not None:
+        bounds = f"greater than {greater_than}" + (f" and at most {maximum}" if maximum is not None else "")
+    elif minimum is not None and maximum is not None:
+        bounds = f"between {minimum} and {maximum}"
+    elif minimum is not None:
+        bounds = f"at least {minimum}"
+    else:
+        bounds = f"at most {maximum}" if maximum is not None else "finite"
+
+    def encode(value):
+        if type(value) is not float and type(value) is not int:
+            raise Invalid("type", "must be a number")
+        if not (low <= value <= high and value > above and math.isfinite(value)):
+            raise Invalid("range", f"must be {bounds}")
+        return value
+
+    spec = {key: bound for key, bound in (("minimum", minimum), ("maximum", maximum),
+                                          ("greater_than", greater_than)) if bound is not None}
+    return Field(name, "number", encode, **spec)
+
+
+def category(name, codes):
+    """A string from a fixed set, encoded with the `codes` table"""
+    table = dict(codes)
+    allowed = ", ".join(table)
+
+    def encode(value):
+        if type(value) is not str:
+            raise Invalid("type", "must be a string")
+        code = table.get(value)
+        if code is None:
+            raise Invalid("choice", f"must be one of: {allowed}")
+        return code
+
+    field = Field(name, "category", encode, choices=list(table))
+    field.table = table
+    return field
+
+
+def text(name):
+    """A non-empty string the model does not use (echoed back and logged)"""
+
+    def encode(value):
+        if type(value) is not str:
+            raise Invalid("type", "must be a string")
+        if not value:
+            raise Invalid("range", "must not be empty")
+        return value
+
+    return Field(name, "string", encode, feature=False)
+
+
+def invalid(errors):
+    """The service result for a request that failed validation (routes answer it with 400)"""
+    return {"error": errors[0]["message"], "details": errors}
+
+
+def _generate(fields):
+    """
+    Build one function that fetches, checks and encodes every field of a
+    request in a single expression, returning the feature tuple, or None
+    (or raising) when anything is wrong
+    """
+    namespace = {"_inf": math.inf}
+    lines = ["def encode(data):"]
+    conditions = []
+    features = []
+    for i, field in enumerate(fields):
+        var = f"v{i}"
+        table = f"_table{i}"
+        if field.kind == "category":
+            namespace[table] = field.table
+        condition, feature = field.source(var, table)
+        lines.append(f"    {var} = data[{field.name!r}]")
+        conditions.append(f"({condition})")
+        if feature is not None:
+            features.append(feature)
+    lines.append(f"    if not ({' and '.join(conditions)}):")
+    lines.append("        return None")
+    lines.append(f"    return ({', '.join(features)},)")
+    exec("\n".join(lines), namespace)
+    return namespace["encode"]
+
+
+class InputSchema:
+    """
+    Validator and feature encoder for one model's requests
+
+    Valid requests go through a function generated from the fields once,
+    at import time; a request it rejects is checked again field by field,
+    in declaration order, to report every problem.
+    """
+
+    def __init__(self, module, fields):
+        self.module = module
+        self.fields = list(fields)
+        self.required = [field.name for field in self.fields]
+        self.features = [field.name for field in self.fields if field.feature]
+        self.width = len(self.features)
+        self._encode = _generate(self.fields)
+
+    def encode(self, data):
+        """The feature tuple for a valid request, or None"""
+        try:
+            return self._encode(data)
+        except Exception:
+            # Missing key, non-object body or unhashable category value
+            return None
+
+    def errors(self, data):
+        """Every problem with a request, as {"field", "code", "message"} dicts"""
+        if not isinstance(data, dict):
+            return [{"field": None, "code": "type", "message": "Request body must be a JSON object"}]
+        errors = []
+        for field in self.fields:
+            if field.name not in data:
+                errors.append({"field": field.name, "code": "missing",
+                               "message": f"Missing required field: {field.name}"})
+                continue
+            try:
+                field.encode(data[field.name])
+            except Invalid as e:
+                errors.append({"field": field.name, "code": e.code, "message": f"Invalid field {field.name}: {e}"})
+        return errors
+
+    def row(self, data):
+        """(feature row, errors) for one request; the row is None when there are errors"""
+        values = self.encode(data)
+        if values is None:
+            return None, self.errors(data)
+        return np.array(values, dtype=float), []
+
+    def matrix(self, records):
+        """
+        (feature matrix of the valid records, their positions, {position: errors})
+        The features are streamed into one array allocated at its final size
+        """
+        rows = []
+        positions = []
+        errors = {}
+        encode = self.encode
+        for i, record in enumerate(records):
+            values = encode(record)
+            if values is None:
+                errors[i] = self.errors(record)
+            else:
+                rows.append(values)
+                positions.append(i)
+        matrix = np.fromiter(itertools.chain.from_iterable(rows), dtype=float, count=len(rows) * self.width)
+        return matrix.reshape(len(rows), self.width), positions, errors
+
+    def describe(self):
+        return {"fields": [field.describe() for field in self.fields], "features": self.features}
+
+
+def compile(module, fields):
+    """Build a module's schema once, at import time, and register it"""
+    schema = InputSchema(module, fields)
+    schemas[module] = schema
+    return schema
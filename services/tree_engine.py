@@ -0,0 +1,394 @@
+import numpy as np
+
+# Rows evaluated per traversal pass; keeps the (rows x trees) index arrays cache-sized
+CHUNK_ROWS = 2048
+
+
+class CompiledForest:
+    """
+    Flattened, NumPy-only form of a fitted sklearn tree or tree ensemble
+
+    Every tree is concatenated into the same contiguous arrays: split feature,
+    threshold, interleaved (right, left) children and per-node leaf value.
+    All trees are walked one level at a time with vectorized indexing, and
+    (row, tree) pairs drop out as soon as they reach a leaf. Splits compare
+    float32 inputs with float64 thresholds, exactly like sklearn.
+
+    Per-call overhead is tiny, but NumPy gathers lose to sklearn's C loop on
+    large inputs, so batches over max_rows go to the original estimator when
+    one is attached as fallback.
+
+    A compressed forest (see compress) shares nodes between trees, stores
+    float32 thresholds and keeps each distinct leaf value once in `value`,
+    with `value_index` giving every node's row.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth,
+                 n_features_in, classes=None, value_index=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.value_index = value_index
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features_in
+        self.classes_ = classes
+        self.is_leaf = ~np.isfinite(threshold)
+        self.fallback = None
+        self.max_rows = None
+        self.compression = None
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        """Flatten a DecisionTree*, RandomForest* or ExtraTrees* estimator"""
+        trees = getattr(estimator, "estimators_", [estimator])
+        if not len(trees) or not all(hasattr(tree, "tree_") for tree in trees):
+            raise TypeError(f"{type(estimator).__name__} is not a tree ensemble")
+        classes = getattr(estimator, "classes_", None)
+        if classes is not None and np.ndim(classes) != 1:
+            raise TypeError("multi-output classifiers are not supported")
+
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in trees:
+            t = tree.tree_
+            if t.n_outputs != 1:
+                raise TypeError("multi-output trees are not supported")
+
+            nodes = np.arange(t.node_count, dtype=np.intp)
+            leaf = t.children_left == -1
+            feature = t.feature.astype(np.intp)
+            threshold = t.threshold.astype(np.float64)
+            feature[leaf] = 0
+            threshold[leaf] = np.inf
+
+            # children[2 * node + went_left]; leaves point at themselves
+            child = np.empty(2 * t.node_count, dtype=np.intp)
+            child[0::2] = np.where(leaf, nodes, t.children_right) + offset
+            child[1::2] = np.where(leaf, nodes, t.children_left) + offset
+
+            value = t.value[:, 0, :].astype(np.float64)
+            if classes is not None:
+                # Same normalization DecisionTreeClassifier.predict_proba applies
+                totals = value.sum(axis=1, keepdims=True)
+                value = np.divide(value, totals, out=np.zeros_like(value), where=totals > 0)
+            else:
+                value = value[:, 0]
+
+            features.append(feature)
+            thresholds.append(threshold)
+            children.append(child)
+            values.append(value)
+            roots.append(offset)
+            offset += t.node_count
+            max_depth = max(max_depth, t.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.concatenate(children),
+            value=np.concatenate(values),
+            roots=np.array(roots, dtype=np.intp),
+            max_depth=max_depth,
+            n_features_in=int(getattr(estimator, "n_features_in_", 0)) or None,
+            classes=classes
+        )
+
+    def __getstate__(self):
+        # The fallback estimator is attached at load time, never stored with the arrays
+        state = dict(self.__dict__)
+        state["fallback"] = None
+        return state
+
+    def __setstate__(self, state):
+        # Engines compiled before compression existed
+        state.setdefault("value_index", None)
+        state.setdefault("compression", None)
+        for key, value in state.items():
+            if isinstance(value, np.memmap):
+                # A plain view of the same mapped pages; np.memmap adds
+                # overhead to every indexing operation of the traversal
+                state[key] = np.asarray(value)
+        self.__dict__.update(state)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    def _validate(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError(f"Expected 2D array, got {X.ndim}D array instead")
+        if self.n_features_in_ is not None and X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but model is expecting {self.n_features_in_} features as input.")
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity.")
+        return X
+
+    def _leaves(self, X):
+        """Walk every tree for every row; returns (rows, trees) leaf node indices"""
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        offsets = np.repeat(np.arange(n_rows, dtype=np.intp) * n_features, self.n_trees)
+        leaves = np.tile(self.roots, n_rows)
+        active = np.arange(leaves.size)
+        nodes = leaves[active]
+        for _ in range(self.max_depth):
+            went_left = flat[offsets[active] + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = self.children[2 * nodes + went_left]
+            done = self.is_leaf[nodes]
+            if done.any():
+                leaves[active[done]] = nodes[done]
+                active = active[~done]
+                nodes = nodes[~done]
+                if not active.size:
+                    break
+        return leaves.reshape(n_rows, self.n_trees)
+
+    def _aggregate(self, X):
+        X = self._validate(X)
+        out = []
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            leaves = self._leaves(X[start:start + CHUNK_ROWS])
+            if self.value_index is not None:
+                leaves = self.value_index[leaves]
+            # Summed tree by tree, the same order the sklearn forests accumulate in
+            out.append(self.value[leaves].sum(axis=1, dtype=np.float64) / self.n_trees)
+        return np.concatenate(out) if out else np.empty((0,) + self.value.shape[1:])
+
+    def _use_fallback(self, X):
+        return self.fallback is not None and self.max_rows is not None and len(X) > self.max_rows
+
+    def predict_proba(self, X):
+        if self.classes_ is None:
+            raise AttributeError("predict_proba is only available for classifiers")
+        if self._use_fallback(X):
+            return self.fallback.predict_proba(X)
+        return self._aggregate(X)
+
+    def predict(self, X):
+        if self._use_fallback(X):
+            return self.fallback.predict(X)
+        aggregated = self._aggregate(X)
+        if self.classes_ is None:
+            return aggregated
+        return self.classes_.take(np.argmax(aggregated, axis=1))
+
+
+def verification_matrix(compiled, n_random=2000, seed=0):
+    """
+    Inputs that exercise the splits: random rows spanning each feature's
+    threshold range plus rows sitting exactly on thresholds
+    """
+    rng = np.random.default_rng(seed)
+    n_features = compiled.n_features_in_ or int(compiled.feature.max()) + 1
+    split = np.isfinite(compiled.threshold)
+    low = np.zeros(n_features)
+    high = np.ones(n_features)
+    on_threshold = []
+    for f in range(n_features):
+        t = compiled.threshold[split & (compiled.feature == f)]
+        if len(t):
+            low[f], high[f] = t.min(), t.max()
+            on_threshold.append(rng.choice(t, size=min(len(t), n_random // 4)))
+        else:
+            on_threshold.append(np.array([0.0]))
+
+    span = np.maximum(high - low, 1.0)
+    X = rng.uniform(low - 0.1 * span, high + 0.1 * span, size=(n_random, n_features))
+    edge = X[: n_random // 4].copy()
+    for f in range(n_features):
+        edge[:, f] = rng.choice(on_threshold[f], size=len(edge))
+    return np.vstack([X, edge]).astype(np.float32)
+
+
+def compile_verified(estimator, X=None):
+    """
+    Compile an estimator and check it reproduces the original predictions
+    Raises ValueError if any prediction differs
+    """
+    compiled = CompiledForest.from_estimator(estimator)
+    if X is None:
+        X = verification_matrix(compiled)
+    expected = estimator.predict(X)
+    actual = compiled.predict(X)
+    if compiled.classes_ is not None:
+        mismatches = int(np.sum(expected != actual))
+    else:
+        mismatches = int(np.sum(~np.isclose(expected, actual, rtol=1e-9, atol=0)))
+    if mismatches:
+        raise ValueError(f"compiled model disagrees with the original on {mismatches} of {len(X)} rows")
+    return compiled
+
+
+def _levels(children, is_leaf, roots):
+    """Yield the distinct nodes at each depth below `roots`, root level first"""
+    frontier = np.unique(roots)
+    while frontier.size:
+        yield frontier
+        inner = frontier[~is_leaf[frontier]]
+        frontier = np.unique(np.concatenate([children[2 * inner], children[2 * inner + 1]]))
+
+
+def _round_down32(threshold):
+    """
+    float32 thresholds that split float32 inputs exactly as the float64 ones do:
+    x <= t holds for a float32 x exactly when x <= the largest float32 not above t
+    """
+    rounded = threshold.astype(np.float32)
+    above = rounded.astype(np.float64) > threshold
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def select_trees(compiled, X, n_trees=None, min_agreement=None):
+    """
+    Indices of the trees to keep, chosen greedily: each step adds the tree
+    that brings the kept trees' prediction closest to the whole ensemble's on X
+    (most rows with the same class; smallest mean error for regressors).
+    Stops at n_trees or once min_agreement (classifiers only) is reached.
+    """
+    if n_trees is None and min_agreement is None:
+        return np.arange(compiled.n_trees)
+    if min_agreement is not None and compiled.classes_ is None:
+        raise ValueError("min_agreement only applies to classifiers; give n_trees")
+    limit = compiled.n_trees if n_trees is None else min(int(n_trees), compiled.n_trees)
+    values = compiled.value
+    if compiled.value_index is not None:
+        values = values[compiled.value_index]
+    # (rows, trees[, classes]) of each tree's own prediction
+    per_tree = values[compiled._leaves(compiled._validate(X))].astype(np.float32)
+    total = per_tree.sum(axis=1)
+    target = np.argmax(total, axis=1) if compiled.classes_ is not None else total / compiled.n_trees
+
+    chosen = []
+    remaining = list(range(compiled.n_trees))
+    kept = np.zeros_like(total)
+    while len(chosen) < limit:
+        candidates = kept[:, None] + per_tree[:, remaining]
+        if compiled.classes_ is not None:
+            scores = (np.argmax(candidates, axis=2) == target[:, None]).mean(axis=0)
+        else:
+            scores = -np.abs(candidates / (len(chosen) + 1) - target[:, None]).mean(axis=0)
+        best = int(np.argmax(scores))
+        kept += per_tree[:, remaining[best]]
+        chosen.append(remaining.pop(best))
+        if min_agreement is not None and scores[best] >= min_agreement:
+            break
+    return np.array(sorted(chosen))
+
+
+def compress(estimator, X=None, n_trees=None, min_agreement=None, max_depth=None, value_dtype=np.float32):
+    """
+    A smaller CompiledForest approximating a tree ensemble
+
+    Trees are pruned to the subset select_trees picks on X (by default the
+    verification matrix), then cut at max_depth, where a node becomes a leaf
+    holding its training class distribution. Thresholds are rounded down to
+    float32 and leaf values cast to value_dtype and kept once each. Identical
+    subtrees, within and across trees, are stored once. Only the tree
+    selection, the depth cut and value_dtype can change predictions. Check
+    them with agreement().
+    """
+    full = CompiledForest.from_estimator(estimator)
+    if X is None:
+        X = verification_matrix(full)
+    trees = select_trees(full, X, n_trees, min_agreement)
+    roots = full.roots[trees]
+
+    is_leaf = full.is_leaf.copy()
+    reachable = np.zeros(full.node_count, dtype=bool)
+    for depth, level in enumerate(_levels(full.children, is_leaf, roots)):
+        if max_depth is not None and depth == max_depth:
+            is_leaf[level] = True
+        reachable[level] = True
+
+    leaves = np.flatnonzero(reachable & is_leaf)
+    palette, inverse = np.unique(full.value[leaves].astype(value_dtype), axis=0, return_inverse=True)
+    palette_row = np.zeros(full.node_count, dtype=np.intp)
+    palette_row[leaves] = inverse.reshape(-1)
+    threshold32 = _round_down32(full.threshold)
+
+    # Children are numbered after their parent within each sklearn tree, so
+    # walking nodes backwards gives every child its shared id before its parent
+    shared = {}
+    canonical = np.full(full.node_count, -1, dtype=np.intp)
+    feature, threshold, right, left, value_index = [], [], [], [], []
+    for node in np.flatnonzero(reachable)[::-1]:
+        if is_leaf[node]:
+            key = (-1, palette_row[node])
+        else:
+            key = (full.feature[node], threshold32[node],
+                   canonical[full.children[2 * node + 1]], canonical[full.children[2 * node]])
+        ident = shared.get(key)
+        if ident is None:
+            ident = shared[key] = len(feature)
+            if is_leaf[node]:
+                feature.append(0)
+                threshold.append(np.inf)
+                right.append(ident)
+                left.append(ident)
+                value_index.append(palette_row[node])
+            else:
+                feature.append(key[0])
+                threshold.append(key[1])
+                left.append(key[2])
+                right.append(key[3])
+                value_index.append(0)
+        canonical[node] = ident
+
+    # Kept intp: narrower children are converted on every traversal step
+    children = np.empty(2 * len(feature), dtype=np.intp)
+    children[0::2] = right
+    children[1::2] = left
+    new_roots = canonical[roots]
+    new_threshold = np.array(threshold, dtype=np.float32)
+    n_features = int(full.n_features_in_ or max(feature) + 1)
+    compressed = CompiledForest(
+        feature=np.array(feature, dtype=np.uint8 if n_features <= 256 else np.int32),
+        threshold=new_threshold,
+        children=children,
+        value=palette,
+        roots=new_roots,
+        max_depth=sum(1 for _ in _levels(children, ~np.isfinite(new_threshold), new_roots)) - 1,
+        n_features_in=full.n_features_in_,
+        classes=full.classes_,
+        value_index=np.array(value_index, dtype=np.uint8 if len(palette) <= 256 else np.int32)
+    )
+    compressed.compression = {
+        "trees": int(len(trees)),
+        "original_trees": full.n_trees,
+        "nodes": compressed.node_count,
+        "original_nodes": full.node_count,
+        "max_depth": compressed.max_depth,
+        "original_max_depth": full.max_depth,
+        "leaf_values": int(len(palette)),
+        "value_dtype": np.dtype(value_dtype).name
+    }
+    return compressed
+
+
+def agreement(original, compressed, X):
+    """
+    How closely compressed predictions match the original model's on X: the
+    share of rows with the same class (overall, and among rows where the
+    original gives one class at least half the votes), or for regressors the
+    share within 1e-6 relative and the largest absolute difference
+    """
+    expected = np.asarray(original.predict(X))
+    actual = np.asarray(compressed.predict(X))
+    if getattr(compressed, "classes_", None) is not None:
+        # Rows the original is sure of, where a pruned ensemble should not differ
+        confident = np.max(original.predict_proba(X), axis=1) >= 0.5
+        return {"rows": len(X), "agreement": float(np.mean(expected == actual)),
+                "confident_rows": int(confident.sum()),
+                "confident_agreement": float(np.mean(expected[confident] == actual[confident])) if confident.any() else 1.0}
+    difference = np.abs(expected - actual)
+    return {"rows": len(X), "agreement": float(np.mean(np.isclose(expected, actual, rtol=1e-6, atol=0))),
+            "max_abs_error": float(difference.max()) if len(X) else 0.0}
@@ -1,14 +1,58 @@
-import joblib
 import os
 import json
+from services.inference import active_model, run_batch, predict_one
+from services.prediction_cache import PredictionCache
+from services.scheduler import MicroBatcher
+from services.model_registry import registry
+from services.metrics import stage
+from services import schema
+from database import log_codec, rollups
 
-# Load model once with error handling
+# Model is loaded by the registry on first use
 model_path = os.path.join("models", "yield.pkl")
-try:
-    yield_model = joblib.load(model_path)
-except Exception as e:
-    print(f"Warning: Could not load yield model: {e}")
-    yield_model = None
+registry.register("yield", model_path)
+
+# Repeated feature rows skip the model; enabled per module via PREDICTION_CACHE
+yield_cache = PredictionCache("yield")
+
+# Concurrent single requests share one predict; enabled per module via INFERENCE_BATCHING
+yield_batcher = MicroBatcher("yield")
+
+# Request fields, in model feature order (crop_type is echoed, not a feature);
+# compiled once into a validator and feature encoder
+yield_schema = schema.compile("yield", [
+    schema.number("area", greater_than=0),
+    schema.text("crop_type"),
+    schema.category("season", {"spring": 1, "summer": 2, "autumn": 3, "winter": 4}),
+    schema.number("rainfall", minimum=0),
+    schema.number("temperature", minimum=-50, maximum=60),
+    schema.number("humidity", minimum=0, maximum=100),
+    schema.category("soil_quality", {"poor": 1, "fair": 2, "good": 3, "excellent": 4})
+])
+
+def _build_result(data, prediction):
+    """Build the response payload for one prediction"""
+    return {
+        "predicted_yield": round(prediction, 2),
+        "yield_per_hectare": round(prediction / data["area"], 2),
+        "input_parameters": {
+            "area_hectares": data["area"],
+            "crop_type": data["crop_type"],
+            "season": data["season"],
+            "rainfall_mm": data["rainfall"],
+            "temperature_celsius": data["temperature"],
+            "humidity_percent": data["humidity"],
+            "soil_quality": data["soil_quality"]
+        }
+    }
+
+# Logs store these fields packed and only the model outputs of the result
+log_codec.register("yield", fields=["area", "crop_type", "season", "rainfall", "temperature", "humidity", "soil_quality"],
+                   outputs=["predicted_yield", "yield_per_hectare"], build_result=_build_result)
+
+# Rollups of old logs are kept per time bucket for these dimensions
+rollups.register("yield", dimensions=[("crop_type",), ("season",), ("soil_quality",), ("crop_type", "season")],
+                 value="predicted_yield")
 
 def get_yield_prediction(data):
     """
@@ -24,38 +68,30 @@ def get_yield_prediction(data):
     }
     """
     try:
+        # Validate the request and encode its features
+        with stage("extract"):
+            features, errors = yield_schema.row(data)
+        if errors:
+            return schema.invalid(errors)
+
+        yield_model, generation = active_model("yield", yield_cache)
         if yield_model is None:
             return {"error": "Yield model not available. Please check model file."}
-            
-        # Convert categorical variables to numerical
-        season_map = {"spring": 1, "summer": 2, "autumn": 3, "winter": 4}
-        soil_quality_map = {"poor": 1, "fair": 2, "good": 3, "excellent": 4}
-        
-        # Extract features from request
-        features = [
-            data["area"],
-            season_map.get(data["season"], 1),
-            data["rainfall"],
-            data["temperature"],
-            data["humidity"],
-            soil_quality_map.get(data["soil_quality"], 2)
-        ]
-        
+
         # Get prediction
-        prediction = yield_model.predict([features])[0]
+        with stage("predict"):
+            prediction = predict_one(yield_model, features, yield_cache, yield_batcher, generation)
         
-        return {
-            "predicted_yield": round(prediction, 2),
-            "yield_per_hectare": round(prediction / data["area"], 2),
-            "input_parameters": {
-                "area_hectares": data["area"],
-                "crop_type": data["crop_type"],
-                "season": data["season"],
-                "rainfall_mm": data["rainfall"],
-                "temperature_celsius": data["temperature"],
-                "humidity_percent": data["humidity"],
-                "soil_quality": data["soil_quality"]
-            }
-        }
+        return _build_result(data, prediction)
     except Exception as e:
         return {"error": f"Yield prediction failed: {str(e)}"}
+
+def get_yield_prediction_batch(records):
+    """
+    Get yield predictions for a list of records with a single predict call
+    Returns one result per record, in order; invalid records get an "error" entry
+    """
+    yield_model, generation = active_model("yield", yield_cache)
+    if yield_model is None:
+        return [{"error": "Yield model not available. Please check model file."} for _ in records]
+    return run_batch(yield_model, records, yield_schema, _build_result, "Yield prediction", yield_cache, generation)
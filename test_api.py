@@ -95,6 +95,28 @@ def test_dosage_recommendation():
         print(f"Dosage recommendation test failed: {e}")
         return False
 
+def test_crop_recommendation_batch():
+    """Test batch crop recommendation endpoint"""
+    try:
+        record = {
+            "soil_n": 45.0,
+            "soil_p": 25.0,
+            "soil_k": 30.0,
+            "ph": 6.5,
+            "temperature": 25.0,
+            "humidity": 70.0,
+            "rainfall": 150.0
+        }
+        data = [record, dict(record, soil_n=90.0), {"soil_n": 45.0}]
+        response = requests.post(f"{BASE_URL}/api/crop-recommendation/batch", json=data)
+        print(f"Crop recommendation batch: {response.status_code}")
+        print(f"Response: {json.dumps(response.json(), indent=2)}")
+        body = response.json()
+        return response.status_code == 200 and body["count"] == 3 and "error" in body["results"][2]
+    except Exception as e:
+        print(f"Crop recommendation batch test failed: {e}")
+        return False
+
 def test_logs():
     """Test logs endpoint"""
     try:
@@ -116,6 +138,7 @@ if __name__ == "__main__":
         ("Fertilizer Recommendation", test_fertilizer_recommendation),
         ("Yield Prediction", test_yield_prediction),
         ("Dosage Recommendation", test_dosage_recommendation),
+        ("Crop Recommendation Batch", test_crop_recommendation_batch),
         ("Logs", test_logs)
     ]
     
@@ -43,7 +43,7 @@ def test_imports():
         print("✓ Route blueprints imports successful")
         
         # Test main app
-        from app import app
+        from app import create_app
         print("✓ Main Flask app import successful")
         
         return True
@@ -58,7 +58,8 @@ def test_imports():
 def test_app_functionality():
     """Test basic app functionality"""
     try:
-        from app import app
+        from app import create_app
+        app = create_app()
         
         # Test app creation
         assert app is not None
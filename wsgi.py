@@ -0,0 +1,10 @@
+"""
+Production entry point
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Any WSGI server can serve `app` (`application` for mod_wsgi).
+"""
+from app import create_app
+
+app = application = create_app()